@@ -1,14 +1,13 @@
+import functools
 import glob
 import json
 import os
 import sys
 from collections import defaultdict
-from typing import Dict, List, Set
+from typing import Dict, List, Set, Tuple
 from pathlib import Path
 import tomllib
 
-from get_min_versions import get_min_version_from_toml
-
 
 LANGCHAIN_DIRS = [
     "libs/core",
@@ -39,6 +38,25 @@ PY_312_MAX_PACKAGES = [
     "libs/partners/huggingface",  # https://github.com/pytorch/pytorch/issues/130249
 ]
 
+DEFAULT_PY_VERSIONS = ("3.9", "3.13")
+
+# jobs that run against the same set of directories
+TEST_JOBS = ("test", "compile-integration-tests", "dependencies", "test-pydantic")
+
+# changed-file prefixes, as tuples so a single str.startswith call checks them all
+INFRA_PREFIXES = (
+    ".github/workflows",
+    ".github/tools",
+    ".github/actions",
+    ".github/scripts/check_diff.py",
+)
+LANGCHAIN_PREFIXES = tuple(LANGCHAIN_DIRS)
+DOCS_PREFIXES = ("docs/",)
+LINT_ONLY_PREFIXES = ("docs/", "cookbook/")
+
+CORE_POETRY_LOCK = Path("./libs/core/poetry.lock")
+CORE_PYPROJECT = Path("./libs/core/pyproject.toml")
+
 
 def all_package_dirs() -> Set[str]:
     return {
@@ -117,54 +135,75 @@ def _get_configs_for_single_dir(job: str, dir_: str) -> List[Dict[str, str]]:
         return _get_pydantic_test_configs(dir_)
 
     if dir_ == "libs/core":
-        py_versions = ["3.9", "3.10", "3.11", "3.12", "3.13"]
+        py_versions = ("3.9", "3.10", "3.11", "3.12", "3.13")
     # custom logic for specific directories
     elif dir_ == "libs/partners/milvus":
         # milvus poetry doesn't allow 3.12 because they
         # declare deps in funny way
-        py_versions = ["3.9", "3.11"]
+        py_versions = ("3.9", "3.11")
 
     elif dir_ in PY_312_MAX_PACKAGES:
-        py_versions = ["3.9", "3.12"]
+        py_versions = ("3.9", "3.12")
 
     elif dir_ == "libs/langchain" and job == "extended-tests":
-        py_versions = ["3.9", "3.13"]
+        py_versions = ("3.9", "3.13")
 
     elif dir_ == "libs/community" and job == "extended-tests":
-        py_versions = ["3.9", "3.12"]
+        py_versions = ("3.9", "3.12")
 
     elif dir_ == "libs/community" and job == "compile-integration-tests":
         # community integration deps are slow in 3.12
-        py_versions = ["3.9", "3.11"]
+        py_versions = ("3.9", "3.11")
     elif dir_ == ".":
         # unable to install with 3.13 because tokenizers doesn't support 3.13 yet
-        py_versions = ["3.9", "3.12"]
+        py_versions = ("3.9", "3.12")
     else:
-        py_versions = ["3.9", "3.13"]
+        py_versions = DEFAULT_PY_VERSIONS
 
     return [{"working-directory": dir_, "python-version": py_v} for py_v in py_versions]
 
 
+def _file_cache_key(path: Path) -> Tuple[Path, int]:
+    # include the mtime so that a rewritten file is never served from the cache
+    return (path, path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_lock(key: Tuple[Path, int]) -> dict:
+    # a single read of the whole file is cheaper than tomllib.load's buffered reads
+    return tomllib.loads(key[0].read_bytes().decode())
+
+
+@functools.lru_cache(maxsize=None)
+def _lock_packages(key: Tuple[Path, int]) -> Dict[str, dict]:
+    return {package["name"]: package for package in _load_lock(key)["package"]}
+
+
+@functools.lru_cache(maxsize=None)
+def _pydantic_version_from_lock(key: Tuple[Path, int]) -> int:
+    """Return the minor version of pydantic pinned in the given lock file."""
+    version = _lock_packages(key).get("pydantic", {}).get("version", "0.0.0")
+    try:
+        return int(version.partition(".")[2].partition(".")[0])
+    except ValueError:
+        return 0
+
+
 def _get_pydantic_test_configs(
     dir_: str, *, python_version: str = "3.11"
 ) -> List[Dict[str, str]]:
-    with open("./libs/core/poetry.lock", "rb") as f:
-        core_poetry_lock_data = tomllib.load(f)
-    for package in core_poetry_lock_data["package"]:
-        if package["name"] == "pydantic":
-            core_max_pydantic_minor = package["version"].split(".")[1]
-            break
+    # deferred: pulls in requests/packaging, only needed for the test-pydantic job
+    from get_min_versions import get_min_version_from_toml
 
-    with open(f"./{dir_}/poetry.lock", "rb") as f:
-        dir_poetry_lock_data = tomllib.load(f)
-
-    for package in dir_poetry_lock_data["package"]:
-        if package["name"] == "pydantic":
-            dir_max_pydantic_minor = package["version"].split(".")[1]
-            break
+    core_max_pydantic_minor = _pydantic_version_from_lock(
+        _file_cache_key(CORE_POETRY_LOCK)
+    )
+    dir_max_pydantic_minor = _pydantic_version_from_lock(
+        _file_cache_key(Path(dir_) / "poetry.lock")
+    )
 
     core_min_pydantic_version = get_min_version_from_toml(
-        "./libs/core/pyproject.toml", "release", python_version, include=["pydantic"]
+        CORE_PYPROJECT, "release", python_version, include=["pydantic"]
     )["pydantic"]
     core_min_pydantic_minor = (
         core_min_pydantic_version.split(".")[1]
@@ -172,7 +211,10 @@ def _get_pydantic_test_configs(
         else "0"
     )
     dir_min_pydantic_version = get_min_version_from_toml(
-        f"./{dir_}/pyproject.toml", "release", python_version, include=["pydantic"]
+        Path(dir_) / "pyproject.toml",
+        "release",
+        python_version,
+        include=["pydantic"],
     ).get("pydantic", "0.0.0")
     dir_min_pydantic_minor = (
         dir_min_pydantic_version.split(".")[1]
@@ -206,23 +248,25 @@ def _get_pydantic_test_configs(
     return configs
 
 
-def _get_configs_for_multi_dirs(
+def _get_dirs_for_job(
     job: str, dirs_to_run: Dict[str, Set[str]], dependents: dict
-) -> List[Dict[str, str]]:
+) -> List[str]:
     if job == "lint":
-        dirs = add_dependents(
+        return add_dependents(
             dirs_to_run["lint"] | dirs_to_run["test"] | dirs_to_run["extended-test"],
             dependents,
         )
-    elif job in ["test", "compile-integration-tests", "dependencies", "test-pydantic"]:
-        dirs = add_dependents(
+    elif job in TEST_JOBS:
+        return add_dependents(
             dirs_to_run["test"] | dirs_to_run["extended-test"], dependents
         )
     elif job == "extended-tests":
-        dirs = list(dirs_to_run["extended-test"])
+        return list(dirs_to_run["extended-test"])
     else:
         raise ValueError(f"Unknown job: {job}")
 
+
+def _get_configs_for_multi_dirs(job: str, dirs: List[str]) -> List[Dict[str, str]]:
     return [
         config for dir_ in dirs for config in _get_configs_for_single_dir(job, dir_)
     ]
@@ -236,7 +280,7 @@ if __name__ == "__main__":
         "test": set(),
         "extended-test": set(),
     }
-    docs_edited = False
+    docs_edited = any(file.startswith(DOCS_PREFIXES) for file in files)
 
     if len(files) >= 300:
         # max diff length is 300 files - there are likely files missing
@@ -245,20 +289,12 @@ if __name__ == "__main__":
         dirs_to_run["extended-test"] = set(LANGCHAIN_DIRS)
 
     for file in files:
-        if any(
-            file.startswith(dir_)
-            for dir_ in (
-                ".github/workflows",
-                ".github/tools",
-                ".github/actions",
-                ".github/scripts/check_diff.py",
-            )
-        ):
+        if file.startswith(INFRA_PREFIXES):
             # add all LANGCHAIN_DIRS for infra changes
             dirs_to_run["extended-test"].update(LANGCHAIN_DIRS)
             dirs_to_run["lint"].add(".")
 
-        if any(file.startswith(dir_) for dir_ in LANGCHAIN_DIRS):
+        if file.startswith(LANGCHAIN_PREFIXES):
             # add that dir and all dirs after in LANGCHAIN_DIRS
             # for extended testing
 
@@ -304,17 +340,21 @@ if __name__ == "__main__":
                 f"Unknown lib: {file}. check_diff.py likely needs "
                 "an update for this new library!"
             )
-        elif any(file.startswith(p) for p in ["docs/", "cookbook/"]):
-            if file.startswith("docs/"):
-                docs_edited = True
+        elif file.startswith(LINT_ONLY_PREFIXES):
             dirs_to_run["lint"].add(".")
 
     dependents = dependents_graph()
 
     # we now have dirs_by_job
-    # todo: clean this up
+    # the test jobs share their directories, so only resolve them once
+    test_dirs = _get_dirs_for_job("test", dirs_to_run, dependents)
     map_job_to_configs = {
-        job: _get_configs_for_multi_dirs(job, dirs_to_run, dependents)
+        job: _get_configs_for_multi_dirs(
+            job,
+            test_dirs
+            if job in TEST_JOBS
+            else _get_dirs_for_job(job, dirs_to_run, dependents),
+        )
         for job in [
             "lint",
             "test",
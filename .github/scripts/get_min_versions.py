@@ -1,5 +1,7 @@
+import functools
 import sys
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Tuple, Union
 
 if sys.version_info >= (3, 11):
     import tomllib
@@ -94,16 +96,22 @@ def get_minimum_version(package_name: str, spec_string: str) -> Optional[str]:
     return str(min(valid_versions)) if valid_versions else None
 
 
+@functools.lru_cache(maxsize=None)
+def _load_toml(key: Tuple[Path, int]) -> dict:
+    # a single read of the whole file is cheaper than tomllib.load's buffered reads
+    return tomllib.loads(key[0].read_bytes().decode())
+
+
 def get_min_version_from_toml(
-    toml_path: str,
+    toml_path: Union[str, Path],
     versions_for: str,
     python_version: str,
     *,
     include: Optional[list] = None,
 ):
-    # Parse the TOML file
-    with open(toml_path, "rb") as file:
-        toml_data = tomllib.load(file)
+    # Parse the TOML file, re-using the parse result while the file is unchanged
+    toml_path = Path(toml_path)
+    toml_data = _load_toml((toml_path, toml_path.stat().st_mtime_ns))
 
     # Get the dependencies from tool.poetry.dependencies
     dependencies = toml_data["tool"]["poetry"]["dependencies"]
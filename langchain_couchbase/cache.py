@@ -10,25 +10,90 @@ are copied from the LangChain community module:
 import hashlib
 import json
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from typing import Any, Dict, Optional, Union
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from couchbase.cluster import Cluster
+from couchbase.exceptions import CouchbaseException, DocumentNotFoundException
+from couchbase.options import QueryOptions
 from couchbase.search import MatchQuery
 from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
 from langchain_core.embeddings import Embeddings
-from langchain_core.load.dump import dumps
-from langchain_core.load.load import loads
+from langchain_core.load.dump import dumpd
+from langchain_core.load.load import load, loads
 from langchain_core.outputs import Generation
 
+from langchain_couchbase.utils import (
+    check_bucket_exists,
+    check_scope_and_collection_exists,
+    get_bucket,
+)
 from langchain_couchbase.vectorstores import CouchbaseSearchVectorStore
 
+try:
+    # optional, with the orjson extra, and much faster than json
+    import orjson
+
+    def _json_dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj).decode()
+        except orjson.JSONEncodeError:
+            # e.g. non string dict keys or integers larger than 64 bits
+            return json.dumps(obj, separators=(",", ":"))
+
+    def _json_loads(data: str) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN or Infinity, written by json but rejected by orjson
+            return json.loads(data)
+
+except ImportError:
+
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def _json_loads(data: str) -> Any:
+        return json.loads(data)
+
+
 logger = logging.getLogger(__file__)
 
+# Queued by CouchbaseSemanticCache.close to stop its write behind thread
+_STOP_WRITER = object()
+
+# bound once to skip the module attribute lookups on every cache operation
+_blake2b = hashlib.blake2b
+_encode = str.encode
+
 
 def _hash(_input: str) -> str:
     """Use a deterministic hashing approach."""
-    return hashlib.md5(_input.encode()).hexdigest()
+    return _blake2b(_encode(_input), digest_size=16).hexdigest()
+
+
+def _md5_hash(_input: str) -> str:
+    """The hash of the document keys written by versions up to 1.1.0"""
+    return hashlib.md5(_encode(_input)).hexdigest()
+
+
+def _cache_key(prompt: str, llm_string: str, md5_keys: bool = False) -> str:
+    """Hash the prompt and llm_string into a document key"""
+    key_input = prompt + llm_string
+    return _md5_hash(key_input) if md5_keys else _hash(key_input)
 
 
 def _dumps_generations(generations: RETURN_VAL_TYPE) -> str:
@@ -45,10 +110,10 @@ def _dumps_generations(generations: RETURN_VAL_TYPE) -> str:
     the dumps/loads pair with Reviver, so are able to deal
     with all subclasses of Generation.
 
-    Each item in the list can be `dumps`ed to a string,
-    then we make the whole list of strings into a json-dumped.
+    Each item in the list is `dumpd`ed to a serializable dict,
+    then the whole list of dicts is json-dumped once.
     """
-    return json.dumps([dumps(_item) for _item in generations])
+    return _json_dumps([dumpd(_item) for _item in generations])
 
 
 def _loads_generations(generations_str: str) -> Union[RETURN_VAL_TYPE, None]:
@@ -69,14 +134,19 @@ def _loads_generations(generations_str: str) -> Union[RETURN_VAL_TYPE, None]:
         RETURN_VAL_TYPE: A list of generations.
     """
     try:
-        generations = [loads(_item_str) for _item_str in json.loads(generations_str)]
-        return generations
+        # items are dicts, or json strings for blobs written by earlier versions
+        generations = [
+            loads(_item) if isinstance(_item, str) else load(_item)
+            for _item in _json_loads(generations_str)
+        ]
+        if all(isinstance(_item, Generation) for _item in generations):
+            return generations
     except (json.JSONDecodeError, TypeError):
         # deferring the (soft) handling to after the legacy-format attempt
         pass
 
     try:
-        gen_dicts = json.loads(generations_str)
+        gen_dicts = _json_loads(generations_str)
         # not relying on `_load_generations_from_json` (which could disappear):
         generations = [Generation(**generation_dict) for generation_dict in gen_dicts]
         logger.warning(
@@ -103,6 +173,10 @@ def _validate_ttl(ttl: Optional[timedelta]) -> None:
 class CouchbaseCache(BaseCache):
     """Couchbase LLM Cache
     LLM Cache that uses Couchbase as the backend
+
+    The documents are keyed by a BLAKE2b hash of the prompt and llm_string.
+    Versions up to 1.1.0 used MD5 hashes, so the entries they wrote are not
+    found with the new keys. Set md5_keys=True to keep using them.
     """
 
     PROMPT = "prompt"
@@ -111,41 +185,14 @@ class CouchbaseCache(BaseCache):
 
     def _check_bucket_exists(self) -> bool:
         """Check if the bucket exists in the linked Couchbase cluster"""
-        bucket_manager = self._cluster.buckets()
-        try:
-            bucket_manager.get_bucket(self._bucket_name)
-            return True
-        except Exception:
-            return False
+        return check_bucket_exists(self._cluster, self._bucket_name)
 
     def _check_scope_and_collection_exists(self) -> bool:
         """Check if the scope and collection exists in the linked Couchbase bucket
         Raises a ValueError if either is not found"""
-        scope_collection_map: Dict[str, Any] = {}
-
-        # Get a list of all scopes in the bucket
-        for scope in self._bucket.collections().get_all_scopes():
-            scope_collection_map[scope.name] = []
-
-            # Get a list of all the collections in the scope
-            for collection in scope.collections:
-                scope_collection_map[scope.name].append(collection.name)
-
-        # Check if the scope exists
-        if self._scope_name not in scope_collection_map.keys():
-            raise ValueError(
-                f"Scope {self._scope_name} not found in Couchbase "
-                f"bucket {self._bucket_name}"
-            )
-
-        # Check if the collection exists in the scope
-        if self._collection_name not in scope_collection_map[self._scope_name]:
-            raise ValueError(
-                f"Collection {self._collection_name} not found in scope "
-                f"{self._scope_name} in Couchbase bucket {self._bucket_name}"
-            )
-
-        return True
+        return check_scope_and_collection_exists(
+            self._cluster, self._bucket_name, self._scope_name, self._collection_name
+        )
 
     def __init__(
         self,
@@ -154,6 +201,7 @@ class CouchbaseCache(BaseCache):
         scope_name: str,
         collection_name: str,
         ttl: Optional[timedelta] = None,
+        md5_keys: bool = False,
         **kwargs: Dict[str, Any],
     ) -> None:
         """Initialize the Couchbase LLM Cache
@@ -165,6 +213,8 @@ class CouchbaseCache(BaseCache):
                 documents in.
             ttl (Optional[timedelta]): TTL or time for the document to live in the cache
                 After this time, the document will get deleted from the cache.
+            md5_keys (bool): key the documents by MD5 hashes, as versions up to
+                1.1.0 did, to keep using the entries they wrote. Defaults to False.
         """
         if not isinstance(cluster, Cluster):
             raise ValueError(
@@ -179,6 +229,7 @@ class CouchbaseCache(BaseCache):
         self._collection_name = collection_name
 
         self._ttl = None
+        self._md5_keys = md5_keys
 
         # Check if the bucket exists
         if not self._check_bucket_exists():
@@ -188,7 +239,7 @@ class CouchbaseCache(BaseCache):
             )
 
         try:
-            self._bucket = self._cluster.bucket(self._bucket_name)
+            self._bucket = get_bucket(self._cluster, self._bucket_name)
             self._scope = self._bucket.scope(self._scope_name)
             self._collection = self._scope.collection(self._collection_name)
         except Exception as e:
@@ -208,48 +259,132 @@ class CouchbaseCache(BaseCache):
             _validate_ttl(ttl)
             self._ttl = ttl
 
+        self._clear_query = f"DELETE FROM `{self._collection_name}`"
+        # the worker thread is only started by the first background update
+        self._update_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="couchbase-cache-update"
+        )
+
     def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
         """Look up from cache based on prompt and llm_string."""
         try:
             doc = self._collection.get(
                 self._generate_key(prompt, llm_string)
             ).content_as[dict]
+        except DocumentNotFoundException:
+            # expected on a cache miss
+            return None
+        except CouchbaseException:
+            logger.error("Error looking up cache")
+            return None
+
+        try:
             return _loads_generations(doc[self.RETURN_VAL])
-        except Exception:
+        except (KeyError, TypeError, ValueError):
+            # a malformed entry, or one in an unknown format, is a cache miss
+            logger.warning("Malformed cache entry for the prompt, ignoring it")
             return None
 
     def _generate_key(self, prompt: str, llm_string: str) -> str:
         """Generate the key based on prompt and llm_string."""
-        return _hash(prompt + llm_string)
+        return _cache_key(prompt, llm_string, self._md5_keys)
 
     def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
         """Update cache based on prompt and llm_string."""
-        doc = {
-            self.PROMPT: prompt,
-            self.LLM: llm_string,
-            self.RETURN_VAL: _dumps_generations(return_val),
+        self.update_many([(prompt, llm_string, return_val)])
+
+    def update_many(self, items: Sequence[Tuple[str, str, RETURN_VAL_TYPE]]) -> None:
+        """Update cache with multiple (prompt, llm_string, return_val) entries.
+        The documents are written in a single batched upsert.
+        """
+        docs = {
+            self._generate_key(prompt, llm_string): {
+                self.PROMPT: prompt,
+                self.LLM: llm_string,
+                self.RETURN_VAL: _dumps_generations(return_val),
+            }
+            for prompt, llm_string, return_val in items
         }
-        document_key = self._generate_key(prompt, llm_string)
+        if not docs:
+            return
         try:
             if self._ttl:
-                self._collection.upsert(
-                    key=document_key,
-                    value=doc,
-                    expiry=self._ttl,
-                )
+                result = self._collection.upsert_multi(docs, expiry=self._ttl)
             else:
-                self._collection.upsert(key=document_key, value=doc)
+                result = self._collection.upsert_multi(docs)
+            if not result.all_ok:
+                logger.error(f"Error updating cache: {result.exceptions}")
         except Exception:
             logger.error("Error updating cache")
 
+    def _submit_update(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        """Write the entry to the cache in the background"""
+        try:
+            self._update_executor.submit(self.update, prompt, llm_string, return_val)
+        except RuntimeError:
+            # the cache was closed, write the entry in the caller's thread
+            self.update(prompt, llm_string, return_val)
+
+    def flush(self) -> None:
+        """Wait until the background updates of get_or_compute have been written
+        to the cache.
+        """
+        try:
+            # the single worker runs the updates in order, so this runs last
+            self._update_executor.submit(lambda: None).result()
+        except RuntimeError:
+            # closed, all the updates have already been written
+            pass
+
+    def close(self) -> None:
+        """Write the pending background updates and stop the worker thread.
+        Later updates of get_or_compute are written in the caller's thread.
+        Pending updates are also written at interpreter exit.
+        """
+        self._update_executor.shutdown(wait=True)
+
+    def get_or_compute(
+        self,
+        prompt: str,
+        llm_string: str,
+        compute_fn: Callable[[], RETURN_VAL_TYPE],
+    ) -> RETURN_VAL_TYPE:
+        """Look up the cache and call compute_fn on a miss.
+        The computed value is written to the cache in the background, so the
+        caller does not wait for the upsert round-trip. Call flush() to wait
+        for the background writes.
+        """
+        cached = self.lookup(prompt, llm_string)
+        if cached is not None:
+            return cached
+        return_val = compute_fn()
+        self._submit_update(prompt, llm_string, return_val)
+        return return_val
+
+    async def aget_or_compute(
+        self,
+        prompt: str,
+        llm_string: str,
+        compute_fn: Callable[[], Awaitable[RETURN_VAL_TYPE]],
+    ) -> RETURN_VAL_TYPE:
+        """Async version of get_or_compute."""
+        cached = await self.alookup(prompt, llm_string)
+        if cached is not None:
+            return cached
+        return_val = await compute_fn()
+        self._submit_update(prompt, llm_string, return_val)
+        return return_val
+
     def clear(self, **kwargs: Any) -> None:
         """Clear the cache.
         This will delete all documents in the collection. This requires an index on the
         collection.
         """
         try:
-            query = f"DELETE FROM `{self._collection_name}`"
-            self._scope.query(query).execute()
+            # run as a prepared statement so the plan is reused across calls
+            self._scope.query(self._clear_query, QueryOptions(adhoc=False)).execute()
         except Exception:
             logger.error("Error clearing cache. Please check if you have an index.")
 
@@ -272,6 +407,7 @@ class CouchbaseSemanticCache(BaseCache, CouchbaseSearchVectorStore):
         index_name: str,
         score_threshold: Optional[float] = None,
         ttl: Optional[timedelta] = None,
+        write_behind: bool = False,
     ) -> None:
         """Initialize the Couchbase LLM Cache
         Args:
@@ -285,50 +421,21 @@ class CouchbaseSemanticCache(BaseCache, CouchbaseSearchVectorStore):
             score_threshold (float): score threshold to use for filtering results.
             ttl (Optional[timedelta]): TTL or time for the document to live in the cache
                 After this time, the document will get deleted from the cache.
+            write_behind (bool): queue updates and write them from a background
+                thread in batches, so update() does not wait for the embedding
+                model. Call flush() to wait for queued updates, and close() to
+                stop the thread once the cache is no longer needed: queued
+                updates are lost at interpreter exit. Defaults to False.
         """
-        if not isinstance(cluster, Cluster):
-            raise ValueError(
-                f"cluster should be an instance of couchbase.Cluster, "
-                f"got {type(cluster)}"
-            )
-
-        self._cluster = cluster
-
-        self._bucket_name = bucket_name
-        self._scope_name = scope_name
-        self._collection_name = collection_name
         self._ttl = None
-
-        # Check if the bucket exists
-        if not self._check_bucket_exists():
-            raise ValueError(
-                f"Bucket {self._bucket_name} does not exist. "
-                " Please create the bucket before searching."
-            )
-
-        try:
-            self._bucket = self._cluster.bucket(self._bucket_name)
-            self._scope = self._bucket.scope(self._scope_name)
-            self._collection = self._scope.collection(self._collection_name)
-        except Exception as e:
-            raise ValueError(
-                "Error connecting to couchbase. "
-                "Please check the connection and credentials."
-            ) from e
-
-        # Check if the scope and collection exists. Throws ValueError if they don't
-        try:
-            self._check_scope_and_collection_exists()
-        except Exception as e:
-            raise e
-
-        self.score_threshold = score_threshold
-
         if ttl is not None:
             _validate_ttl(ttl)
             self._ttl = ttl
 
-        # Initialize the vector store
+        self.score_threshold = score_threshold
+
+        # Initialize the vector store. This validates the cluster and resolves
+        # the bucket, scope and collection handles.
         super().__init__(
             cluster=cluster,
             bucket_name=bucket_name,
@@ -338,6 +445,20 @@ class CouchbaseSemanticCache(BaseCache, CouchbaseSearchVectorStore):
             index_name=index_name,
         )
 
+        self._clear_query = f"DELETE FROM `{self._collection_name}`"
+
+        self._pending_updates: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if write_behind:
+            self._pending_updates = queue.Queue()
+            self._writer = threading.Thread(
+                target=self._drain_updates,
+                args=(self._pending_updates,),
+                name="couchbase-semantic-cache-writer",
+                daemon=True,
+            )
+            self._writer.start()
+
     def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
         """Look up from cache based on the semantic similarity of the prompt"""
         pre_filter = MatchQuery(llm_string, field=f"metadata.{self.LLM}")
@@ -358,27 +479,81 @@ class CouchbaseSemanticCache(BaseCache, CouchbaseSearchVectorStore):
 
     def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
         """Update cache based on the prompt and llm_string"""
+        if self._pending_updates is not None:
+            self._pending_updates.put((prompt, llm_string, return_val))
+            return
+        self._add_entries([(prompt, llm_string, return_val)])
+
+    def flush(self) -> None:
+        """Wait until all queued updates have been written to the cache.
+        No-op unless the cache was created with write_behind=True.
+        """
+        if self._pending_updates is not None:
+            self._pending_updates.join()
+
+    def close(self) -> None:
+        """Write the queued updates and stop the background thread. Must be
+        called when the cache was created with write_behind=True, as the thread
+        keeps the cache alive. Later updates are written in the caller's thread.
+        """
+        pending_updates, writer = self._pending_updates, self._writer
+        if pending_updates is None or writer is None:
+            return
+        self._pending_updates = self._writer = None
+        pending_updates.put(_STOP_WRITER)
+        writer.join()
+        # updates queued behind the sentinel by concurrent update() calls
+        items = []
+        while True:
+            try:
+                items.append(pending_updates.get_nowait())
+            except queue.Empty:
+                break
+        if items:
+            self._add_entries(items)
+
+    def _add_entries(self, items: Sequence[Tuple[str, str, RETURN_VAL_TYPE]]) -> None:
+        """Embed and store the entries with a single add_texts call"""
         try:
             self.add_texts(
-                texts=[prompt],
+                texts=[prompt for prompt, _, _ in items],
                 metadatas=[
                     {
                         self.LLM: llm_string,
                         self.RETURN_VAL: _dumps_generations(return_val),
                     }
+                    for _, llm_string, return_val in items
                 ],
                 ttl=self._ttl,
             )
         except Exception:
             logger.error("Error updating cache")
 
+    def _drain_updates(self, pending_updates: queue.Queue) -> None:
+        """Write queued updates in batches of up to DEFAULT_BATCH_SIZE entries,
+        until close() queues _STOP_WRITER"""
+        stopped = False
+        while not stopped:
+            items: List[Any] = [pending_updates.get()]
+            while len(items) < self.DEFAULT_BATCH_SIZE:
+                try:
+                    items.append(pending_updates.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [item for item in items if item is not _STOP_WRITER]
+            stopped = len(entries) < len(items)
+            if entries:
+                self._add_entries(entries)
+            for _ in items:
+                pending_updates.task_done()
+
     def clear(self, **kwargs: Any) -> None:
         """Clear the cache.
         This will delete all documents in the collection.
         This requires an index on the collection.
         """
         try:
-            query = f"DELETE FROM `{self._collection_name}`"
-            self._scope.query(query).execute()
+            # run as a prepared statement so the plan is reused across calls
+            self._scope.query(self._clear_query, QueryOptions(adhoc=False)).execute()
         except Exception:
             logger.error("Error clearing cache. Please check if you have an index.")
@@ -1,12 +1,33 @@
 """Couchbase Chat Message History"""
 
+from __future__ import annotations
+
+import itertools
 import logging
+import os
+import threading
 import time
 import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import timedelta
-from typing import Any, Dict, List, Optional, Sequence
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from weakref import WeakKeyDictionary
 
 from couchbase.cluster import Cluster
+from couchbase.n1ql import QueryScanConsistency
+from couchbase.options import QueryOptions
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import (
     BaseMessage,
@@ -14,6 +35,13 @@ from langchain_core.messages import (
     messages_from_dict,
 )
 
+from langchain_couchbase.utils import (
+    check_bucket_exists,
+    check_scope_and_collection_exists,
+    get_bucket,
+    get_json_transcoder,
+)
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_SESSION_ID_KEY = "session_id"
@@ -21,6 +49,16 @@ DEFAULT_MESSAGE_KEY = "message"
 DEFAULT_TS_KEY = "ts"
 DEFAULT_INDEX_NAME = "LANGCHAIN_CHAT_HISTORY"
 DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 4
+# seconds a buffered message waits for more messages before it is written
+DEFAULT_FLUSH_INTERVAL = 0.02
+# seconds between the timestamps of the messages of one add_messages call
+_TS_STEP = 1e-6
+
+
+# Indexes already created, per cluster, as (bucket, scope, collection, index name)
+_ensured_indexes: WeakKeyDictionary[Cluster, Set[Tuple[str, ...]]] = WeakKeyDictionary()
+_ensured_indexes_lock = threading.Lock()
 
 
 def _validate_ttl(ttl: Optional[timedelta]) -> None:
@@ -40,42 +78,14 @@ class CouchbaseChatMessageHistory(BaseChatMessageHistory):
 
     def _check_bucket_exists(self) -> bool:
         """Check if the bucket exists in the linked Couchbase cluster"""
-        bucket_manager = self._cluster.buckets()
-        try:
-            bucket_manager.get_bucket(self._bucket_name)
-            return True
-        except Exception:
-            return False
+        return check_bucket_exists(self._cluster, self._bucket_name)
 
     def _check_scope_and_collection_exists(self) -> bool:
         """Check if the scope and collection exists in the linked Couchbase bucket
         Raises a ValueError if either is not found"""
-        scope_collection_map: Dict[str, Any] = {}
-
-        # Get a list of all scopes in the bucket
-        for scope in self._bucket.collections().get_all_scopes():
-            scope_collection_map[scope.name] = []
-
-            # Get a list of all the collections in the scope
-            for collection in scope.collections:
-                scope_collection_map[scope.name].append(collection.name)
-
-        # Check if the scope exists
-        if self._scope_name not in scope_collection_map.keys():
-            raise ValueError(
-                f"Scope {self._scope_name} not found in Couchbase "
-                f"bucket {self._bucket_name}"
-            )
-
-        # Check if the collection exists in the scope
-        if self._collection_name not in scope_collection_map[self._scope_name]:
-            raise ValueError(
-                f"Collection {self._collection_name} not found in scope "
-                f"{self._scope_name} in Couchbase bucket "
-                f"{self._bucket_name}"
-            )
-
-        return True
+        return check_scope_and_collection_exists(
+            self._cluster, self._bucket_name, self._scope_name, self._collection_name
+        )
 
     def __init__(
         self,
@@ -88,7 +98,9 @@ class CouchbaseChatMessageHistory(BaseChatMessageHistory):
         session_id_key: str = DEFAULT_SESSION_ID_KEY,
         message_key: str = DEFAULT_MESSAGE_KEY,
         create_index: bool = True,
+        create_index_in_background: bool = False,
         ttl: Optional[timedelta] = None,
+        batch_writes: bool = False,
     ) -> None:
         """Initialize the Couchbase Chat Message History
         Args:
@@ -104,8 +116,16 @@ class CouchbaseChatMessageHistory(BaseChatMessageHistory):
             message_key (str): name of the field to use for the messages
                 Set to "message" by default.
             create_index (bool): create an index if True. Set to True by default.
+            create_index_in_background (bool): issue the index creation from a
+                background thread instead of waiting for it. Set to False by
+                default.
             ttl (timedelta): time to live for the documents in the collection.
                 When set, the documents are automatically deleted after the ttl expires.
+            batch_writes (bool): buffer messages added with add_message and write
+                them together, once DEFAULT_BATCH_SIZE messages are buffered or
+                after DEFAULT_FLUSH_INTERVAL seconds. Buffered messages are written
+                before reading or clearing the history, or by calling flush().
+                Set to False by default.
         """
         if not isinstance(cluster, Cluster):
             raise ValueError(
@@ -128,7 +148,7 @@ class CouchbaseChatMessageHistory(BaseChatMessageHistory):
             )
 
         try:
-            self._bucket = self._cluster.bucket(self._bucket_name)
+            self._bucket = get_bucket(self._cluster, self._bucket_name)
             self._scope = self._bucket.scope(self._scope_name)
             self._collection = self._scope.collection(self._collection_name)
         except Exception as e:
@@ -148,25 +168,77 @@ class CouchbaseChatMessageHistory(BaseChatMessageHistory):
         self._create_index = create_index
         self._session_id = session_id
         self._ts_key = DEFAULT_TS_KEY
+        self._transcoder = get_json_transcoder()
 
         if ttl is not None:
             _validate_ttl(ttl)
             self._ttl = ttl
 
-        # Create an index if it does not exist if requested
+        # The statements only depend on the field and collection names, so they
+        # are built once and run as prepared statements
+        self._clear_ids_query = (
+            f"SELECT RAW META().id FROM `{self._collection_name}` "
+            + f"WHERE {self._session_id_key}=$session_id"
+        )
+        self._batch_writes = batch_writes
+        self._pending_docs: Dict[str, Dict[str, Any]] = {}
+        self._flush_lock = threading.Lock()
+        # held while buffered documents are taken and written, so that a flush
+        # waits for the write of an earlier one still in flight
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+
+        # Fetch queries keyed by (filter on before_ts, limit the results)
+        self._fetch_queries = {
+            (before, limit): self._build_fetch_query(before, limit)
+            for before in (False, True)
+            for limit in (False, True)
+        }
+
+        # Create an index if it does not exist if requested. This is done at most
+        # once per collection in the process.
         if create_index:
-            index_fields = (
-                f"({self._session_id_key}, {self._ts_key}, {self._message_key})"
-            )
-            index_creation_query = (
-                f"CREATE INDEX {DEFAULT_INDEX_NAME} IF NOT EXISTS ON "
-                + f"{self._collection_name}{index_fields} "
+            index_key = (
+                self._bucket_name,
+                self._scope_name,
+                self._collection_name,
+                DEFAULT_INDEX_NAME,
             )
+            with _ensured_indexes_lock:
+                ensured = _ensured_indexes.setdefault(self._cluster, set())
+                needs_index = index_key not in ensured
+                if needs_index and create_index_in_background:
+                    # claim it now so that other histories don't issue it too
+                    ensured.add(index_key)
+
+            if needs_index and create_index_in_background:
+                threading.Thread(
+                    target=self._run_index_creation,
+                    args=(index_key,),
+                    name="couchbase-chat-history-index",
+                    daemon=True,
+                ).start()
+            elif needs_index:
+                self._run_index_creation(index_key)
+
+    def _run_index_creation(self, index_key: Tuple[str, ...]) -> None:
+        """Create the index used to query the messages if it does not exist"""
+        index_fields = f"({self._session_id_key}, {self._ts_key}, {self._message_key})"
+        index_creation_query = (
+            f"CREATE INDEX {DEFAULT_INDEX_NAME} IF NOT EXISTS ON "
+            + f"{self._collection_name}{index_fields} "
+        )
+
+        try:
+            self._scope.query(index_creation_query).execute()
+        except Exception as e:
+            logger.error("Error creating index: ", e)
+            with _ensured_indexes_lock:
+                _ensured_indexes.get(self._cluster, set()).discard(index_key)
+            return
 
-            try:
-                self._scope.query(index_creation_query).execute()
-            except Exception as e:
-                logger.error("Error creating index: ", e)
+        with _ensured_indexes_lock:
+            _ensured_indexes.setdefault(self._cluster, set()).add(index_key)
 
     def add_message(self, message: BaseMessage) -> None:
         """Add a message to the cache"""
@@ -174,93 +246,225 @@ class CouchbaseChatMessageHistory(BaseChatMessageHistory):
         document_key = uuid.uuid4().hex
         # get utc timestamp for ordering the messages
         timestamp = time.time()
-        message_content = message_to_dict(message)
+        document = {
+            self._message_key: message_to_dict(message),
+            self._session_id_key: self._session_id,
+            self._ts_key: timestamp,
+        }
+
+        if self._batch_writes:
+            self._buffer_document(document_key, document)
+            return
 
         try:
             if self._ttl:
                 self._collection.insert(
                     document_key,
-                    value={
-                        self._message_key: message_content,
-                        self._session_id_key: self._session_id,
-                        self._ts_key: timestamp,
-                    },
+                    value=document,
                     expiry=self._ttl,
+                    transcoder=self._transcoder,
                 )
             else:
                 self._collection.insert(
-                    document_key,
-                    value={
-                        self._message_key: message_content,
-                        self._session_id_key: self._session_id,
-                        self._ts_key: timestamp,
-                    },
+                    document_key, value=document, transcoder=self._transcoder
                 )
         except Exception as e:
             logger.error("Error adding message: ", e)
 
+    def _buffer_document(self, document_key: str, document: Dict[str, Any]) -> None:
+        """Buffer a message document for a later batched write"""
+        with self._flush_lock:
+            self._pending_docs[document_key] = document
+            if len(self._pending_docs) < DEFAULT_BATCH_SIZE:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(
+                        DEFAULT_FLUSH_INTERVAL, self.flush
+                    )
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+
+    def _take_pending_docs(self) -> Dict[str, Dict[str, Any]]:
+        """Take the buffered documents. Must be called with the flush lock held."""
+        documents = self._pending_docs
+        self._pending_docs = {}
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        return documents
+
+    def _write_documents(self, documents: Dict[str, Dict[str, Any]]) -> None:
+        """Write buffered message documents in one batch"""
+        try:
+            result = self._insert_batch(documents)
+            if not result.all_ok:
+                logger.error(f"Error adding messages: {result.exceptions}")
+        except Exception as e:
+            logger.error("Error adding messages: ", e)
+
+    def flush(self) -> None:
+        """Write the messages buffered by add_message when batch_writes is set"""
+        with self._write_lock:
+            with self._flush_lock:
+                documents = self._take_pending_docs()
+            if documents:
+                self._write_documents(documents)
+
+    def close(self) -> None:
+        """Write any buffered messages. Call before discarding the history."""
+        self.flush()
+
     def add_messages(self, messages: Sequence[BaseMessage]) -> None:
         """Add messages to the cache in a batched manner"""
         batch_size = DEFAULT_BATCH_SIZE
-        messages_to_insert = []
-        for message in messages:
-            document_key = uuid.uuid4().hex
-            timestamp = time.time()
-            message_content = message_to_dict(message)
-            messages_to_insert.append(
+        documents = self._message_documents(messages)
+
+        first_batch = dict(itertools.islice(documents, batch_size))
+        next_batch = dict(itertools.islice(documents, batch_size))
+        if not next_batch:
+            # A single batch is inserted directly, without a thread pool
+            if first_batch:
+                self._write_documents(first_batch)
+            return
+
+        # Add the messages to the cache in batches of batch_size. The batches are
+        # built as they are submitted, and submitted concurrently so that their
+        # round trips overlap.
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=DEFAULT_MAX_CONCURRENCY) as executor:
+            pending.append(executor.submit(self._insert_batch, first_batch))
+            insert_batch = next_batch
+            while insert_batch:
+                pending.append(executor.submit(self._insert_batch, insert_batch))
+                if len(pending) >= DEFAULT_MAX_CONCURRENCY:
+                    self._log_insert_result(pending.popleft())
+                insert_batch = dict(itertools.islice(documents, batch_size))
+            while pending:
+                self._log_insert_result(pending.popleft())
+
+    def _message_documents(
+        self, messages: Iterable[BaseMessage]
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield the document key and document for each message"""
+        # Read the clock once, and offset each message by a microsecond to keep
+        # them in order. The timestamps stay float seconds like add_message's.
+        base_timestamp = time.time()
+        for i, message in enumerate(messages):
+            offset = i % DEFAULT_BATCH_SIZE
+            if offset == 0:
+                # Generate the keys for the next batch from a single urandom call
+                document_keys = os.urandom(16 * DEFAULT_BATCH_SIZE).hex()
+            document_key = document_keys[32 * offset : 32 * (offset + 1)]
+            yield (
+                document_key,
                 {
-                    document_key: {
-                        self._message_key: message_content,
-                        self._session_id_key: self._session_id,
-                        self._ts_key: timestamp,
-                    },
-                }
+                    self._message_key: message_to_dict(message),
+                    self._session_id_key: self._session_id,
+                    self._ts_key: base_timestamp + i * _TS_STEP,
+                },
             )
 
-        # Add the messages to the cache in batches of batch_size
+    def _log_insert_result(self, future: Future) -> None:
+        """Wait for a batch insert and log any failure"""
         try:
-            for i in range(0, len(messages_to_insert), batch_size):
-                batch = messages_to_insert[i : i + batch_size]
-                # Convert list of dictionaries to a single dictionary to insert
-                insert_batch = {list(d.keys())[0]: list(d.values())[0] for d in batch}
-                if self._ttl:
-                    self._collection.insert_multi(insert_batch, expiry=self._ttl)
-                else:
-                    self._collection.insert_multi(insert_batch)
+            result = future.result()
+            if not result.all_ok:
+                logger.error(f"Error adding messages: {result.exceptions}")
         except Exception as e:
             logger.error("Error adding messages: ", e)
 
+    def _insert_batch(self, insert_batch: Dict[str, Any]) -> Any:
+        """Insert a batch of message documents"""
+        if self._ttl:
+            return self._collection.insert_multi(
+                insert_batch, expiry=self._ttl, transcoder=self._transcoder
+            )
+        return self._collection.insert_multi(insert_batch, transcoder=self._transcoder)
+
     def clear(self) -> None:
         """Clear the cache"""
-        # Delete all documents in the collection with the session_id
-        clear_query = (
-            f"DELETE FROM `{self._collection_name}`"
-            + f"WHERE {self._session_id_key}=$session_id"
-        )
+        self.flush()
+        # Find the ids of all documents in the collection with the session_id and
+        # remove them through the KV service instead of a N1QL DELETE
         try:
-            self._scope.query(clear_query, session_id=self._session_id).execute()
+            result = self._scope.query(
+                self._clear_ids_query,
+                QueryOptions(
+                    adhoc=False,
+                    scan_consistency=QueryScanConsistency.REQUEST_PLUS,
+                ),
+                session_id=self._session_id,
+            )
+            batch: List[str] = []
+            for document_id in result:
+                batch.append(document_id)
+                if len(batch) == DEFAULT_BATCH_SIZE:
+                    self._remove_batch(batch)
+                    batch = []
+            if batch:
+                self._remove_batch(batch)
         except Exception as e:
             logger.error("Error clearing cache: ", e)
 
-    @property
-    def messages(self) -> List[BaseMessage]:
-        """Get all messages in the cache associated with the session_id"""
+    def _remove_batch(self, document_ids: List[str]) -> None:
+        """Remove a batch of message documents"""
+        result = self._collection.remove_multi(document_ids)
+        if not result.all_ok:
+            logger.error(f"Error clearing cache: {result.exceptions}")
+
+    def _build_fetch_query(self, before: bool, limit: bool) -> str:
+        """Build the statement used to fetch the messages of the session"""
         fetch_query = (
             f"SELECT {self._message_key} FROM `{self._collection_name}` "
             + f"where {self._session_id_key}=$session_id"
-            + f" ORDER BY {self._ts_key} ASC"
         )
-        message_items = []
+        if before:
+            fetch_query += f" AND {self._ts_key} < $before_ts"
+        if limit:
+            # fetch the newest messages, get_messages restores their order
+            fetch_query += f" ORDER BY {self._ts_key} DESC LIMIT $limit"
+        else:
+            fetch_query += f" ORDER BY {self._ts_key} ASC"
+        return fetch_query
+
+    def get_messages(
+        self, limit: Optional[int] = None, before_ts: Optional[float] = None
+    ) -> List[BaseMessage]:
+        """Get messages in the cache associated with the session_id
+        Args:
+            limit (Optional[int]): only return the most recent `limit` messages.
+                All messages are returned by default.
+            before_ts (Optional[float]): only return messages with a timestamp, in
+                seconds since the epoch, before this one. Can be used to page
+                back through the history.
+        Returns:
+            List[BaseMessage]: the messages, oldest first.
+        """
+        self.flush()
+        fetch_query = self._fetch_queries[(before_ts is not None, limit is not None)]
+        params: Dict[str, Any] = {"session_id": self._session_id}
+        if before_ts is not None:
+            params["before_ts"] = before_ts
+        if limit is not None:
+            params["limit"] = limit
 
         try:
-            result = self._scope.query(fetch_query, session_id=self._session_id)
-            for document in result:
-                message_items.append(document[f"{self._message_key}"])
+            result = self._scope.query(fetch_query, QueryOptions(adhoc=False), **params)
+            message_items = [document[self._message_key] for document in result]
         except Exception as e:
             logger.error("Error fetching messages: ", e)
+            return []
 
+        if limit is not None:
+            message_items.reverse()
         return messages_from_dict(message_items)
 
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Get all messages in the cache associated with the session_id"""
+        return self.get_messages()
+
     @messages.setter
     def messages(self, messages: List[BaseMessage]) -> None:
         raise NotImplementedError(
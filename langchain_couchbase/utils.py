@@ -0,0 +1,258 @@
+"""Shared helpers of the caches, vector stores and chat histories.
+
+Checking that a bucket, scope and collection exist needs management RPCs, which
+are slow compared to the work done by most callers. Successful checks and opened
+bucket handles are remembered per cluster, so creating several caches, vector
+stores or chat histories on the same collection only validates it again once
+VALIDATION_CACHE_TTL seconds have passed.
+
+The module also holds the base64 encoding of embedding vectors, and the JSON
+transcoder of the documents, which serializes with orjson when it is installed.
+"""
+
+from __future__ import annotations
+
+import base64
+import sys
+import time
+from array import array
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+from couchbase.diagnostics import PingState, ServiceType
+from couchbase.exceptions import (
+    AmbiguousTimeoutException,
+    BucketNotFoundException,
+    CollectionNotFoundException,
+    ScopeNotFoundException,
+    UnAmbiguousTimeoutException,
+)
+from couchbase.options import ExistsOptions, PingOptions
+from couchbase.serializer import DefaultJsonSerializer, Serializer
+from couchbase.transcoder import JSONTranscoder
+
+try:
+    # optional, with the orjson extra
+    import orjson
+
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+if TYPE_CHECKING:
+    from couchbase.bucket import Bucket
+    from couchbase.cluster import Cluster
+
+# How long, in seconds, a successful existence check is trusted for
+VALIDATION_CACHE_TTL = 300.0
+
+# Key probed to check that a collection exists, and the timeout of the probe
+_PROBE_KEY = "__langchain_couchbase_probe__"
+PROBE_TIMEOUT = timedelta(seconds=2)
+
+# Keyed weakly on the cluster so that entries go away with the connection.
+# Only successful checks are stored, with the time they were made: a missing
+# resource may be created later.
+_validated_resources: "WeakKeyDictionary[Cluster, Dict[Tuple[str, ...], float]]" = (
+    WeakKeyDictionary()
+)
+_bucket_handles: "WeakKeyDictionary[Cluster, Dict[str, Bucket]]" = WeakKeyDictionary()
+
+
+def _is_validated(cluster: Cluster, key: Tuple[str, ...]) -> bool:
+    """Check if the resource was validated within VALIDATION_CACHE_TTL"""
+    validated_at = _validated_resources.get(cluster, {}).get(key)
+    return (
+        validated_at is not None
+        and time.monotonic() - validated_at < VALIDATION_CACHE_TTL
+    )
+
+
+def _mark_validated(cluster: Cluster, key: Tuple[str, ...]) -> None:
+    """Remember a successful check of the resource"""
+    _validated_resources.setdefault(cluster, {})[key] = time.monotonic()
+
+
+def _invalidate(cluster: Cluster, key: Tuple[str, ...]) -> None:
+    """Forget a previous check of the resource"""
+    _validated_resources.get(cluster, {}).pop(key, None)
+
+
+def _invalidate_bucket(cluster: Cluster, bucket_name: str) -> None:
+    """Forget a previous check of the bucket, and the handle opened for it, so
+    that a handle that failed the check is not reused"""
+    _invalidate(cluster, (bucket_name,))
+    _bucket_handles.get(cluster, {}).pop(bucket_name, None)
+
+
+def get_bucket(cluster: Cluster, bucket_name: str) -> Bucket:
+    """Return a handle to the bucket, reusing one already opened on the cluster"""
+    buckets = _bucket_handles.setdefault(cluster, {})
+    bucket = buckets.get(bucket_name)
+    if bucket is None:
+        bucket = buckets[bucket_name] = cluster.bucket(bucket_name)
+    return bucket
+
+
+def check_bucket_exists(cluster: Cluster, bucket_name: str) -> bool:
+    """Check if the bucket exists in the linked Couchbase cluster"""
+    key = (bucket_name,)
+    if _is_validated(cluster, key):
+        return True
+
+    # Opening the bucket fails if it does not exist. The bucket handle is needed
+    # by the caller anyway, and a KV ping is much cheaper than fetching the
+    # bucket settings through the management API. Other errors, e.g. from the
+    # network, are raised instead of reporting the bucket as missing.
+    try:
+        bucket = get_bucket(cluster, bucket_name)
+        ping_result = bucket.ping(PingOptions(service_types=[ServiceType.KeyValue]))
+    except BucketNotFoundException:
+        _invalidate_bucket(cluster, bucket_name)
+        return False
+
+    if not any(
+        endpoint.state == PingState.OK
+        for endpoints in ping_result.endpoints.values()
+        for endpoint in endpoints
+    ):
+        _invalidate_bucket(cluster, bucket_name)
+        return False
+
+    _mark_validated(cluster, key)
+    return True
+
+
+def check_scope_and_collection_exists(
+    cluster: Cluster, bucket_name: str, scope_name: str, collection_name: str
+) -> bool:
+    """Check if the scope and collection exists in the linked Couchbase bucket
+    Raises a ValueError if either is not found"""
+    key = (bucket_name, scope_name, collection_name)
+    if _is_validated(cluster, key):
+        return True
+
+    bucket = get_bucket(cluster, bucket_name)
+
+    # A KV exists probe resolves the collection in a single round trip. It
+    # fails if the scope or collection is missing, in which case the scopes
+    # are listed below to report which one.
+    try:
+        bucket.scope(scope_name).collection(collection_name).exists(
+            _PROBE_KEY, ExistsOptions(timeout=PROBE_TIMEOUT)
+        )
+    except (ScopeNotFoundException, CollectionNotFoundException):
+        pass
+    except (AmbiguousTimeoutException, UnAmbiguousTimeoutException):
+        # The SDK may retry an unknown collection until the probe times out.
+        # Listing the scopes tells it apart from a network failure, on which
+        # the listing raises.
+        pass
+    else:
+        _mark_validated(cluster, key)
+        return True
+
+    # Find the scope, stopping at the first match
+    scope = next(
+        (
+            scope
+            for scope in bucket.collections().get_all_scopes()
+            if scope.name == scope_name
+        ),
+        None,
+    )
+
+    # Check if the scope exists
+    if scope is None:
+        _invalidate(cluster, key)
+        raise ValueError(
+            f"Scope {scope_name} not found in Couchbase bucket {bucket_name}"
+        )
+
+    # Check if the collection exists in the scope
+    if not any(c.name == collection_name for c in scope.collections):
+        _invalidate(cluster, key)
+        raise ValueError(
+            f"Collection {collection_name} not found in scope "
+            f"{scope_name} in Couchbase bucket {bucket_name}"
+        )
+
+    _mark_validated(cluster, key)
+    return True
+
+
+def check_search_index_exists(
+    cluster: Cluster,
+    index_name: str,
+    bucket_name: Optional[str] = None,
+    scope_name: Optional[str] = None,
+) -> bool:
+    """Check if the Search index exists in the linked Couchbase cluster.
+    The index is looked up in the scope if bucket_name and scope_name are given,
+    and among the cluster level indexes otherwise.
+    Raises a ValueError if the index does not exist"""
+    if bucket_name is not None and scope_name is not None:
+        key: Tuple[str, ...] = ("search_index", bucket_name, scope_name, index_name)
+    else:
+        key = ("search_index", index_name)
+    if _is_validated(cluster, key):
+        return True
+
+    if bucket_name is not None and scope_name is not None:
+        scope = get_bucket(cluster, bucket_name).scope(scope_name)
+        all_indexes = scope.search_indexes().get_all_indexes()
+    else:
+        all_indexes = cluster.search_indexes().get_all_indexes()
+
+    if not any(index.name == index_name for index in all_indexes):
+        _invalidate(cluster, key)
+        raise ValueError(
+            f"Index {index_name} does not exist. "
+            " Please create the index before searching."
+        )
+
+    _mark_validated(cluster, key)
+    return True
+
+
+def encode_vector_base64(vector: Sequence[float]) -> str:
+    """Encode the vector as base64 of its little-endian float32 values,
+    the format of the vector_base64 field type in Couchbase Search indexes.
+    NumPy arrays are converted directly from their buffer."""
+    if hasattr(vector, "astype"):
+        return base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+    values = array("f", vector)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+class OrjsonSerializer(Serializer):
+    """Serializer for the Couchbase JSON transcoder backed by orjson.
+    Values orjson rejects, such as non string dict keys, integers larger than
+    64 bits or NaN, are handled by the SDK's default json serializer."""
+
+    def __init__(self) -> None:
+        self._fallback = DefaultJsonSerializer()
+
+    def serialize(self, value: Any) -> bytes:
+        # NumPy arrays, e.g. embeddings, are written without a tolist() round trip
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+        except orjson.JSONEncodeError:
+            return self._fallback.serialize(value)
+
+    def deserialize(self, value: bytes) -> Any:
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return self._fallback.deserialize(value)
+
+
+def get_json_transcoder() -> JSONTranscoder:
+    """Return a JSON transcoder using orjson if it is installed, with the
+    SDK's default json serializer otherwise"""
+    if _HAS_ORJSON:
+        return JSONTranscoder(OrjsonSerializer())
+    return JSONTranscoder()
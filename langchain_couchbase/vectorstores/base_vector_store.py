@@ -2,23 +2,47 @@
 
 from __future__ import annotations
 
-import uuid
+import asyncio
+import contextvars
+import functools
+import itertools
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
 from typing import (
     TYPE_CHECKING,
     Any,
+    Callable,
+    Deque,
     Dict,
+    Iterator,
     List,
     Optional,
+    Tuple,
 )
 
 from couchbase.cluster import Cluster
 from couchbase.exceptions import DocumentExistsException, DocumentNotFoundException
+from couchbase.transcoder import Transcoder
 from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
 
+from langchain_couchbase.utils import (
+    check_bucket_exists,
+    check_scope_and_collection_exists,
+    get_bucket,
+    get_json_transcoder,
+)
+
 if TYPE_CHECKING:
     from collections.abc import Iterable
 
+# Put on the queue by the embedding thread in add_texts after the last batch
+_END_OF_BATCHES = object()
+
 
 class BaseCouchbaseVectorStore(VectorStore):
     """Base vector store for Couchbase.
@@ -28,47 +52,31 @@ class BaseCouchbaseVectorStore(VectorStore):
 
     # Default batch size
     DEFAULT_BATCH_SIZE = 100
+    # Default number of batches embedded and upserted concurrently in add_texts.
+    # Embedding models are not all thread safe or free of rate limits, so the
+    # batches are embedded one at a time unless the caller asks for more.
+    DEFAULT_EMBED_CONCURRENCY = 1
+    DEFAULT_UPSERT_CONCURRENCY = 1
+    # Default number of batches deleted concurrently in delete
+    DEFAULT_DELETE_CONCURRENCY = 4
+    # Number of embedded batches waiting to be upserted in add_texts
+    DEFAULT_PIPELINE_DEPTH = 2
+    # Default number of query embeddings kept when cache_embeddings is set
+    DEFAULT_EMBED_CACHE_SIZE = 128
     _metadata_key = "metadata"
     _default_text_key = "text"
     _default_embedding_key = "embedding"
 
     def _check_bucket_exists(self) -> bool:
         """Check if the bucket exists in the linked Couchbase cluster"""
-        bucket_manager = self._cluster.buckets()
-        try:
-            bucket_manager.get_bucket(self._bucket_name)
-            return True
-        except Exception:
-            return False
+        return check_bucket_exists(self._cluster, self._bucket_name)
 
     def _check_scope_and_collection_exists(self) -> bool:
         """Check if the scope and collection exists in the linked Couchbase bucket
         Raises a ValueError if either is not found"""
-        scope_collection_map: Dict[str, Any] = {}
-
-        # Get a list of all scopes in the bucket
-        for scope in self._bucket.collections().get_all_scopes():
-            scope_collection_map[scope.name] = []
-
-            # Get a list of all the collections in the scope
-            for collection in scope.collections:
-                scope_collection_map[scope.name].append(collection.name)
-
-        # Check if the scope exists
-        if self._scope_name not in scope_collection_map.keys():
-            raise ValueError(
-                f"Scope {self._scope_name} not found in Couchbase "
-                f"bucket {self._bucket_name}"
-            )
-
-        # Check if the collection exists in the scope
-        if self._collection_name not in scope_collection_map[self._scope_name]:
-            raise ValueError(
-                f"Collection {self._collection_name} not found in scope "
-                f"{self._scope_name} in Couchbase bucket {self._bucket_name}"
-            )
-
-        return True
+        return check_scope_and_collection_exists(
+            self._cluster, self._bucket_name, self._scope_name, self._collection_name
+        )
 
     def __init__(
         self,
@@ -80,6 +88,10 @@ class BaseCouchbaseVectorStore(VectorStore):
         *,
         text_key: Optional[str] = _default_text_key,
         embedding_key: Optional[str] = _default_embedding_key,
+        validate: bool = True,
+        cache_embeddings: bool = False,
+        embed_cache_size: int = DEFAULT_EMBED_CACHE_SIZE,
+        transcoder: Optional[Transcoder] = None,
     ) -> None:
         """
         Initialize the Couchbase Base Vector Store for data input and output.
@@ -98,6 +110,16 @@ class BaseCouchbaseVectorStore(VectorStore):
                 Set to embedding by default.
             scoped_index (optional[bool]): specify whether the index is a scoped index.
                 Set to True by default.
+            validate (optional[bool]): check that the bucket, scope and collection
+                exist. Set to True by default.
+            cache_embeddings (optional[bool]): keep the embeddings of recent
+                queries in an LRU cache, so repeated queries are not embedded
+                again. Set to False by default.
+            embed_cache_size (optional[int]): number of query embeddings to cache.
+                Set to 128 by default.
+            transcoder (optional[Transcoder]): transcoder used to encode the
+                documents on upsert. Set to a JSON transcoder using orjson, if it
+                is installed, by default.
         """
         if not isinstance(cluster, Cluster):
             raise ValueError(
@@ -126,15 +148,25 @@ class BaseCouchbaseVectorStore(VectorStore):
         self._text_key = text_key
         self._embedding_key = embedding_key
 
+        self._transcoder = transcoder or get_json_transcoder()
+
+        self._embed_query: Callable[[str], List[float]] = embedding.embed_query
+        if cache_embeddings:
+            cached_embed_query = functools.lru_cache(maxsize=embed_cache_size)(
+                lambda query: tuple(embedding.embed_query(query))
+            )
+            # Return a new list every time, so callers can't modify the cache
+            self._embed_query = lambda query: list(cached_embed_query(query))
+
         # Check if the bucket exists
-        if not self._check_bucket_exists():
+        if validate and not self._check_bucket_exists():
             raise ValueError(
                 f"Bucket {self._bucket_name} does not exist. "
                 " Please create the bucket before searching."
             )
 
         try:
-            self._bucket = self._cluster.bucket(self._bucket_name)
+            self._bucket = get_bucket(self._cluster, self._bucket_name)
             self._scope = self._bucket.scope(self._scope_name)
             self._collection = self._scope.collection(self._collection_name)
         except Exception as e:
@@ -144,10 +176,8 @@ class BaseCouchbaseVectorStore(VectorStore):
             ) from e
 
         # Check if the scope and collection exists. Throws ValueError if they don't
-        try:
+        if validate:
             self._check_scope_and_collection_exists()
-        except Exception as e:
-            raise e
 
     def add_texts(
         self,
@@ -168,9 +198,13 @@ class BaseCouchbaseVectorStore(VectorStore):
                 with the texts.
             ids (Optional[List[str]]): Optional list of ids associated with the texts.
                 IDs have to be unique strings across the collection.
-                If it is not specified uuids are generated and used as ids.
+                If it is not specified random ids are generated and used.
             batch_size (Optional[int]): Optional batch size for bulk insertions.
                 Default is 100.
+            embed_concurrency (int): Number of batches embedded concurrently.
+                Default is 1. Only raise it if the embedding model is thread safe.
+            upsert_concurrency (int): Number of batches upserted concurrently.
+                Default is 1.
 
         Returns:
             List[str]:List of ids from adding the texts into the vectorstore.
@@ -181,47 +215,271 @@ class BaseCouchbaseVectorStore(VectorStore):
 
         doc_ids: List[str] = []
 
-        if ids is None:
-            ids = [uuid.uuid4().hex for _ in texts]
+        # Check if TTL is provided
+        ttl = kwargs.get("ttl", None)
+
+        embed_concurrency = kwargs.get(
+            "embed_concurrency", self.DEFAULT_EMBED_CONCURRENCY
+        )
+        upsert_concurrency = kwargs.get(
+            "upsert_concurrency", self.DEFAULT_UPSERT_CONCURRENCY
+        )
+
+        batches = self._batches(texts, metadatas, ids, batch_size)
+        first_batch = next(batches, None)
+        if first_batch is None:
+            return doc_ids
+        next_batch = next(batches, None)
+        if next_batch is None:
+            # A single batch is embedded and upserted inline, without a pipeline
+            vectors = self._embedding_function.embed_documents(first_batch[1])
+            batch_docs = self._build_batch_docs(*first_batch, vectors)
+            return self._upsert_batch(batch_docs, ttl)
+        batches = itertools.chain((first_batch, next_batch), batches)
+
+        # Embedding and upserting talk to different services, so they run as a
+        # pipeline: a producer thread embeds the batches while this thread
+        # upserts the ones that are already embedded
+        embedded_batches: queue.Queue = queue.Queue(maxsize=self.DEFAULT_PIPELINE_DEPTH)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._embed_batches,
+            args=(
+                batches,
+                embedded_batches,
+                embed_concurrency,
+                stop,
+                contextvars.copy_context(),
+            ),
+            daemon=True,
+        )
+        producer.start()
+
+        upsert_futures: Deque[Future] = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=upsert_concurrency) as upsert_executor:
+                try:
+                    while True:
+                        item = embedded_batches.get()
+                        if item is _END_OF_BATCHES:
+                            break
+                        if isinstance(item, BaseException):
+                            raise item
+
+                        batch_docs = self._build_batch_docs(*item)
+                        upsert_futures.append(
+                            upsert_executor.submit(self._upsert_batch, batch_docs, ttl)
+                        )
+                        # Keep the number of batches held in memory bounded
+                        if len(upsert_futures) > upsert_concurrency:
+                            doc_ids.extend(upsert_futures.popleft().result())
+
+                    while upsert_futures:
+                        doc_ids.extend(upsert_futures.popleft().result())
+                except BaseException:
+                    # don't start the remaining batches once one has failed. This
+                    # has to run before the executor waits for them on exit.
+                    stop.set()
+                    for future in upsert_futures:
+                        future.cancel()
+                    raise
+        finally:
+            producer.join()
+
+        return doc_ids
+
+    @staticmethod
+    def _batches(
+        texts: Iterable[str],
+        metadatas: Optional[Iterable[dict]],
+        ids: Optional[Iterable[str]],
+        batch_size: int,
+    ) -> Iterator[Tuple[List[str], List[str], List[dict]]]:
+        """Split the texts into batches of (ids, texts, metadatas).
+        The texts are consumed lazily, so any iterable can be streamed in. Missing
+        ids are generated and missing metadatas filled in per batch."""
+        texts_iter = iter(texts)
+        ids_iter = None if ids is None else iter(ids)
+        metadatas_iter = None if metadatas is None else iter(metadatas)
+        while batch_texts := list(itertools.islice(texts_iter, batch_size)):
+            n = len(batch_texts)
+            if ids_iter is None:
+                # Generate the ids for the batch from a single urandom call
+                random_hex = os.urandom(16 * n).hex()
+                batch_ids = [random_hex[32 * j : 32 * (j + 1)] for j in range(n)]
+            else:
+                batch_ids = list(itertools.islice(ids_iter, n))
+            if metadatas_iter is None:
+                # A dict per document, as the transcoder or callers may change it
+                batch_metadatas: List[dict] = [{} for _ in range(n)]
+            else:
+                batch_metadatas = list(itertools.islice(metadatas_iter, n))
+            yield batch_ids, batch_texts, batch_metadatas
+
+    def _embed_batches(
+        self,
+        batches: Iterable[Tuple[List[str], List[str], List[dict]]],
+        embedded_batches: queue.Queue,
+        concurrency: int,
+        stop: threading.Event,
+        context: contextvars.Context,
+    ) -> None:
+        """Embed the batches concurrently and put them, with their embeddings, on
+        the queue in order. The queue is ended with _END_OF_BATCHES, or with the
+        exception raised while embedding.
+        The embedding calls run in copies of the caller's context, so that context
+        variables such as the callbacks of a run are seen by the model."""
+
+        def put(item: Any) -> bool:
+            # Give up if the consumer stopped, instead of blocking on a full queue
+            while not stop.is_set():
+                try:
+                    embedded_batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        pending: Deque[Tuple[Tuple[List[str], List[str], List[dict]], Future]] = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as embed_executor:
+                for batch in batches:
+                    if stop.is_set():
+                        break
+                    pending.append(
+                        (
+                            batch,
+                            embed_executor.submit(
+                                context.copy().run,
+                                self._embedding_function.embed_documents,
+                                batch[1],
+                            ),
+                        )
+                    )
+                    if len(pending) >= concurrency:
+                        batch, future = pending.popleft()
+                        if not put((*batch, future.result())):
+                            break
+
+                while pending and not stop.is_set():
+                    batch, future = pending.popleft()
+                    if not put((*batch, future.result())):
+                        break
+
+                for _, future in pending:
+                    future.cancel()
+            put(_END_OF_BATCHES)
+        except BaseException as e:
+            for _, future in pending:
+                future.cancel()
+            put(e)
+
+    def _upsert_batch(
+        self, batch_docs: Dict[str, Any], ttl: Optional[timedelta] = None
+    ) -> List[str]:
+        """Upsert a batch of documents and return their ids"""
+        try:
+            # Insert with TTL if provided
+            if ttl:
+                result = self._collection.upsert_multi(
+                    batch_docs, expiry=ttl, transcoder=self._transcoder
+                )
+            else:
+                result = self._collection.upsert_multi(
+                    batch_docs, transcoder=self._transcoder
+                )
+            if result.all_ok:
+                return list(batch_docs.keys())
+            else:
+                raise ValueError("Failed to insert documents.", result.exceptions)
+        except DocumentExistsException as e:
+            raise ValueError(f"Document already exists: {e}")
+
+    def _build_batch_docs(
+        self,
+        batch_ids: List[str],
+        batch_texts: List[str],
+        batch_metadatas: List[dict],
+        vectors: List[List[float]],
+    ) -> Dict[str, Any]:
+        """Build the documents to upsert for a batch, keyed by id"""
+        return {
+            id: {
+                self._text_key: text,
+                self._metadata_key: metadata,
+                self._embedding_key: self._encode_embedding(vector),
+            }
+            for id, text, metadata, vector in zip(
+                batch_ids, batch_texts, batch_metadatas, vectors
+            )
+        }
 
-        if metadatas is None:
-            metadatas = [{} for _ in texts]
+    def _encode_embedding(self, vector: List[float]) -> Any:
+        """Return the value stored in the document for the embedding vector.
+        Embeddings returning NumPy arrays are converted to lists in one call,
+        as the JSON serializer can't encode them."""
+        if hasattr(vector, "tolist"):
+            return vector.tolist()
+        return vector
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        batch_size: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Async version of add_texts.
+
+        The batches are embedded with aembed_documents and upserted concurrently,
+        with at most embed_concurrency batches being embedded and at most
+        upsert_concurrency batches being upserted at the same time.
+
+        Returns:
+            List[str]:List of ids from adding the texts into the vectorstore.
+        """
+        if not batch_size:
+            batch_size = self.DEFAULT_BATCH_SIZE
 
         # Check if TTL is provided
         ttl = kwargs.get("ttl", None)
 
-        # Insert in batches
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i : i + batch_size]
-            batch_metadatas = metadatas[i : i + batch_size]
-            batch_ids = ids[i : i + batch_size]
-            batch_embedded_texts = self._embedding_function.embed_documents(batch_texts)
-
-            batch_docs = {
-                id: {
-                    self._text_key: text,
-                    self._metadata_key: metadata,
-                    self._embedding_key: vector,
-                }
-                for id, text, metadata, vector in zip(
-                    batch_ids, batch_texts, batch_metadatas, batch_embedded_texts
+        embed_semaphore = asyncio.Semaphore(
+            kwargs.get("embed_concurrency", self.DEFAULT_EMBED_CONCURRENCY)
+        )
+        upsert_semaphore = asyncio.Semaphore(
+            kwargs.get("upsert_concurrency", self.DEFAULT_UPSERT_CONCURRENCY)
+        )
+        loop = asyncio.get_running_loop()
+
+        async def add_batch(
+            batch_ids: List[str], batch_texts: List[str], batch_metadatas: List[dict]
+        ) -> List[str]:
+            async with embed_semaphore:
+                vectors = await self._embedding_function.aembed_documents(batch_texts)
+            batch_docs = self._build_batch_docs(
+                batch_ids, batch_texts, batch_metadatas, vectors
+            )
+            # The collection is synchronous, so the upsert runs in the executor
+            async with upsert_semaphore:
+                return await loop.run_in_executor(
+                    None, self._upsert_batch, batch_docs, ttl
                 )
-            }
 
-            try:
-                # Insert with TTL if provided
-                if ttl:
-                    result = self._collection.upsert_multi(batch_docs, expiry=ttl)
-                else:
-                    result = self._collection.upsert_multi(batch_docs)
-                if result.all_ok:
-                    doc_ids.extend(batch_docs.keys())
-                else:
-                    raise ValueError("Failed to insert documents.", result.exceptions)
-            except DocumentExistsException as e:
-                raise ValueError(f"Document already exists: {e}")
+        tasks = [
+            asyncio.ensure_future(add_batch(*batch))
+            for batch in self._batches(texts, metadatas, ids, batch_size)
+        ]
+        try:
+            batch_results = await asyncio.gather(*tasks)
+        except BaseException:
+            # don't start the remaining batches once one has failed
+            for task in tasks:
+                task.cancel()
+            raise
 
-        return doc_ids
+        return [id for batch_ids in batch_results for id in batch_ids]
 
     def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
         """Delete documents from the vector store by ids.
@@ -229,9 +487,13 @@ class BaseCouchbaseVectorStore(VectorStore):
         Args:
             ids (List[str]): List of IDs of the documents to delete.
             batch_size (Optional[int]): Optional batch size for bulk deletions.
+            delete_concurrency (int): Number of batches deleted concurrently.
+                Default is 4.
+            kv_timeout (Optional[timedelta]): Optional timeout for each batch.
 
         Returns:
             bool: True if all the documents were deleted successfully, False otherwise.
+                All the batches are attempted even if some documents are not found.
 
         """
 
@@ -239,20 +501,35 @@ class BaseCouchbaseVectorStore(VectorStore):
             raise ValueError("No document ids provided to delete.")
 
         batch_size = kwargs.get("batch_size", self.DEFAULT_BATCH_SIZE)
-        deletion_status = True
-
-        # Delete in batches
-        for i in range(0, len(ids), batch_size):
-            batch = ids[i : i + batch_size]
-            try:
-                result = self._collection.remove_multi(batch)
-            except DocumentNotFoundException as e:
-                deletion_status = False
-                raise ValueError(f"Document not found: {e}")
+        delete_concurrency = kwargs.get(
+            "delete_concurrency", self.DEFAULT_DELETE_CONCURRENCY
+        )
+        kv_timeout = kwargs.get("kv_timeout", None)
+
+        batches = [ids[i : i + batch_size] for i in range(0, len(ids), batch_size)]
+
+        # Delete the batches concurrently
+        with ThreadPoolExecutor(max_workers=delete_concurrency) as executor:
+            results = list(
+                executor.map(
+                    lambda batch: self._remove_batch(batch, kv_timeout), batches
+                )
+            )
 
-            deletion_status &= result.all_ok
+        return all(results)
 
-        return deletion_status
+    def _remove_batch(
+        self, batch: List[str], timeout: Optional[timedelta] = None
+    ) -> bool:
+        """Remove a batch of documents and return whether all of them were removed"""
+        try:
+            if timeout:
+                result = self._collection.remove_multi(batch, timeout=timeout)
+            else:
+                result = self._collection.remove_multi(batch)
+        except DocumentNotFoundException:
+            return False
+        return result.all_ok
 
     @property
     def embeddings(self) -> Embeddings:
@@ -4,6 +4,7 @@ from enum import Enum
 from typing import Any, List, Optional, Tuple, Type
 
 from couchbase.cluster import Cluster
+from couchbase.transcoder import Transcoder
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
@@ -251,6 +252,10 @@ class CouchbaseQueryVectorStore(BaseCouchbaseVectorStore):
         *,
         text_key: Optional[str] = BaseCouchbaseVectorStore._default_text_key,
         embedding_key: Optional[str] = BaseCouchbaseVectorStore._default_embedding_key,
+        validate: bool = True,
+        cache_embeddings: bool = False,
+        embed_cache_size: int = BaseCouchbaseVectorStore.DEFAULT_EMBED_CACHE_SIZE,
+        transcoder: Optional[Transcoder] = None,
     ):
         super().__init__(
             cluster=cluster,
@@ -260,6 +265,10 @@ class CouchbaseQueryVectorStore(BaseCouchbaseVectorStore):
             embedding=embedding,
             text_key=text_key,
             embedding_key=embedding_key,
+            validate=validate,
+            cache_embeddings=cache_embeddings,
+            embed_cache_size=embed_cache_size,
+            transcoder=transcoder,
         )
         self._distance_metric = distance_metric
 
@@ -293,7 +302,7 @@ class CouchbaseQueryVectorStore(BaseCouchbaseVectorStore):
         Returns:
             List of Documents most similar to the query.
         """
-        query_embedding = self.embeddings.embed_query(query)
+        query_embedding = self._embed_query(query)
         docs_with_scores = self.similarity_search_with_score_by_vector(
             query_embedding, k, where_str, **kwargs
         )
@@ -402,7 +411,7 @@ class CouchbaseQueryVectorStore(BaseCouchbaseVectorStore):
             List of (Document, distance) that are most similar to the query. Lower
             distances are more similar.
         """
-        query_embedding = self.embeddings.embed_query(query)
+        query_embedding = self._embed_query(query)
         docs_with_score = self.similarity_search_with_score_by_vector(
             query_embedding, k, where_str, **kwargs
         )
@@ -1,17 +1,44 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
 
 import couchbase.search as search
 from couchbase.cluster import Cluster
 from couchbase.options import SearchOptions
-from couchbase.search import SearchQuery
+from couchbase.result import SearchResult
+from couchbase.search import SearchQuery, SearchRow
+from couchbase.transcoder import Transcoder
 from couchbase.vector_search import VectorQuery, VectorSearch
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
+from langchain_couchbase.utils import (
+    check_search_index_exists,
+    encode_vector_base64,
+)
 from langchain_couchbase.vectorstores.base_vector_store import BaseCouchbaseVectorStore
 
+# Marks that the embedding dimensions have not been read from the index yet
+_DIM_NOT_FETCHED = object()
+
+
+def _find_vector_dims(mapping: Dict[str, Any], field_path: str) -> Optional[int]:
+    """Find the dimensions of the vector field at field_path (dot separated) in
+    a Search index mapping. Returns None if the field is not found."""
+    path = field_path.split(".")
+    type_mappings = list(mapping.get("types", {}).values())
+    type_mappings.append(mapping.get("default_mapping", {}))
+    for type_mapping in type_mappings:
+        properties = type_mapping
+        for name in path[:-1]:
+            properties = properties.get("properties", {}).get(name, {})
+        leaf = properties.get("properties", {}).get(path[-1], {})
+        for field in leaf.get("fields", []):
+            if field.get("type") in ("vector", "vector_base64") and "dims" in field:
+                return int(field["dims"])
+    return None
+
 
 class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
     """__Couchbase__ vector store integration using Search Vector Index.
@@ -181,30 +208,28 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
             [Document(id='2', metadata={'bar': 'baz'}, page_content='thud')]
     """  # noqa: E501
 
+    # Number of distinct SearchOptions kept for searches without search_options
+    SEARCH_OPTIONS_CACHE_SIZE = 128
+    # Largest number of results a search can request
+    MAX_K = 10000
+    # Default number of searches run concurrently by the batch searches
+    DEFAULT_SEARCH_CONCURRENCY = 8
+
     def _check_index_exists(self) -> bool:
         """Check if the Search index exists in the linked Couchbase cluster
         Raises a ValueError if the index does not exist"""
         if self._scoped_index:
-            all_indexes = [
-                index.name for index in self._scope.search_indexes().get_all_indexes()
-            ]
-            if self._index_name not in all_indexes:
-                raise ValueError(
-                    f"Index {self._index_name} does not exist. "
-                    " Please create the index before searching."
-                )
-        else:
-            all_indexes = [
-                index.name for index in self._cluster.search_indexes().get_all_indexes()
-            ]
-            if self._index_name not in all_indexes:
-                raise ValueError(
-                    f"Index {self._index_name} does not exist. "
-                    " Please create the index before searching."
-                )
+            return check_search_index_exists(
+                self._cluster, self._index_name, self._bucket_name, self._scope_name
+            )
+        return check_search_index_exists(self._cluster, self._index_name)
+
+    def _encode_embedding(self, vector: List[float]) -> Any:
+        """Return the value stored in the document for the embedding vector"""
+        if self._base64_embeddings:
+            return encode_vector_base64(vector)
+        return super()._encode_embedding(vector)
 
-        return True
-    
     def _check_filter(self, filter: SearchQuery) -> bool:
         """Check if the filter is a valid SearchQuery object.
         Raises a ValueError if the filter is not valid."""
@@ -225,6 +250,11 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
         text_key: Optional[str] = BaseCouchbaseVectorStore._default_text_key,
         embedding_key: Optional[str] = BaseCouchbaseVectorStore._default_embedding_key,
         scoped_index: bool = True,
+        validate: bool = True,
+        cache_embeddings: bool = False,
+        embed_cache_size: int = BaseCouchbaseVectorStore.DEFAULT_EMBED_CACHE_SIZE,
+        transcoder: Optional[Transcoder] = None,
+        base64_embeddings: bool = False,
     ) -> None:
         """
         Initialize the Couchbase SearchVector Store.
@@ -243,6 +273,22 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
                 Set to embedding by default.
             scoped_index (optional[bool]): specify whether the index is a scoped index.
                 Set to True by default.
+            validate (optional[bool]): check that the bucket, scope, collection
+                and index exist, and that the query embeddings have the
+                dimensions of the index. Set to False to skip the checks, in
+                which case errors surface on first use. Set to True by default.
+            cache_embeddings (optional[bool]): keep the embeddings of recent
+                queries in an LRU cache, so repeated queries are not embedded
+                again. Set to False by default.
+            embed_cache_size (optional[int]): number of query embeddings to cache.
+                Set to 128 by default.
+            base64_embeddings (optional[bool]): store the embeddings as base64
+                encoded float32 values instead of JSON arrays, which are several
+                times larger. The embedding field must be mapped with the
+                vector_base64 type in the Search index. Set to False by default.
+            transcoder (optional[Transcoder]): transcoder used to encode the
+                documents on upsert. Set to a JSON transcoder using orjson, if it
+                is installed, by default.
         """
         super().__init__(
             cluster=cluster,
@@ -252,6 +298,10 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
             embedding=embedding,
             text_key=text_key,
             embedding_key=embedding_key,
+            validate=validate,
+            cache_embeddings=cache_embeddings,
+            embed_cache_size=embed_cache_size,
+            transcoder=transcoder,
         )
 
         if not index_name:
@@ -259,12 +309,22 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
 
         self._index_name = index_name
         self._scoped_index = scoped_index
+        self._metadata_prefix = self._metadata_key + "."
+        self._metadata_prefix_len = len(self._metadata_prefix)
+        self._base64_embeddings = base64_embeddings
+        # Dimensions of the embedding field, fetched from the index on first search.
+        # Without validation the index is not fetched and the check is skipped.
+        self._embedding_dim: Any = _DIM_NOT_FETCHED if validate else None
+
+        # Scoped indexes are searched through the scope, others through the cluster
+        self._search = self._scope.search if scoped_index else self._cluster.search
+        self._search_options_cache: Dict[
+            Tuple[int, Tuple[str, ...]], SearchOptions
+        ] = {}
 
         # Check if the index exists. Throws ValueError if it doesn't
-        try:
+        if validate:
             self._check_index_exists()
-        except Exception as e:
-            raise e
 
     def _format_metadata(self, row_fields: Dict[str, Any]) -> Dict[str, Any]:
         """Helper method to format the metadata from the Couchbase Search API.
@@ -274,23 +334,80 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
         Returns:
             Dict[str, Any]: The formatted metadata.
         """
-        metadata = {}
-        for key, value in row_fields.items():
-            # Couchbase Search returns the metadata key with a prefix
-            # `metadata.` We remove it to get the original metadata key
-            if key.startswith(self._metadata_key):
-                new_key = key.split(self._metadata_key + ".")[-1]
-                metadata[new_key] = value
-            else:
-                metadata[key] = value
-
-        return metadata
+        # Couchbase Search returns the metadata key with a prefix
+        # `metadata.` We remove it to get the original metadata key
+        prefix = self._metadata_prefix
+        prefix_len = self._metadata_prefix_len
+        return {
+            (key[prefix_len:] if key.startswith(prefix) else key): value
+            for key, value in row_fields.items()
+        }
+
+    def _get_embedding_dim(self) -> Optional[int]:
+        """Return the dimensions of the embedding field in the Search index.
+        The index definition is only fetched on the first call. None is returned
+        if the dimensions can't be determined, in which case no check is done."""
+        if self._embedding_dim is _DIM_NOT_FETCHED:
+            try:
+                if self._scoped_index:
+                    index = self._scope.search_indexes().get_index(self._index_name)
+                else:
+                    index = self._cluster.search_indexes().get_index(self._index_name)
+                self._embedding_dim = _find_vector_dims(
+                    index.params.get("mapping", {}), self._embedding_key or ""
+                )
+            except Exception:
+                self._embedding_dim = None
+        return self._embedding_dim
+
+    def _get_search_options(
+        self,
+        k: int,
+        fields: Tuple[str, ...],
+        search_options: Optional[Dict[str, Any]],
+    ) -> SearchOptions:
+        """Return the SearchOptions for the search.
+        Without hybrid search options, the SearchOptions only depend on k and the
+        fields, and are reused across searches."""
+        if search_options:
+            return SearchOptions(limit=k, fields=list(fields), raw=search_options)
+
+        key = (k, fields)
+        options = self._search_options_cache.get(key)
+        if options is None:
+            if len(self._search_options_cache) >= self.SEARCH_OPTIONS_CACHE_SIZE:
+                self._search_options_cache.clear()
+            options = self._search_options_cache[key] = SearchOptions(
+                limit=k, fields=list(fields)
+            )
+        return options
+
+    def _row_to_doc(self, row: SearchRow) -> Tuple[Document, float]:
+        """Convert a row from the Couchbase Search API to a document and its score.
+        The text is read without modifying the row, and the remaining fields are
+        formatted as the metadata by _format_metadata."""
+        fields = row.fields
+        if not fields:
+            raise ValueError(
+                "Search results do not contain the fields from the document. "
+                "Please check if the Search index contains the required fields:"
+                f"{self._text_key}"
+            )
+
+        text_key = self._text_key
+        metadata = self._format_metadata(
+            {key: value for key, value in fields.items() if key != text_key}
+        )
+        doc = Document(
+            id=row.id, page_content=fields.get(text_key, ""), metadata=metadata
+        )
+        return doc, row.score
 
     def similarity_search(
         self,
         query: str,
         k: int = 4,
-        search_options: Optional[Dict[str, Any]] = {},
+        search_options: Optional[Dict[str, Any]] = None,
         filter: Optional[SearchQuery] = None,
         **kwargs: Any,
     ) -> List[Document]:
@@ -304,7 +421,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
                 that are passed to Couchbase Search Vector Index. Used for combining vector 
                 similarity with text-based search criteria. 
                 
-                Defaults to empty dictionary.
+                Defaults to None.
                 
                 Examples:
 
@@ -342,7 +459,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
             - Both parameters can be used together for complex search scenarios
 
         """  # noqa: E501
-        query_embedding = self.embeddings.embed_query(query)
+        query_embedding = self._embed_query(query)
         docs_with_scores = self.similarity_search_with_score_by_vector(
             query_embedding, k, search_options, filter, **kwargs
         )
@@ -352,7 +469,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
         self,
         embedding: List[float],
         k: int = 4,
-        search_options: Optional[Dict[str, Any]] = {},
+        search_options: Optional[Dict[str, Any]] = None,
         filter: Optional[SearchQuery] = None,
         **kwargs: Any,
     ) -> List[Tuple[Document, float]]:
@@ -366,7 +483,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
                 that are passed to Couchbase Search Vector Index. Used for combining vector 
                 similarity with text-based search criteria. 
 
-                Defaults to empty dictionary.
+                Defaults to None.
                 
                 Examples:
 
@@ -406,6 +523,44 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
             - Both parameters can be used together for complex search scenarios
         """  # noqa: E501
 
+        return list(
+            self.similarity_search_with_score_by_vector_iter(
+                embedding, k, search_options, filter, **kwargs
+            )
+        )
+
+    def similarity_search_with_score_by_vector_iter(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        search_options: Optional[Dict[str, Any]] = None,
+        filter: Optional[SearchQuery] = None,
+        **kwargs: Any,
+    ) -> Iterator[Tuple[Document, float]]:
+        """Lazy version of similarity_search_with_score_by_vector.
+
+        The arguments are validated and the search is sent when this is called,
+        but each (Document, score) is only built as the caller iterates, so
+        callers that stop early don't pay for the remaining rows.
+
+        Returns:
+            Iterator of (Document, score) that are the most similar to the query
+            vector.
+        """
+        if k <= 0:
+            return iter(())
+        if k > self.MAX_K:
+            raise ValueError(f"k must be at most {self.MAX_K}, got {k}")
+
+        # Fail fast on embeddings that can't match the vectors in the index
+        embedding_dim = self._get_embedding_dim()
+        if embedding_dim is not None and len(embedding) != embedding_dim:
+            raise ValueError(
+                f"Embedding has {len(embedding)} dimensions, but the field "
+                f"{self._embedding_key} in index {self._index_name} has "
+                f"{embedding_dim} dimensions."
+            )
+
         fields = kwargs.get("fields", ["*"])
 
         if filter:
@@ -414,9 +569,12 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
             except Exception as e:
                 raise ValueError(f"Invalid filter: {e}")
 
-        # Document text field needs to be returned from the search
-        if fields != ["*"] and self._text_key not in fields:
-            fields.append(self._text_key)
+        # Document text field needs to be returned from the search. The caller's
+        # list is left untouched, as it may be reused across searches
+        text_key = self._text_key
+        search_fields: Tuple[str, ...] = tuple(fields)
+        if text_key and search_fields != ("*",) and text_key not in search_fields:
+            search_fields += (text_key,)
 
         vector_query = VectorQuery(
             self._embedding_key,
@@ -432,54 +590,31 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
         )
 
         try:
-            if self._scoped_index:
-                search_iter = self._scope.search(
-                    self._index_name,
-                    search_req,
-                    SearchOptions(
-                        limit=k,
-                        fields=fields,
-                        raw=search_options,
-                    ),
-                )
-
-            else:
-                search_iter = self._cluster.search(
-                    self._index_name,
-                    search_req,
-                    SearchOptions(limit=k, fields=fields, raw=search_options),
-                )
+            search_iter = self._search(
+                self._index_name,
+                search_req,
+                self._get_search_options(k, search_fields, search_options),
+            )
+        except Exception as e:
+            raise ValueError(f"Search failed with error: {e}")
 
-            docs_with_score = []
+        return self._iter_docs_with_score(search_iter)
 
-            # Parse the results
+    def _iter_docs_with_score(
+        self, search_iter: SearchResult
+    ) -> Iterator[Tuple[Document, float]]:
+        """Yield the documents and scores from the search result as rows arrive"""
+        try:
             for row in search_iter.rows():
-                if row.fields:
-                    text = row.fields.pop(self._text_key, "")
-                    id = row.id
-
-                    # Format the metadata from Couchbase
-                    metadata = self._format_metadata(row.fields)
-
-                    score = row.score
-                    doc = Document(id=id, page_content=text, metadata=metadata)
-                    docs_with_score.append((doc, score))
-                else:
-                    raise ValueError(
-                        "Search results do not contain the fields from the document. "
-                        "Please check if the Search index contains the required fields:"
-                        f"{self._text_key}"
-                    )
+                yield self._row_to_doc(row)
         except Exception as e:
             raise ValueError(f"Search failed with error: {e}")
 
-        return docs_with_score
-
     def similarity_search_with_score(
         self,
         query: str,
         k: int = 4,
-        search_options: Optional[Dict[str, Any]] = {},
+        search_options: Optional[Dict[str, Any]] = None,
         filter: Optional[SearchQuery] = None,
         **kwargs: Any,
     ) -> List[Tuple[Document, float]]:
@@ -493,7 +628,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
                 that are passed to Couchbase Search Vector Index. Used for combining vector 
                 similarity with text-based search criteria. 
 
-                Defaults to empty dictionary.
+                Defaults to None.
                 
                 Examples:
 
@@ -532,7 +667,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
             - Use ``filter`` for efficient pre-search filtering, especially with large datasets
             - Both parameters can be used together for complex search scenarios
         """  # noqa: E501
-        query_embedding = self.embeddings.embed_query(query)
+        query_embedding = self._embed_query(query)
         docs_with_score = self.similarity_search_with_score_by_vector(
             query_embedding, k, search_options, filter, **kwargs
         )
@@ -542,7 +677,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
         self,
         embedding: List[float],
         k: int = 4,
-        search_options: Optional[Dict[str, Any]] = {},
+        search_options: Optional[Dict[str, Any]] = None,
         filter: Optional[SearchQuery] = None,
         **kwargs: Any,
     ) -> List[Document]:
@@ -556,7 +691,7 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
                 that are passed to Couchbase Search Vector Index. Used for combining vector 
                 similarity with text-based search criteria. 
                 
-                Defaults to empty dictionary.
+                Defaults to None.
                 
                 Examples:
 
@@ -598,6 +733,83 @@ class CouchbaseSearchVectorStore(BaseCouchbaseVectorStore):
         )
         return [doc for doc, _ in docs_with_score]
 
+    def similarity_search_with_score_by_vector_batch(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        search_options: Optional[Dict[str, Any]] = None,
+        filter: Optional[SearchQuery] = None,
+        **kwargs: Any,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Return docs most similar to each of the embedding vectors with their
+        scores. The searches run concurrently instead of one after the other.
+
+        Args:
+            embeddings (List[List[float]]): Embedding vectors to look up documents
+                similar to.
+            k (int): Number of Documents to return for each vector.
+                Defaults to 4.
+            search_options (Optional[Dict[str, Any]]): Optional hybrid search
+                options, as in similarity_search_with_score_by_vector.
+            filter (Optional[SearchQuery]): Optional filter to apply before
+                vector search execution, as in similarity_search_with_score_by_vector.
+            search_concurrency (int): Number of searches run concurrently.
+                Defaults to 8.
+            fields (Optional[List[str]]): Optional list of fields to include in the
+                metadata of results.
+
+        Returns:
+            List of lists of (Document, score), in the order of the embeddings.
+        """
+        search_concurrency = kwargs.pop(
+            "search_concurrency", self.DEFAULT_SEARCH_CONCURRENCY
+        )
+
+        def search_vector(embedding: List[float]) -> List[Tuple[Document, float]]:
+            return self.similarity_search_with_score_by_vector(
+                embedding, k, search_options, filter, **kwargs
+            )
+
+        with ThreadPoolExecutor(max_workers=search_concurrency) as executor:
+            return list(executor.map(search_vector, embeddings))
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        search_options: Optional[Dict[str, Any]] = None,
+        filter: Optional[SearchQuery] = None,
+        **kwargs: Any,
+    ) -> List[List[Document]]:
+        """Return documents most similar to each of the queries. The queries are
+        embedded and searched concurrently instead of one after the other.
+
+        Args:
+            queries (List[str]): Queries to look up similar documents for.
+            k (int): Number of Documents to return for each query.
+                Defaults to 4.
+            search_options (Optional[Dict[str, Any]]): Optional hybrid search
+                options, as in similarity_search.
+            filter (Optional[SearchQuery]): Optional filter to apply before
+                vector search execution, as in similarity_search.
+            search_concurrency (int): Number of queries run concurrently.
+                Defaults to 8.
+            fields (Optional[List[str]]): Optional list of fields to include in the
+                metadata of results.
+
+        Returns:
+            List of lists of Documents, in the order of the queries.
+        """
+        search_concurrency = kwargs.pop(
+            "search_concurrency", self.DEFAULT_SEARCH_CONCURRENCY
+        )
+
+        def search_query(query: str) -> List[Document]:
+            return self.similarity_search(query, k, search_options, filter, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=search_concurrency) as executor:
+            return list(executor.map(search_query, queries))
+
     @classmethod
     def _from_kwargs(
         cls: Type[CouchbaseSearchVectorStore],
@@ -1,14 +1,10 @@
 """Test Couchbase Cache functionality"""
 
 import os
-import time
 from datetime import datetime, timedelta
-from typing import Any
 
 import pytest
-from couchbase.auth import PasswordAuthenticator
 from couchbase.cluster import Cluster
-from couchbase.options import ClusterOptions
 from langchain_core.globals import get_llm_cache, set_llm_cache
 from langchain_core.outputs import Generation
 
@@ -17,8 +13,10 @@ from tests.utils import (
     FakeEmbeddings,
     FakeLLM,
     cache_key_hash_function,
+    connect_cluster,
     fetch_document_expiry_time,
     get_document_keys,
+    wait_until,
 )
 
 CONNECTION_STRING = os.getenv("COUCHBASE_CONNECTION_STRING", "")
@@ -31,7 +29,11 @@ SEMANTIC_CACHE_COLLECTION_NAME = os.getenv(
 USERNAME = os.getenv("COUCHBASE_USERNAME", "")
 PASSWORD = os.getenv("COUCHBASE_PASSWORD", "")
 INDEX_NAME = os.getenv("COUCHBASE_SEMANTIC_CACHE_INDEX_NAME", "")
-SLEEP_DURATION = 1
+# Upper bound, in seconds, on polling for documents to be indexed
+WAIT_TIMEOUT = 5
+
+# Shared by all the tests, the embeddings do not depend on any state
+EMBEDDINGS = FakeEmbeddings()
 
 
 def set_all_env_vars() -> bool:
@@ -49,31 +51,27 @@ def set_all_env_vars() -> bool:
     )
 
 
-def get_cluster() -> Any:
-    """Get a couchbase cluster object"""
-    auth = PasswordAuthenticator(USERNAME, PASSWORD)
-    options = ClusterOptions(auth)
-    options.apply_profile("wan_development")
-    connect_string = CONNECTION_STRING
-    cluster = Cluster(connect_string, options)
+pytestmark = pytest.mark.couchbase
+
+# All the tests of the module need a cluster, so the whole module is skipped
+# before its fixtures and tests are collected
+if not set_all_env_vars():
+    pytest.skip("Missing Couchbase environment variables", allow_module_level=True)
 
-    # Wait until the cluster is ready for use.
-    cluster.wait_until_ready(timedelta(seconds=5))
 
-    return cluster
+def get_cluster() -> Cluster:
+    """Get a couchbase cluster object, reusing the connection across tests"""
+    return connect_cluster(CONNECTION_STRING, USERNAME, PASSWORD)
 
 
-@pytest.fixture()
-def cluster() -> Any:
+@pytest.fixture(scope="module")
+def cluster() -> Cluster:
     """Get a couchbase cluster object"""
     return get_cluster()
 
 
-@pytest.mark.skipif(
-    not set_all_env_vars(), reason="Missing Couchbase environment variables"
-)
 class TestCouchbaseCache:
-    def test_cache(self, cluster: Any) -> None:
+    def test_cache(self, cluster: Cluster) -> None:
         """Test standard LLM cache functionality"""
         set_llm_cache(
             CouchbaseCache(
@@ -97,7 +95,7 @@ class TestCouchbaseCache:
         output = get_llm_cache().lookup("bar", llm_string)
         assert output != [Generation(text="fizz")]
 
-    def test_cache_with_ttl(self, cluster: Any) -> None:
+    def test_cache_with_ttl(self, cluster: Cluster) -> None:
         """Test standard LLM cache functionality with TTL"""
         ttl = timedelta(minutes=10)
         set_llm_cache(
@@ -130,12 +128,12 @@ class TestCouchbaseCache:
 
         assert time_to_expiry < ttl
 
-    def test_semantic_cache(self, cluster: Any) -> None:
+    def test_semantic_cache(self, cluster: Cluster) -> None:
         """Test semantic LLM cache functionality"""
         set_llm_cache(
             CouchbaseSemanticCache(
                 cluster=cluster,
-                embedding=FakeEmbeddings(),
+                embedding=EMBEDDINGS,
                 index_name=INDEX_NAME,
                 bucket_name=BUCKET_NAME,
                 scope_name=SCOPE_NAME,
@@ -153,27 +151,33 @@ class TestCouchbaseCache:
         )
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
         # foo and bar will have the same embedding produced by FakeEmbeddings
-        cache_output = get_llm_cache().lookup("bar", llm_string)
-        assert cache_output == [Generation(text="fizz"), Generation(text="Buzz")]
+        expected = [Generation(text="fizz"), Generation(text="Buzz")]
+        cache_output = wait_until(
+            lambda: get_llm_cache().lookup("bar", llm_string),
+            lambda output: output == expected,
+            timeout=WAIT_TIMEOUT,
+        )
+        assert cache_output == expected
 
         # clear the cache
         get_llm_cache().clear()
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = get_llm_cache().lookup("bar", llm_string)
-        assert output != [Generation(text="fizz"), Generation(text="Buzz")]
+        # Wait for the deletion to be indexed
+        output = wait_until(
+            lambda: get_llm_cache().lookup("bar", llm_string),
+            lambda output: output != expected,
+            timeout=WAIT_TIMEOUT,
+        )
+        assert output != expected
 
-    def test_semantic_cache_with_ttl(self, cluster: Any) -> None:
+    def test_semantic_cache_with_ttl(self, cluster: Cluster) -> None:
         """Test semantic LLM cache functionality with TTL"""
         ttl = timedelta(minutes=10)
 
         set_llm_cache(
             CouchbaseSemanticCache(
                 cluster=cluster,
-                embedding=FakeEmbeddings(),
+                embedding=EMBEDDINGS,
                 index_name=INDEX_NAME,
                 bucket_name=BUCKET_NAME,
                 scope_name=SCOPE_NAME,
@@ -195,11 +199,14 @@ class TestCouchbaseCache:
         )
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
         # foo and bar will have the same embedding produced by FakeEmbeddings
-        cache_output = get_llm_cache().lookup("bar", llm_string)
-        assert cache_output == [Generation(text="fizz"), Generation(text="Buzz")]
+        expected = [Generation(text="fizz"), Generation(text="Buzz")]
+        cache_output = wait_until(
+            lambda: get_llm_cache().lookup("bar", llm_string),
+            lambda output: output == expected,
+            timeout=WAIT_TIMEOUT,
+        )
+        assert cache_output == expected
 
         # Check the document's expiry time by fetching it from the database
         fetch_document_query = (
@@ -207,11 +214,16 @@ class TestCouchbaseCache:
             f"WHERE doc.text = '{seed_prompt}'"
         )
 
-        document_keys = get_document_keys(
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            query=fetch_document_query,
+        # The query index is updated separately from the search index
+        document_keys = wait_until(
+            lambda: get_document_keys(
+                cluster=cluster,
+                bucket_name=BUCKET_NAME,
+                scope_name=SCOPE_NAME,
+                query=fetch_document_query,
+            ),
+            lambda keys: len(keys) == 1,
+            timeout=WAIT_TIMEOUT,
         )
         assert len(document_keys) == 1
 
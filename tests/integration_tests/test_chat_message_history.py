@@ -1,19 +1,22 @@
 """Test Couchbase Chat Message History functionality"""
 
 import os
-import time
 from datetime import datetime, timedelta
-from typing import Any
+from typing import List
 
 import pytest
-from couchbase.auth import PasswordAuthenticator
 from couchbase.cluster import Cluster
-from couchbase.options import ClusterOptions
 from langchain_classic.memory import ConversationBufferMemory
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 
 from langchain_couchbase.chat_message_histories import CouchbaseChatMessageHistory
-from tests.utils import fetch_document_expiry_time, get_document_keys
+from tests.utils import (
+    connect_cluster,
+    fetch_document_expiry_time,
+    get_document_keys,
+    wait_until,
+)
 
 CONNECTION_STRING = os.getenv("COUCHBASE_CONNECTION_STRING", "")
 BUCKET_NAME = os.getenv("COUCHBASE_BUCKET_NAME", "")
@@ -23,7 +26,9 @@ MESSAGE_HISTORY_COLLECTION_NAME = os.getenv(
 )
 USERNAME = os.getenv("COUCHBASE_USERNAME", "")
 PASSWORD = os.getenv("COUCHBASE_PASSWORD", "")
-SLEEP_DURATION = 0.2
+# Upper bound, in seconds, on polling for written messages to be visible to
+# queries
+WAIT_TIMEOUT = 5
 
 
 def set_all_env_vars() -> bool:
@@ -40,31 +45,39 @@ def set_all_env_vars() -> bool:
     )
 
 
-def get_cluster() -> Any:
-    """Get a couchbase cluster object"""
-    auth = PasswordAuthenticator(USERNAME, PASSWORD)
-    options = ClusterOptions(auth)
-    options.apply_profile("wan_development")
-    connect_string = CONNECTION_STRING
-    cluster = Cluster(connect_string, options)
+pytestmark = pytest.mark.couchbase
 
-    # Wait until the cluster is ready for use.
-    cluster.wait_until_ready(timedelta(seconds=5))
+# All the tests of the module need a cluster, so the whole module is skipped
+# before its fixtures and tests are collected
+if not set_all_env_vars():
+    pytest.skip("Missing Couchbase environment variables", allow_module_level=True)
 
-    return cluster
 
+def get_cluster() -> Cluster:
+    """Get a couchbase cluster object, reusing the connection across tests"""
+    return connect_cluster(CONNECTION_STRING, USERNAME, PASSWORD)
 
-@pytest.fixture()
-def cluster() -> Any:
+
+@pytest.fixture(scope="module")
+def cluster() -> Cluster:
     """Get a couchbase cluster object"""
     return get_cluster()
 
 
-@pytest.mark.skipif(
-    not set_all_env_vars(), reason="Missing Couchbase environment variables"
-)
+def wait_for_messages(
+    message_history: BaseChatMessageHistory, count: int
+) -> List[BaseMessage]:
+    """Wait until the session has count messages, as they are fetched through a
+    query that does not wait for the index. Returns the last messages fetched"""
+    return wait_until(
+        lambda: message_history.messages,
+        lambda messages: len(messages) == count,
+        timeout=WAIT_TIMEOUT,
+    )
+
+
 class TestCouchbaseCache:
-    def test_memory_with_message_store(self, cluster: Any) -> None:
+    def test_memory_with_message_store(self, cluster: Cluster) -> None:
         """Test chat message history with a message store"""
 
         message_history = CouchbaseChatMessageHistory(
@@ -83,8 +96,7 @@ class TestCouchbaseCache:
         memory.chat_memory.clear()
 
         # wait for the messages to be cleared
-        time.sleep(SLEEP_DURATION)
-        assert memory.chat_memory.messages == []
+        assert wait_for_messages(memory.chat_memory, 0) == []
 
         # add some messages
         ai_message = AIMessage(content="Hello, how are you doing ?")
@@ -92,10 +104,9 @@ class TestCouchbaseCache:
         memory.chat_memory.add_messages([ai_message, user_message])
 
         # wait until the messages can be retrieved
-        time.sleep(SLEEP_DURATION)
+        messages = wait_for_messages(memory.chat_memory, 2)
 
         # check that the messages are in the memory
-        messages = memory.chat_memory.messages
         assert len(messages) == 2
 
         # check that the messages are in the order of creation
@@ -103,10 +114,9 @@ class TestCouchbaseCache:
 
         # clear the memory
         memory.chat_memory.clear()
-        time.sleep(SLEEP_DURATION)
-        assert memory.chat_memory.messages == []
+        assert wait_for_messages(memory.chat_memory, 0) == []
 
-    def test_memory_with_separate_sessions(self, cluster: Any) -> None:
+    def test_memory_with_separate_sessions(self, cluster: Cluster) -> None:
         """Test the chat message history with multiple sessions"""
 
         message_history_a = CouchbaseChatMessageHistory(
@@ -143,11 +153,10 @@ class TestCouchbaseCache:
         memory_b.chat_memory.add_user_message(user_message)
 
         # wait until the messages can be retrieved
-        time.sleep(SLEEP_DURATION)
+        messages_a = wait_for_messages(memory_a.chat_memory, 1)
+        messages_b = wait_for_messages(memory_b.chat_memory, 1)
 
         # check that the messages are in the memory
-        messages_a = memory_a.chat_memory.messages
-        messages_b = memory_b.chat_memory.messages
         assert len(messages_a) == 1
         assert len(messages_b) == 1
         assert messages_a == [ai_message]
@@ -155,17 +164,15 @@ class TestCouchbaseCache:
 
         # clear the memory
         memory_a.chat_memory.clear()
-        time.sleep(SLEEP_DURATION)
         # ensure that only the session that is cleared is empty
-        assert memory_a.chat_memory.messages == []
+        assert wait_for_messages(memory_a.chat_memory, 0) == []
         assert memory_b.chat_memory.messages == [user_message]
 
         # clear the other session's memory
         memory_b.chat_memory.clear()
-        time.sleep(SLEEP_DURATION)
-        assert memory_b.chat_memory.messages == []
+        assert wait_for_messages(memory_b.chat_memory, 0) == []
 
-    def test_memory_message_with_ttl(self, cluster: Any) -> None:
+    def test_memory_message_with_ttl(self, cluster: Cluster) -> None:
         """Test chat message history with a message being saved with a TTL"""
         ttl = timedelta(minutes=5)
         session_id = "test-session-ttl"
@@ -186,18 +193,16 @@ class TestCouchbaseCache:
         memory.chat_memory.clear()
 
         # wait for the messages to be cleared
-        time.sleep(SLEEP_DURATION)
-        assert memory.chat_memory.messages == []
+        assert wait_for_messages(memory.chat_memory, 0) == []
 
         # add some messages
         ai_message = AIMessage(content="Hello, how are you doing ?")
         memory.chat_memory.add_ai_message(ai_message)
 
         # wait until the messages can be retrieved
-        time.sleep(SLEEP_DURATION)
+        messages = wait_for_messages(memory.chat_memory, 1)
 
         # check that the messages are in the memory
-        messages = memory.chat_memory.messages
         assert len(messages) == 1
 
         # check that the messages are in the order of creation
@@ -229,7 +234,7 @@ class TestCouchbaseCache:
         current_time = datetime.now()
         assert document_expiry_time - current_time < ttl
 
-    def test_memory_messages_with_ttl(self, cluster: Any) -> None:
+    def test_memory_messages_with_ttl(self, cluster: Cluster) -> None:
         """Test chat message history with messages being stored with a TTL"""
         ttl = timedelta(minutes=5)
         session_id = "test-session-ttl"
@@ -250,8 +255,7 @@ class TestCouchbaseCache:
         memory.chat_memory.clear()
 
         # wait for the messages to be cleared
-        time.sleep(SLEEP_DURATION)
-        assert memory.chat_memory.messages == []
+        assert wait_for_messages(memory.chat_memory, 0) == []
 
         # add some messages
         ai_message = AIMessage(content="Hello, how are you doing ?")
@@ -259,10 +263,9 @@ class TestCouchbaseCache:
         memory.chat_memory.add_messages([ai_message, user_message])
 
         # wait until the messages can be retrieved
-        time.sleep(SLEEP_DURATION)
+        messages = wait_for_messages(memory.chat_memory, 2)
 
         # check that the messages are in the memory
-        messages = memory.chat_memory.messages
         assert len(messages) == 2
 
         # check that the messages are in the order of creation
@@ -293,3 +296,36 @@ class TestCouchbaseCache:
             )
             current_time = datetime.now()
             assert document_expiry_time - current_time < ttl
+
+    def test_get_recent_messages(self, cluster: Cluster) -> None:
+        """Test fetching only the most recent messages of a session"""
+
+        message_history = CouchbaseChatMessageHistory(
+            cluster=cluster,
+            bucket_name=BUCKET_NAME,
+            scope_name=SCOPE_NAME,
+            collection_name=MESSAGE_HISTORY_COLLECTION_NAME,
+            session_id="test-session-window",
+        )
+
+        # clear the memory
+        message_history.clear()
+
+        # add some messages
+        messages = [
+            HumanMessage(content="Hi"),
+            AIMessage(content="Hello, how are you doing ?"),
+            HumanMessage(content="I'm good, how are you?"),
+        ]
+        message_history.add_messages(messages)
+
+        # wait until the messages can be retrieved
+        wait_for_messages(message_history, len(messages))
+
+        # the most recent messages are returned in the order of creation
+        assert message_history.get_messages(limit=2) == messages[1:]
+        assert message_history.get_messages() == messages
+
+        # clear the memory
+        message_history.clear()
+        assert wait_for_messages(message_history, 0) == []
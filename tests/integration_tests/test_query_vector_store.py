@@ -1,25 +1,54 @@
 """Test Couchbase Query Vector Store functionality"""
 
+import asyncio
 import os
-import time
-from typing import Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List, Optional
 
 import pytest
+from couchbase.cluster import Cluster
+from couchbase.exceptions import CollectionAlreadyExistsException
+from couchbase.n1ql import QueryProfile
+from couchbase.options import QueryOptions
 from langchain_core.documents import Document
 
 from langchain_couchbase import CouchbaseQueryVectorStore
 from langchain_couchbase.vectorstores import DistanceStrategy, IndexType
 from tests.utils import (
     ConsistentFakeEmbeddings,
+    connect_cluster,
+    quote_identifier,
+    quote_keyspace,
+    wait_until,
 )
 
 CONNECTION_STRING = os.getenv("COUCHBASE_CONNECTION_STRING", "")
 BUCKET_NAME = os.getenv("COUCHBASE_BUCKET_NAME", "")
 SCOPE_NAME = os.getenv("COUCHBASE_SCOPE_NAME", "")
 COLLECTION_NAME = os.getenv("COUCHBASE_COLLECTION_NAME", "")
+# When run in parallel with pytest-xdist (pytest -n 4), each worker uses its own
+# collection, so that the tests running at the same time do not see each
+# other's documents and indexes
+XDIST_WORKER = os.getenv("PYTEST_XDIST_WORKER", "")
+if XDIST_WORKER and COLLECTION_NAME:
+    COLLECTION_NAME = f"{COLLECTION_NAME}_{XDIST_WORKER}"
 USERNAME = os.getenv("COUCHBASE_USERNAME", "")
 PASSWORD = os.getenv("COUCHBASE_PASSWORD", "")
 SLEEP_DURATION = 2
+# Upper bound on polling for documents and indexes to become visible
+WAIT_TIMEOUT = SLEEP_DURATION * 3
+
+# Shared by all the tests, so the same texts always get the same vectors
+EMBEDDINGS = ConsistentFakeEmbeddings()
+
+# Non default parameters for the index creation tests
+CUSTOM_INDEX_PARAMETERS = {
+    "index_scan_nprobes": 2,
+    "index_trainlist": 2,
+    "vector_field": "embedding",
+    "vector_dimension": 10,  # ConsistentFakeEmbeddings default
+    "fields": ["metadata.text"],
+}
 
 
 def set_all_env_vars() -> bool:
@@ -36,47 +65,154 @@ def set_all_env_vars() -> bool:
     )
 
 
+pytestmark = pytest.mark.couchbase
+
+# All the tests of the module need a cluster, so the whole module is skipped
+# before its fixtures and tests are collected
+if not set_all_env_vars():
+    pytest.skip("Missing Couchbase environment variables", allow_module_level=True)
+
+
 def check_capella() -> bool:
     """Check if the connection string is for Couchbase Capella."""
     return "cloud.couchbase.com" in CONNECTION_STRING.lower()
 
 
-def get_cluster() -> Any:
+def get_cluster() -> Cluster:
+    """Get a couchbase cluster object, reusing the connection across tests"""
+    return connect_cluster(CONNECTION_STRING, USERNAME, PASSWORD)
+
+
+@pytest.fixture(scope="module")
+def cluster() -> Cluster:
     """Get a couchbase cluster object"""
-    from datetime import timedelta
+    return get_cluster()
 
-    from couchbase.auth import PasswordAuthenticator
-    from couchbase.cluster import Cluster
-    from couchbase.options import ClusterOptions
 
-    auth = PasswordAuthenticator(USERNAME, PASSWORD)
-    options = ClusterOptions(auth)
-    options.apply_profile("wan_development")
-    connect_string = CONNECTION_STRING
-    cluster = Cluster(connect_string, options)
+@pytest.fixture
+def vectorstore(cluster: Cluster) -> CouchbaseQueryVectorStore:
+    """Get a vector store on the collection under test"""
+    return CouchbaseQueryVectorStore(
+        cluster=cluster,
+        embedding=EMBEDDINGS,
+        bucket_name=BUCKET_NAME,
+        scope_name=SCOPE_NAME,
+        collection_name=COLLECTION_NAME,
+        distance_metric=DistanceStrategy.EUCLIDEAN,
+    )
 
-    # Wait until the cluster is ready for use.
-    cluster.wait_until_ready(timedelta(seconds=5))
 
-    return cluster
+@pytest.fixture(scope="class")
+def empty_collection(cluster: Cluster) -> None:
+    """Empty the collection under test before the tests of the class"""
+    delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
 
 
-@pytest.fixture()
-def cluster() -> Any:
-    """Get a couchbase cluster object"""
-    return get_cluster()
+@pytest.fixture
+def written_ids(
+    request: pytest.FixtureRequest, cluster: Cluster
+) -> Iterator[List[str]]:
+    """Collect the ids of the documents written by the test, to remove them
+    through KV once it is done. The whole collection is emptied instead if the
+    test failed or recorded no ids, as its documents may not all be known."""
+    tests_failed = request.session.testsfailed
+    ids: List[str] = []
+    yield ids
+    if request.session.testsfailed > tests_failed or not ids:
+        delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+    else:
+        delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, ids)
+
+
+# Corpus shared by the tests that only search it
+SEED_TEXTS = ["foo", "bar", "baz"]
+SEED_METADATAS = [{"a": 1}, {"b": 2}, {"c": 3}]
+SEED_IDS = ["a", "b", "c"]
+
+
+@pytest.fixture(scope="class")
+def seeded_vectorstore(cluster: Cluster) -> Iterator[CouchbaseQueryVectorStore]:
+    """Get a vector store on the collection under test with the seed corpus added,
+    once it is visible to searches"""
+    delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+    vectorstore = CouchbaseQueryVectorStore(
+        cluster=cluster,
+        embedding=EMBEDDINGS,
+        bucket_name=BUCKET_NAME,
+        scope_name=SCOPE_NAME,
+        collection_name=COLLECTION_NAME,
+        distance_metric=DistanceStrategy.EUCLIDEAN,
+    )
+    vectorstore.add_texts(SEED_TEXTS, metadatas=SEED_METADATAS, ids=SEED_IDS)
+    wait_until(
+        lambda: vectorstore.similarity_search(
+            "foo", k=len(SEED_TEXTS), fields=[vectorstore._text_key]
+        ),
+        lambda output: len(output) == len(SEED_TEXTS),
+        timeout=WAIT_TIMEOUT,
+    )
+    yield vectorstore
+    delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, SEED_IDS)
+
+
+@pytest.fixture(scope="session")
+def worker_collection() -> None:
+    """Create the collection of the pytest-xdist worker, if it is missing"""
+    if not XDIST_WORKER:
+        return
+
+    cluster = get_cluster()
+    try:
+        cluster.bucket(BUCKET_NAME).collections().create_collection(
+            SCOPE_NAME, COLLECTION_NAME
+        )
+    except CollectionAlreadyExistsException:
+        pass
+
+    # The collection is empty until the tests add documents to it, and needs a
+    # primary index for the documents to be deleted between tests
+    keyspace = quote_keyspace(BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+    wait_until(
+        lambda: run(cluster, f"CREATE PRIMARY INDEX IF NOT EXISTS ON {keyspace}"),
+        lambda _: True,
+        timeout=WAIT_TIMEOUT,
+    )
+
+
+def run(cluster: Cluster, query: str, adhoc: bool = True) -> None:
+    """Run a statement whose result is not needed, without metrics or profiling.
+    DML can be prepared with adhoc=False, but DDL statements cannot"""
+    options = QueryOptions(adhoc=adhoc, metrics=False, profile=QueryProfile.OFF)
+    cluster.query(query, options).execute()
 
 
 def delete_documents(
-    cluster: Any, bucket_name: str, scope_name: str, collection_name: str
+    cluster: Cluster,
+    bucket_name: str,
+    scope_name: str,
+    collection_name: str,
+    ids: Optional[List[str]] = None,
 ) -> None:
-    """Delete all the documents in the collection"""
-    query = f"DELETE FROM `{bucket_name}`.`{scope_name}`.`{collection_name}`"
-    cluster.query(query).execute()
+    """Delete the documents with the given ids, or all the documents in the
+    collection if no ids are given"""
+    if ids is not None:
+        # A single KV batch, instead of a query scanning the collection. Missing
+        # documents, e.g. already deleted by a test, are not an error.
+        if ids:
+            collection = (
+                cluster.bucket(bucket_name)
+                .scope(scope_name)
+                .collection(collection_name)
+            )
+            collection.remove_multi(ids)
+        return
+
+    keyspace = quote_keyspace(bucket_name, scope_name, collection_name)
+    run(cluster, f"DELETE FROM {keyspace}", adhoc=False)
 
 
 def fetch_documents_by_ids(
-    cluster: Any,
+    cluster: Cluster,
     bucket_name: str,
     scope_name: str,
     collection_name: str,
@@ -92,38 +228,76 @@ def fetch_documents_by_ids(
     return {row["id"]: row for row in rows}
 
 
-def get_index(cluster: Any, index_name: str) -> Optional[dict]:
-    """Return index dict if exists, otherwise None."""
-    query = f"SELECT * FROM system:indexes WHERE name = '{index_name}'"
-    rows = cluster.query(query).execute()
-    if len(rows) == 0:
-        return None
-    return rows[0]["indexes"]
+def get_index(cluster: Cluster, index_name: str) -> Optional[dict]:
+    """Return index dict if exists on the collection under test, otherwise None."""
+    # Prepared, as it is polled while indexes are created and dropped; only the
+    # fields the tests check are returned. Indexes with the same name may exist
+    # on the collections of other xdist workers.
+    rows = cluster.query(
+        "SELECT RAW {'name': i.name, 'using': i.`using`, 'with': i.`with`,"
+        " 'index_key': i.index_key} FROM system:indexes AS i WHERE i.name = $1"
+        " AND i.bucket_id = $2 AND i.scope_id = $3 AND i.keyspace_id = $4 LIMIT 1",
+        QueryOptions(
+            adhoc=False,
+            positional_parameters=[
+                index_name,
+                BUCKET_NAME,
+                SCOPE_NAME,
+                COLLECTION_NAME,
+            ],
+        ),
+    ).execute()
+    return rows[0] if rows else None
 
 
 def delete_index(
-    cluster: Any,
+    cluster: Cluster,
     bucket_name: str,
     scope_name: str,
     collection_name: str,
     index_name: str,
 ) -> None:
     """Drop the given index from the specified collection."""
-    query = f"DROP INDEX `{index_name}` on {bucket_name}.{scope_name}.{collection_name}"
-    cluster.query(query).execute()
+    keyspace = quote_keyspace(bucket_name, scope_name, collection_name)
+    run(cluster, f"DROP INDEX {quote_identifier(index_name)} ON {keyspace}")
 
 
-@pytest.mark.skipif(
-    not set_all_env_vars(), reason="Missing Couchbase environment variables"
-)
-class TestCouchbaseQueryVectorStore:
-    @classmethod
-    def setup_method(self) -> None:
-        cluster = get_cluster()
-        # Delete all the documents in the collection
-        delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+def create_test_index(
+    cluster: Cluster,
+    vectorstore: CouchbaseQueryVectorStore,
+    index_type: IndexType,
+    index_name: str,
+    **kwargs: Any,
+) -> Optional[dict]:
+    """Create the index on the vector store, replacing any left over by a previous
+    run, and return it once it is listed"""
+    try:
+        delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
+        wait_until(lambda: get_index(cluster, index_name) is None, timeout=WAIT_TIMEOUT)
+    except Exception:
+        pass
+    vectorstore.create_index(
+        index_type,
+        index_name=index_name,
+        distance_metric=DistanceStrategy.EUCLIDEAN,
+        **kwargs,
+    )
+
+    # Wait for the index to be created
+    return wait_until(lambda: get_index(cluster, index_name), timeout=WAIT_TIMEOUT)
+
+
+def drop_test_index(cluster: Cluster, index_name: str) -> None:
+    """Drop the index and check that it is gone"""
+    delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
+    assert wait_until(
+        lambda: get_index(cluster, index_name) is None, timeout=WAIT_TIMEOUT
+    )
+
 
-    def test_from_documents(self, cluster: Any) -> None:
+@pytest.mark.usefixtures("worker_collection", "empty_collection")
+class TestCouchbaseQueryVectorStore:
+    def test_from_documents(self, cluster: Cluster, written_ids: List[str]) -> None:
         """Test end to end search using a list of documents."""
 
         documents = [
@@ -134,7 +308,7 @@ class TestCouchbaseQueryVectorStore:
 
         vectorstore = CouchbaseQueryVectorStore.from_documents(
             documents,
-            ConsistentFakeEmbeddings(),
+            EMBEDDINGS,
             cluster=cluster,
             bucket_name=BUCKET_NAME,
             scope_name=SCOPE_NAME,
@@ -143,15 +317,19 @@ class TestCouchbaseQueryVectorStore:
         )
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("baz", k=3)
+        output = wait_until(
+            lambda: vectorstore.similarity_search("baz", k=3, fields=["metadata.page"]),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
+        if len(output) == 3:
+            written_ids.extend([doc.id for doc in output if doc.id])
         assert any(
             doc.page_content == "baz" and doc.metadata.get("page") == 3
             for doc in output
         )
 
-    def test_from_texts(self, cluster: Any) -> None:
+    def test_from_texts(self, cluster: Cluster, written_ids: List[str]) -> None:
         """Test end to end search using a list of texts."""
 
         texts = [
@@ -162,7 +340,7 @@ class TestCouchbaseQueryVectorStore:
 
         vectorstore = CouchbaseQueryVectorStore.from_texts(
             texts,
-            ConsistentFakeEmbeddings(),
+            EMBEDDINGS,
             cluster=cluster,
             bucket_name=BUCKET_NAME,
             scope_name=SCOPE_NAME,
@@ -171,13 +349,21 @@ class TestCouchbaseQueryVectorStore:
         )
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=3)
+        output = wait_until(
+            lambda: vectorstore.similarity_search(
+                "foo", k=3, fields=[vectorstore._text_key]
+            ),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
+        if len(output) == 3:
+            written_ids.extend([doc.id for doc in output if doc.id])
         assert len(output) >= 1
         assert any(doc.page_content == "foo" for doc in output)
 
-    def test_from_texts_with_metadatas(self, cluster: Any) -> None:
+    def test_from_texts_with_metadatas(
+        self, cluster: Cluster, written_ids: List[str]
+    ) -> None:
         """Test end to end search using a list of texts and metadatas."""
 
         texts = [
@@ -190,7 +376,7 @@ class TestCouchbaseQueryVectorStore:
 
         vectorstore = CouchbaseQueryVectorStore.from_texts(
             texts,
-            ConsistentFakeEmbeddings(),
+            EMBEDDINGS,
             metadatas=metadatas,
             cluster=cluster,
             bucket_name=BUCKET_NAME,
@@ -200,14 +386,23 @@ class TestCouchbaseQueryVectorStore:
         )
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("baz", k=3)
+        output = wait_until(
+            lambda: vectorstore.similarity_search("baz", k=3, fields=["metadata.c"]),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
+        if len(output) == 3:
+            written_ids.extend([doc.id for doc in output if doc.id])
         assert any(
             doc.page_content == "baz" and doc.metadata.get("c") == 3 for doc in output
         )
 
-    def test_add_texts_with_ids_and_metadatas(self, cluster: Any) -> None:
+    def test_add_texts_with_ids_and_metadatas(
+        self,
+        cluster: Cluster,
+        vectorstore: CouchbaseQueryVectorStore,
+        written_ids: List[str],
+    ) -> None:
         """Test end to end search by adding a list of texts, ids and metadatas."""
 
         texts = [
@@ -220,33 +415,55 @@ class TestCouchbaseQueryVectorStore:
 
         metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
 
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
         results = vectorstore.add_texts(
             texts,
             ids=ids,
             metadatas=metadatas,
         )
+        written_ids.extend(ids)
         assert results == ids
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        stored_docs = fetch_documents_by_ids(
-            cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, ids
+        stored_docs = wait_until(
+            lambda: fetch_documents_by_ids(
+                cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, ids
+            ),
+            lambda stored_docs: len(stored_docs) == len(ids),
+            timeout=WAIT_TIMEOUT,
         )
         assert "a" in stored_docs
         assert stored_docs["a"]["text"] == "foo"
         assert stored_docs["a"]["metadata"]["a"] == 1
 
-    def test_delete_texts_with_ids(self, cluster: Any) -> None:
+    async def test_aadd_texts_concurrently(
+        self,
+        cluster: Cluster,
+        vectorstore: CouchbaseQueryVectorStore,
+        written_ids: List[str],
+    ) -> None:
+        """Test adding independent batches of texts at the same time."""
+
+        results = await asyncio.gather(
+            vectorstore.aadd_texts(["foo", "bar"], ids=["a", "b"]),
+            vectorstore.aadd_texts(["baz"], ids=["c"], metadatas=[{"c": 3}]),
+        )
+        written_ids.extend(["a", "b", "c"])
+        assert results == [["a", "b"], ["c"]]
+
+        # Wait for the documents to be indexed
+        stored_docs = wait_until(
+            lambda: fetch_documents_by_ids(
+                cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, ["a", "b", "c"]
+            ),
+            lambda stored_docs: len(stored_docs) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
+        assert stored_docs["a"]["text"] == "foo"
+        assert stored_docs["c"]["metadata"]["c"] == 3
+
+    def test_delete_texts_with_ids(
+        self, vectorstore: CouchbaseQueryVectorStore, written_ids: List[str]
+    ) -> None:
         """Test deletion of documents by ids."""
         texts = [
             "foo",
@@ -258,89 +475,28 @@ class TestCouchbaseQueryVectorStore:
 
         metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
 
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
         results = vectorstore.add_texts(
             texts,
             ids=ids,
             metadatas=metadatas,
         )
+        written_ids.extend(ids)
         assert results == ids
         assert vectorstore.delete(ids)
 
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=1)
-        assert len(output) == 0
-
-    def test_similarity_search_with_scores(self, cluster: Any) -> None:
-        """Test similarity search with scores."""
-
-        texts = ["foo", "bar", "baz"]
-
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        vectorstore.add_texts(texts, metadatas=metadatas)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search_with_score("foo", k=2)
-
-        assert len(output) == 2
-        assert any(
-            doc.page_content == "foo" and doc.metadata.get("a") == 1
-            for doc, _ in output
-        )
-        # revisit sorting of scores based on similarity metric
-        # assert output[0][1] > output[1][1]
-
-    def test_similarity_search_by_vector(self, cluster: Any) -> None:
-        """Test similarity search by vector."""
-
-        texts = ["foo", "bar", "baz"]
-
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
+        # Wait for the deletion to be indexed
+        output = wait_until(
+            lambda: vectorstore.similarity_search(
+                "foo", k=1, fields=[vectorstore._text_key]
+            ),
+            lambda output: len(output) == 0,
+            timeout=WAIT_TIMEOUT,
         )
+        assert len(output) == 0
 
-        vectorstore.add_texts(texts, metadatas=metadatas)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        vector = ConsistentFakeEmbeddings().embed_query("foo")
-        vector_output = vectorstore.similarity_search_by_vector(vector, k=3)
-        assert any(doc.page_content == "foo" for doc in vector_output)
-
-        similarity_output = vectorstore.similarity_search("foo", k=3)
-        assert any(doc.page_content == "foo" for doc in similarity_output)
-
-    def test_output_fields(self, cluster: Any) -> None:
+    def test_output_fields(
+        self, vectorstore: CouchbaseQueryVectorStore, written_ids: List[str]
+    ) -> None:
         """Test that output fields are set correctly."""
 
         texts = [
@@ -351,22 +507,16 @@ class TestCouchbaseQueryVectorStore:
 
         metadatas = [{"page": 1, "a": 1}, {"page": 2, "b": 2}, {"page": 3, "c": 3}]
 
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
         ids = vectorstore.add_texts(texts, metadatas)
+        written_ids.extend(ids)
         assert len(ids) == len(texts)
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=3, fields=["metadata.page"])
+        output = wait_until(
+            lambda: vectorstore.similarity_search("foo", k=3, fields=["metadata.page"]),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
         assert any(
             doc.page_content == "foo"
             and doc.metadata.get("page") == 1
@@ -374,7 +524,9 @@ class TestCouchbaseQueryVectorStore:
             for doc in output
         )
 
-    def test_hybrid_search(self, cluster: Any) -> None:
+    def test_hybrid_search(
+        self, vectorstore: CouchbaseQueryVectorStore, written_ids: List[str]
+    ) -> None:
         """Test hybrid search."""
 
         texts = [
@@ -389,345 +541,163 @@ class TestCouchbaseQueryVectorStore:
             {"section": "appendix"},
         ]
 
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        vectorstore.add_texts(texts, metadatas=metadatas)
+        written_ids.extend(vectorstore.add_texts(texts, metadatas=metadatas))
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        result, score = vectorstore.similarity_search_with_score("foo", k=3)[0]
-
-        # Wait for the documents to be indexed for hybrid search
-        time.sleep(SLEEP_DURATION)
-
-        hybrid_result, hybrid_score = vectorstore.similarity_search_with_score(
-            "foo",
-            k=1,
-            where_str="metadata.section = 'index'",
-        )[0]
+        wait_until(
+            lambda: vectorstore.similarity_search(
+                "foo", k=3, fields=[vectorstore._text_key]
+            ),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
+
+        # Run the plain and the hybrid search at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            plain = executor.submit(
+                vectorstore.similarity_search_with_score,
+                "foo",
+                k=1,
+                fields=[vectorstore._text_key],
+            )
+            hybrid = executor.submit(
+                vectorstore.similarity_search_with_score,
+                "foo",
+                k=1,
+                where_str="metadata.section = 'index'",
+                fields=["metadata.section"],
+            )
+            result, score = plain.result()[0]
+            hybrid_result, hybrid_score = hybrid.result()[0]
 
         assert hybrid_result.page_content == "foo"
         assert hybrid_result.metadata["section"] == "index"
         assert isinstance(score, (int, float))
         assert isinstance(hybrid_score, (int, float))
 
-    def test_id_in_results(self, cluster: Any) -> None:
-        """Test that the id is returned in the result documents."""
-
-        texts = [
-            "foo",
-            "bar",
-            "baz",
-        ]
-
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        ids = vectorstore.add_texts(texts, metadatas=metadatas)
-        assert len(ids) == len(texts)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=3)
-        assert all(doc.id is not None for doc in output)
-
-    def test_composite_index_creation(self, cluster: Any) -> None:
-        """Test composite index creation."""
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        # Add some documents to the vector store
-        vectorstore.add_texts(["foo", "bar", "baz"])
-
-        # Create the index
-        index_description = "IVF1,SQ8"
-        index_name = "composite_test_index"
-        try:
-            delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
-            time.sleep(SLEEP_DURATION)
-        except Exception:
-            pass
-        vectorstore.create_index(
-            IndexType.COMPOSITE,
-            index_name=index_name,
-            index_description=index_description,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        # Wait for the index to be created
-        time.sleep(SLEEP_DURATION)
-
-        # Check if the index is created
-        index = get_index(cluster, index_name)
-        assert index is not None
-        assert index["name"] == "composite_test_index"
-        assert index["using"] == "gsi"
-        assert index["with"]["description"] == index_description
-        assert index["with"]["dimension"] == 10  # ConsistentFakeEmbeddings default
-        assert f"`{vectorstore._embedding_key}` VECTOR" in index["index_key"]
-        assert f"`{vectorstore._text_key}`" in index["index_key"]
-
-        # Test the index
-        output = vectorstore.similarity_search("foo", k=3)
-        assert any(doc.page_content == "foo" for doc in output)
-
-        # Delete the index
-        delete_index(
-            cluster,
-            BUCKET_NAME,
-            SCOPE_NAME,
-            COLLECTION_NAME,
-            index_name,
-        )
-        time.sleep(SLEEP_DURATION)
-
-        # Check if the index is deleted
-        assert get_index(cluster, index_name) is None
-
-    def test_hyperscale_index_creation(self, cluster: Any) -> None:
-        """Test Hyperscale index creation."""
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        # Add some documents to the vector store
-        vectorstore.add_texts(["foo", "bar", "baz"])
+    @pytest.mark.parametrize(
+        "index_type, index_name, index_parameters",
+        [
+            pytest.param(
+                IndexType.COMPOSITE, "composite_test_index", {}, id="composite"
+            ),
+            pytest.param(
+                IndexType.HYPERSCALE, "hyperscale_test_index", {}, id="hyperscale"
+            ),
+            pytest.param(
+                IndexType.COMPOSITE,
+                "langchain_composite_query_index_custom",
+                CUSTOM_INDEX_PARAMETERS,
+                id="composite_with_custom_parameters",
+            ),
+            pytest.param(
+                IndexType.HYPERSCALE,
+                "langchain_hyperscale_query_index_custom",
+                CUSTOM_INDEX_PARAMETERS,
+                id="hyperscale_with_custom_parameters",
+            ),
+        ],
+    )
+    def test_index_metadata(
+        self,
+        cluster: Cluster,
+        vectorstore: CouchbaseQueryVectorStore,
+        index_type: IndexType,
+        index_name: str,
+        index_parameters: dict,
+    ) -> None:
+        """Test that the index is created with the default and custom parameters.
+        No documents are needed, as only the index definition is checked."""
 
-        # Create the index
         index_description = "IVF1,SQ8"
-        index_name = "hyperscale_test_index"
-        try:
-            delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
-            time.sleep(SLEEP_DURATION)
-        except Exception:
-            pass
-        vectorstore.create_index(
-            IndexType.HYPERSCALE,
-            index_name=index_name,
-            index_description=index_description,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        # Wait for the index to be created
-        time.sleep(SLEEP_DURATION)
-
-        # Check if the index is created
-        index = get_index(cluster, index_name)
-        assert index is not None
-        assert index["name"] == "hyperscale_test_index"
-        assert index["using"] == "gsi"
-        assert index["with"]["description"] == index_description
-        assert index["with"]["dimension"] == 10  # ConsistentFakeEmbeddings default
-        assert f"`{vectorstore._embedding_key}` VECTOR" in index["index_key"]
-        assert f"`{vectorstore._text_key}`" not in index["index_key"]
-
-        # Test the index
-        output = vectorstore.similarity_search("bar", k=3)
-        assert any(doc.page_content == "bar" for doc in output)
-
-        # Delete the index
-        delete_index(
+        index = create_test_index(
             cluster,
-            BUCKET_NAME,
-            SCOPE_NAME,
-            COLLECTION_NAME,
+            vectorstore,
+            index_type,
             index_name,
-        )
-
-        # Check if the index is deleted
-        assert get_index(cluster, index_name) is None
-
-    def test_composite_index_creation_with_custom_parameters(
-        self, cluster: Any
-    ) -> None:
-        """Test composite index creation with custom parameters."""
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
-
-        # Add some documents to the vector store
-        vectorstore.add_documents(
-            [
-                Document(page_content="foo", metadata={"text": "a"}),
-                Document(page_content="bar", metadata={"text": "b"}),
-                Document(page_content="baz", metadata={"text": "c"}),
-            ]
-        )
-
-        # Create the index
-        index_description = "IVF1,SQ8"
-        index_name = "langchain_composite_query_index_custom"
-        nprobes = 2
-        trainlist = 2
-        default_dimension = 10  # ConsistentFakeEmbeddings default
-        vector_field = "embedding"
-        indexing_fields = ["metadata.text"]
-
-        try:
-            delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
-            time.sleep(SLEEP_DURATION)
-        except Exception:
-            pass
-
-        vectorstore.create_index(
-            IndexType.COMPOSITE,
             index_description=index_description,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-            index_name=index_name,
-            index_scan_nprobes=nprobes,
-            index_trainlist=trainlist,
-            vector_field=vector_field,
-            vector_dimension=default_dimension,
-            fields=indexing_fields,
+            **index_parameters,
         )
 
-        # Wait for the index to be created
-        time.sleep(SLEEP_DURATION)
-
         # Check if the index is created
-        index = get_index(cluster, index_name)
-        # import pdb; pdb.set_trace()
         assert index is not None
         assert index["name"] == index_name
         assert index["using"] == "gsi"
         assert index["with"]["description"] == index_description
-        assert index["with"]["dimension"] == default_dimension
-        assert index["with"]["scan_nprobes"] == nprobes
-        assert index["with"]["train_list"] == trainlist
+        # ConsistentFakeEmbeddings default
+        assert index["with"]["dimension"] == index_parameters.get(
+            "vector_dimension", 10
+        )
+        if index_parameters:
+            assert (
+                index["with"]["scan_nprobes"] == index_parameters["index_scan_nprobes"]
+            )
+            assert index["with"]["train_list"] == index_parameters["index_trainlist"]
+        vector_field = index_parameters.get("vector_field", vectorstore._embedding_key)
         assert f"`{vector_field}` VECTOR" in index["index_key"]
-        assert f"`{vectorstore._text_key}`" in index["index_key"]
-        assert "(`metadata`.`text`)" in index["index_key"]
-
-        # Test the index
-        output = vectorstore.similarity_search("foo", k=3)
-        assert any(
-            doc.page_content == "foo" and doc.metadata.get("text") == "a"
-            for doc in output
-        )
-
-        # Delete the index
-        delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
-        time.sleep(SLEEP_DURATION)
-
-        # Check if the index is deleted
-        assert get_index(cluster, index_name) is None
-
-    def test_hyperscale_index_creation_with_custom_parameters(
-        self, cluster: Any
+        # Only composite indexes include the text and the other fields
+        if index_type == IndexType.COMPOSITE:
+            assert f"`{vectorstore._text_key}`" in index["index_key"]
+            if index_parameters:
+                assert "(`metadata`.`text`)" in index["index_key"]
+        else:
+            assert f"`{vectorstore._text_key}`" not in index["index_key"]
+
+        drop_test_index(cluster, index_name)
+
+    @pytest.mark.parametrize(
+        "index_type, index_name",
+        [
+            pytest.param(IndexType.COMPOSITE, "composite_test_index", id="composite"),
+            pytest.param(
+                IndexType.HYPERSCALE, "hyperscale_test_index", id="hyperscale"
+            ),
+        ],
+    )
+    def test_index_search(
+        self,
+        cluster: Cluster,
+        vectorstore: CouchbaseQueryVectorStore,
+        index_type: IndexType,
+        index_name: str,
+        written_ids: List[str],
     ) -> None:
-        """Test Hyperscale index creation with custom parameters."""
-
-        vectorstore = CouchbaseQueryVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-        )
+        """Test searching the documents through the index."""
 
         # Add some documents to the vector store
-        vectorstore.add_documents(
+        ids = vectorstore.add_documents(
             [
                 Document(page_content="foo", metadata={"text": "a"}),
                 Document(page_content="bar", metadata={"text": "b"}),
                 Document(page_content="baz", metadata={"text": "c"}),
             ]
         )
+        written_ids.extend(ids)
 
-        # Create the index
-        index_description = "IVF1,SQ8"
-        index_name = "langchain_hyperscale_query_index_custom"
-        nprobes = 2
-        trainlist = 2
-        default_dimension = 10  # ConsistentFakeEmbeddings default
-        vector_field = "embedding"
-        indexing_fields = ["metadata.text"]
-
-        try:
-            delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
-            time.sleep(SLEEP_DURATION)
-        except Exception:
-            pass
-
-        vectorstore.create_index(
-            IndexType.HYPERSCALE,
-            index_description=index_description,
-            distance_metric=DistanceStrategy.EUCLIDEAN,
-            index_name=index_name,
-            index_scan_nprobes=nprobes,
-            index_trainlist=trainlist,
-            vector_field=vector_field,
-            vector_dimension=default_dimension,
-            fields=indexing_fields,
+        create_test_index(
+            cluster,
+            vectorstore,
+            index_type,
+            index_name,
+            index_description="IVF1,SQ8",
         )
 
-        # Wait for the index to be created
-        time.sleep(SLEEP_DURATION)
-
-        # Check if the index is created
-        index = get_index(cluster, index_name)
-        assert index is not None
-        assert index["name"] == index_name
-        assert index["using"] == "gsi"
-        assert index["with"]["description"] == index_description
-        assert index["with"]["dimension"] == default_dimension
-        assert index["with"]["scan_nprobes"] == nprobes
-        assert index["with"]["train_list"] == trainlist
-        assert f"`{vector_field}` VECTOR" in index["index_key"]
-        assert f"`{vectorstore._text_key}`" not in index["index_key"]
-
-        # Test the index
-        output = vectorstore.similarity_search("foo", k=3)
+        # Test the index, once it has been built
+        output = wait_until(
+            lambda: vectorstore.similarity_search("foo", k=3, fields=["metadata.text"]),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
         assert any(
             doc.page_content == "foo" and doc.metadata.get("text") == "a"
             for doc in output
         )
 
-        # Delete the index
-        delete_index(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, index_name)
-        time.sleep(SLEEP_DURATION)
-
-        # Check if the index is deleted
-        assert get_index(cluster, index_name) is None
+        drop_test_index(cluster, index_name)
 
-    def test_custom_text_key_with_hyphen(self, cluster: Any) -> None:
+    def test_custom_text_key_with_hyphen(
+        self, cluster: Cluster, written_ids: List[str]
+    ) -> None:
         """Test that field names with hyphens work correctly.
 
         This test verifies that using hyphenated field names like 'text-to-embed'
@@ -745,7 +715,7 @@ class TestCouchbaseQueryVectorStore:
         # Use hyphenated field names
         vectorstore = CouchbaseQueryVectorStore(
             cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
+            embedding=EMBEDDINGS,
             bucket_name=BUCKET_NAME,
             scope_name=SCOPE_NAME,
             collection_name=COLLECTION_NAME,
@@ -755,18 +725,22 @@ class TestCouchbaseQueryVectorStore:
         )
 
         ids = vectorstore.add_texts(texts, metadatas=metadatas)
+        written_ids.extend(ids)
         assert len(ids) == len(texts)
 
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        # Test similarity search with hyphenated field names
-        output = vectorstore.similarity_search("foo", k=3)
+        # Test similarity search with hyphenated field names, once indexed
+        output = wait_until(
+            lambda: vectorstore.similarity_search("foo", k=3, fields=["metadata.a"]),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
         assert any(
             doc.page_content == "foo" and doc.metadata.get("a") == 1 for doc in output
         )
 
-    def test_from_texts_with_hyphenated_field_names(self, cluster: Any) -> None:
+    def test_from_texts_with_hyphenated_field_names(
+        self, cluster: Cluster, written_ids: List[str]
+    ) -> None:
         """Test from_texts class method with hyphenated field names."""
         texts = [
             "foo",
@@ -778,7 +752,7 @@ class TestCouchbaseQueryVectorStore:
 
         vectorstore = CouchbaseQueryVectorStore.from_texts(
             texts,
-            ConsistentFakeEmbeddings(),
+            EMBEDDINGS,
             metadatas=metadatas,
             cluster=cluster,
             bucket_name=BUCKET_NAME,
@@ -790,14 +764,20 @@ class TestCouchbaseQueryVectorStore:
         )
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("baz", k=3)
+        output = wait_until(
+            lambda: vectorstore.similarity_search("baz", k=3, fields=["metadata.c"]),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )
+        if len(output) == 3:
+            written_ids.extend([doc.id for doc in output if doc.id])
         assert any(
             doc.page_content == "baz" and doc.metadata.get("c") == 3 for doc in output
         )
 
-    def test_hybrid_search_with_hyphenated_field_names(self, cluster: Any) -> None:
+    def test_hybrid_search_with_hyphenated_field_names(
+        self, cluster: Cluster, written_ids: List[str]
+    ) -> None:
         """Test hybrid search with hyphenated field names."""
         texts = [
             "foo",
@@ -813,7 +793,7 @@ class TestCouchbaseQueryVectorStore:
 
         vectorstore = CouchbaseQueryVectorStore(
             cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
+            embedding=EMBEDDINGS,
             bucket_name=BUCKET_NAME,
             scope_name=SCOPE_NAME,
             collection_name=COLLECTION_NAME,
@@ -822,23 +802,76 @@ class TestCouchbaseQueryVectorStore:
             embedding_key="text-embedding",
         )
 
-        vectorstore.add_texts(texts, metadatas=metadatas)
+        written_ids.extend(vectorstore.add_texts(texts, metadatas=metadatas))
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        result, score = vectorstore.similarity_search_with_score("foo", k=3)[0]
+        result, score = wait_until(
+            lambda: vectorstore.similarity_search_with_score(
+                "foo", k=3, fields=[vectorstore._text_key]
+            ),
+            lambda output: len(output) == 3,
+            timeout=WAIT_TIMEOUT,
+        )[0]
 
         # Wait for the documents to be indexed for hybrid search
-        time.sleep(SLEEP_DURATION)
-
-        hybrid_result, hybrid_score = vectorstore.similarity_search_with_score(
-            "foo",
-            k=1,
-            where_str="`metadata`.`section-1` = 'index'",
+        hybrid_result, hybrid_score = wait_until(
+            lambda: vectorstore.similarity_search_with_score(
+                "foo",
+                k=1,
+                where_str="`metadata`.`section-1` = 'index'",
+                fields=["metadata.section-1"],
+            ),
+            lambda output: len(output) == 1,
+            timeout=WAIT_TIMEOUT,
         )[0]
 
         assert hybrid_result.page_content == "foo"
         assert hybrid_result.metadata["section-1"] == "index"
         assert isinstance(score, (int, float))
         assert isinstance(hybrid_score, (int, float))
+
+
+@pytest.mark.usefixtures("worker_collection")
+class TestCouchbaseQueryVectorStoreSearch:
+    """Searches over a corpus seeded once for the class"""
+
+    def test_similarity_search_with_scores(
+        self, seeded_vectorstore: CouchbaseQueryVectorStore
+    ) -> None:
+        """Test similarity search with scores."""
+        output = seeded_vectorstore.similarity_search_with_score(
+            "foo", k=2, fields=["metadata.a"]
+        )
+
+        assert len(output) == 2
+        assert any(
+            doc.page_content == "foo" and doc.metadata.get("a") == 1
+            for doc, _ in output
+        )
+        # revisit sorting of scores based on similarity metric
+        # assert output[0][1] > output[1][1]
+
+    def test_similarity_search_by_vector(
+        self, seeded_vectorstore: CouchbaseQueryVectorStore
+    ) -> None:
+        """Test similarity search by vector."""
+        text_key = seeded_vectorstore._text_key
+
+        vector = EMBEDDINGS.embed_query("foo")
+        vector_output = seeded_vectorstore.similarity_search_by_vector(
+            vector, k=3, fields=[text_key]
+        )
+        assert any(doc.page_content == "foo" for doc in vector_output)
+
+        similarity_output = seeded_vectorstore.similarity_search(
+            "foo", k=3, fields=[text_key]
+        )
+        assert any(doc.page_content == "foo" for doc in similarity_output)
+
+    def test_id_in_results(self, seeded_vectorstore: CouchbaseQueryVectorStore) -> None:
+        """Test that the id is returned in the result documents."""
+        output = seeded_vectorstore.similarity_search(
+            "foo", k=3, fields=[seeded_vectorstore._text_key]
+        )
+        assert len(output) == 3
+        assert {doc.id for doc in output} == set(SEED_IDS)
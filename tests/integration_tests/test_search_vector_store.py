@@ -1,19 +1,28 @@
 """Test Couchbase Search Vector Store functionality"""
 
+import asyncio
 import json
 import os
-import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, List, Optional
 
 import pytest
 from couchbase import search
+from couchbase.cluster import Cluster
+from couchbase.mutation_state import MutationState
+from couchbase.n1ql import QueryProfile
+from couchbase.options import QueryOptions, SearchOptions
 from langchain_core.documents import Document
 
 from langchain_couchbase import (
     CouchbaseSearchVectorStore,
 )
-from tests.utils import ConsistentFakeEmbeddings
+from tests.utils import (
+    ConsistentFakeEmbeddings,
+    connect_cluster,
+    quote_keyspace,
+    wait_until,
+)
 
 CONNECTION_STRING = os.getenv("COUCHBASE_CONNECTION_STRING", "")
 BUCKET_NAME = os.getenv("COUCHBASE_BUCKET_NAME", "")
@@ -22,7 +31,22 @@ COLLECTION_NAME = os.getenv("COUCHBASE_COLLECTION_NAME", "")
 USERNAME = os.getenv("COUCHBASE_USERNAME", "")
 PASSWORD = os.getenv("COUCHBASE_PASSWORD", "")
 INDEX_NAME = os.getenv("COUCHBASE_INDEX_NAME", "")
-SLEEP_DURATION = 1
+INVALID_INDEX_NAME = "langchain-vs-testing-invalid-index"
+# When run in parallel with pytest-xdist (pytest -n 4), each worker uses its own
+# collection and search indexes, so that the tests running at the same time do
+# not see each other's documents
+XDIST_WORKER = os.getenv("PYTEST_XDIST_WORKER", "")
+if XDIST_WORKER and COLLECTION_NAME and INDEX_NAME:
+    COLLECTION_NAME = f"{COLLECTION_NAME}_{XDIST_WORKER}"
+    INDEX_NAME = f"{INDEX_NAME}_{XDIST_WORKER}"
+    INVALID_INDEX_NAME = f"{INVALID_INDEX_NAME}_{XDIST_WORKER}"
+# How long, in seconds, to wait for the cluster to be ready when connecting
+READY_TIMEOUT = float(os.getenv("COUCHBASE_READY_TIMEOUT", "5"))
+# Upper bound, in seconds, on polling for documents and indexes to become visible
+WAIT_TIMEOUT = 5
+
+# Shared by all the tests, so the same texts always get the same vectors
+EMBEDDINGS = ConsistentFakeEmbeddings()
 
 
 def set_all_env_vars() -> bool:
@@ -39,130 +63,335 @@ def set_all_env_vars() -> bool:
     )
 
 
-def get_cluster() -> Any:
-    """Get a couchbase cluster object"""
-    from datetime import timedelta
-
-    from couchbase.auth import PasswordAuthenticator
-    from couchbase.cluster import Cluster
-    from couchbase.options import ClusterOptions
+pytestmark = pytest.mark.couchbase
 
-    auth = PasswordAuthenticator(USERNAME, PASSWORD)
-    options = ClusterOptions(auth)
-    options.apply_profile("wan_development")
-    connect_string = CONNECTION_STRING
-    cluster = Cluster(connect_string, options)
+# All the tests of the module need a cluster, so the whole module is skipped
+# before its fixtures and tests are collected
+if not set_all_env_vars():
+    pytest.skip("Missing Couchbase environment variables", allow_module_level=True)
 
-    # Wait until the cluster is ready for use.
-    cluster.wait_until_ready(timedelta(seconds=5))
 
-    return cluster
+def get_cluster() -> Cluster:
+    """Get a couchbase cluster object, reusing the connection across tests"""
+    return connect_cluster(CONNECTION_STRING, USERNAME, PASSWORD, READY_TIMEOUT)
 
 
-@pytest.fixture()
-def cluster() -> Any:
+@pytest.fixture(scope="module")
+def cluster() -> Cluster:
     """Get a couchbase cluster object"""
     return get_cluster()
 
 
-def delete_documents(
-    cluster: Any, bucket_name: str, scope_name: str, collection_name: str
-) -> None:
-    """Delete all the documents in the collection"""
-    query = f"DELETE FROM `{bucket_name}`.`{scope_name}`.`{collection_name}`"
-    cluster.query(query).execute()
+def make_vectorstore(
+    cluster: Cluster, index_name: str = INDEX_NAME
+) -> CouchbaseSearchVectorStore:
+    """Get a vector store on the collection under test"""
+    return CouchbaseSearchVectorStore(
+        cluster=cluster,
+        embedding=EMBEDDINGS,
+        index_name=index_name,
+        bucket_name=BUCKET_NAME,
+        scope_name=SCOPE_NAME,
+        collection_name=COLLECTION_NAME,
+    )
+
+
+@pytest.fixture(scope="module")
+def vectorstore(cluster: Cluster) -> CouchbaseSearchVectorStore:
+    """Get a vector store on the collection and search index under test. The
+    store holds no state of its own, so one instance serves all the tests."""
+    ensure_vector_search_index(cluster)
+    return make_vectorstore(cluster)
+
+
+@pytest.fixture(scope="session")
+def abc_vector() -> List[float]:
+    """Embedding of a text unrelated to the documents, for the filter tests"""
+    return EMBEDDINGS.embed_query("abc")
+
+
+@pytest.fixture(scope="session")
+def foo_vector() -> List[float]:
+    """Embedding of the text searched by most tests"""
+    return EMBEDDINGS.embed_query("foo")
+
+
+@pytest.fixture(scope="session")
+def worker_collection() -> Iterator[None]:
+    """Create the collection of the pytest-xdist worker, if it is missing, and
+    drop it with its search indexes once the tests are done"""
+    if not XDIST_WORKER:
+        yield
+        return
+
+    from couchbase.exceptions import CollectionAlreadyExistsException
+
+    cluster = get_cluster()
+    bucket = cluster.bucket(BUCKET_NAME)
+    try:
+        bucket.collections().create_collection(SCOPE_NAME, COLLECTION_NAME)
+    except CollectionAlreadyExistsException:
+        pass
+
+    # The collection needs a primary index for its documents to be deleted
+    # between tests. The search index is created by ensure_vector_search_index.
+    keyspace = quote_keyspace(BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+    wait_until(
+        lambda: cluster.query(
+            f"CREATE PRIMARY INDEX IF NOT EXISTS ON {keyspace}"
+        ).execute(),
+        lambda _: True,
+        timeout=WAIT_TIMEOUT,
+    )
 
+    yield
+
+    scope_index_manager = bucket.scope(SCOPE_NAME).search_indexes()
+    for index_name in (INDEX_NAME, INVALID_INDEX_NAME):
+        if search_index_exists(scope_index_manager, index_name):
+            scope_index_manager.drop_index(index_name)
+    bucket.collections().drop_collection(SCOPE_NAME, COLLECTION_NAME)
+
+
+# Corpus shared by the tests that only search it, with the metadata they check
+SEED_TEXTS = ["foo", "bar", "baz"]
+SEED_METADATAS = [
+    {"page": 1, "a": 1, "section": "index"},
+    {"page": 2, "b": 2, "section": "glossary"},
+    {"page": 3, "c": 3, "section": "appendix"},
+]
+SEED_IDS = ["a", "b", "c"]
+
+
+@pytest.fixture(scope="class")
+def seeded_vectorstore(cluster: Cluster) -> Iterator[CouchbaseSearchVectorStore]:
+    """Get a vector store with the seed corpus added, once it is indexed.
+    The corpus is written through KV, for the search to wait on its mutations."""
+    ensure_vector_search_index(cluster)
+    delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+    vectorstore = make_vectorstore(cluster)
+    mutation_state = seed_documents(vectorstore, SEED_TEXTS, SEED_METADATAS, SEED_IDS)
+    wait_for_mutations(cluster, mutation_state)
+    yield vectorstore
+    delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, SEED_IDS)
+
+
+@pytest.fixture(scope="class")
+def empty_collection(cluster: Cluster) -> None:
+    """Create the search index if it is missing, and empty the collection under
+    test before the tests of the class"""
+    ensure_vector_search_index(cluster)
+    delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+
+
+@pytest.fixture
+def written_ids(
+    request: pytest.FixtureRequest, cluster: Cluster
+) -> Iterator[List[str]]:
+    """Collect the ids of the documents written by the test, to remove them
+    through KV once it is done. The whole collection is emptied instead if the
+    test failed or recorded no ids, as its documents may not all be known."""
+    tests_failed = request.session.testsfailed
+    ids: List[str] = []
+    yield ids
+    if request.session.testsfailed > tests_failed or not ids:
+        delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+    else:
+        delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME, ids)
+
+
+@pytest.fixture(scope="session")
+def scope_index_manager() -> Any:
+    """Get the manager of the search indexes in the scope under test"""
+    return get_cluster().bucket(BUCKET_NAME).scope(SCOPE_NAME).search_indexes()
 
-def ensure_vector_search_index(cluster: Any) -> None:
+
+@pytest.fixture(scope="session")
+def invalid_search_index(scope_index_manager: Any) -> str:
+    """Create a search index without the text and metadata fields, if it is
+    missing. It is kept across runs, as creating search indexes is slow."""
     from couchbase.management.search import SearchIndex
 
-    fixture_path = (
-        Path(__file__).resolve().parent.parent
-        / "fixtures"
-        / "search_index_definition_for_vector_store_testing.json"
-    )
-    definition = fixture_path.read_text()
-    definition = definition.replace("<<BUCKET_NAME>>", BUCKET_NAME)
-    definition = definition.replace("<<SCOPE_NAME>>", SCOPE_NAME)
-    definition = definition.replace("<<COLLECTION_NAME>>", COLLECTION_NAME)
-    definition = definition.replace("<<INDEX_NAME>>", INDEX_NAME)
+    if search_index_exists(scope_index_manager, INVALID_INDEX_NAME):
+        return INVALID_INDEX_NAME
 
-    index_definition = json.loads(definition)
-    index_definition["name"] = INDEX_NAME
-    scope_index_manager = cluster.bucket(BUCKET_NAME).scope(SCOPE_NAME).search_indexes()
-    existing_indexes = {index.name for index in scope_index_manager.get_all_indexes()}
-    if INDEX_NAME not in existing_indexes:
-        cluster.bucket(BUCKET_NAME).scope(SCOPE_NAME).search_indexes().upsert_index(
-            SearchIndex.from_json(index_definition)
-        )
-    time.sleep(SLEEP_DURATION)
+    index_definition = load_search_index_definition(
+        "search_index_definition_without_fields_for_vector_store_testing.json",
+        INVALID_INDEX_NAME,
+    )
+    # Create the search index without text and metadata fields
+    scope_index_manager.upsert_index(SearchIndex.from_json(index_definition))
+    wait_until(
+        lambda: scope_index_manager.get_indexed_documents_count(INVALID_INDEX_NAME),
+        lambda _: True,
+        timeout=WAIT_TIMEOUT,
+    )
+    return INVALID_INDEX_NAME
 
 
-@pytest.mark.skipif(
-    not set_all_env_vars(), reason="Missing Couchbase environment variables"
-)
-class TestCouchbaseSearchVectorStore:
-    @classmethod
-    def setup_method(self) -> None:
-        cluster = get_cluster()
-        ensure_vector_search_index(cluster)
-        # Delete all the documents in the collection
-        delete_documents(cluster, BUCKET_NAME, SCOPE_NAME, COLLECTION_NAME)
+def delete_documents(
+    cluster: Cluster,
+    bucket_name: str,
+    scope_name: str,
+    collection_name: str,
+    ids: Optional[List[str]] = None,
+) -> None:
+    """Delete the documents with the given ids, or all the documents in the
+    collection if no ids are given"""
+    if ids is not None:
+        # A single KV batch, instead of a query scanning the collection. Missing
+        # documents, e.g. already deleted by the test, are not an error.
+        if ids:
+            collection = (
+                cluster.bucket(bucket_name)
+                .scope(scope_name)
+                .collection(collection_name)
+            )
+            collection.remove_multi(ids)
+        return
+
+    # Prepared, so the query service reuses the plan when the collection is
+    # emptied again
+    keyspace = quote_keyspace(bucket_name, scope_name, collection_name)
+    cluster.query(
+        f"DELETE FROM {keyspace}",
+        QueryOptions(adhoc=False, metrics=False, profile=QueryProfile.OFF),
+    ).execute()
+
+
+def search_index_exists(scope_index_manager: Any, index_name: str) -> bool:
+    """Check if the search index exists in the scope"""
+    return any(
+        index.name == index_name for index in scope_index_manager.get_all_indexes()
+    )
 
-    def test_from_documents(self, cluster: Any) -> None:
-        """Test end to end search using a list of documents."""
 
-        documents = [
-            Document(page_content="foo", metadata={"page": 1}),
-            Document(page_content="bar", metadata={"page": 2}),
-            Document(page_content="baz", metadata={"page": 3}),
-        ]
+def wait_for_indexed(
+    vectorstore: CouchbaseSearchVectorStore, count: int, query: str = "foo"
+) -> List[Document]:
+    """Wait until searches return count documents, as documents are indexed
+    asynchronously. Returns the last search results"""
+    # The query is embedded once for all the polled searches
+    vector = EMBEDDINGS.embed_query(query)
+    return wait_until(
+        lambda: vectorstore.similarity_search_by_vector(vector, k=count),
+        lambda output: len(output) >= count,
+        timeout=WAIT_TIMEOUT,
+    )
 
-        vectorstore = CouchbaseSearchVectorStore.from_documents(
-            documents,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            index_name=INDEX_NAME,
-        )
 
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+def load_search_index_definition(file_name: str, index_name: str) -> dict:
+    """Load a search index definition from the fixtures, for the collection and
+    the index name under test"""
+    fixture_path = Path(__file__).resolve().parent.parent / "fixtures" / file_name
+    definition = fixture_path.read_text()
+    definition = definition.replace("<<BUCKET_NAME>>", BUCKET_NAME)
+    definition = definition.replace("<<SCOPE_NAME>>", SCOPE_NAME)
+    definition = definition.replace("<<COLLECTION_NAME>>", COLLECTION_NAME)
+    definition = definition.replace("<<INDEX_NAME>>", index_name)
 
-        output = vectorstore.similarity_search("baz", k=1)
-        assert output[0].page_content == "baz"
-        assert output[0].metadata["page"] == 3
+    index_definition = json.loads(definition)
+    index_definition["name"] = index_name
+    return index_definition
+
+
+def seed_documents(
+    vectorstore: CouchbaseSearchVectorStore,
+    texts: List[str],
+    metadatas: List[dict],
+    ids: List[str],
+) -> MutationState:
+    """Write the documents for the texts straight to the collection, laid out
+    as add_texts does, and return the state of the mutations"""
+    documents = vectorstore._build_batch_docs(
+        ids, texts, metadatas, EMBEDDINGS.embed_documents(texts)
+    )
+    result = vectorstore._collection.upsert_multi(documents)
+    assert result.all_ok
+    return MutationState(*result.results.values())
+
+
+def wait_for_mutations(cluster: Cluster, mutation_state: MutationState) -> None:
+    """Wait until the search index has indexed the mutations. The search is
+    consistent with them, so the service only answers once they are indexed."""
+    scope = cluster.bucket(BUCKET_NAME).scope(SCOPE_NAME)
+    result = scope.search(
+        INDEX_NAME,
+        search.SearchRequest.create(search.MatchNoneQuery()),
+        SearchOptions(limit=1, consistent_with=mutation_state),
+    )
+    list(result.rows())
 
-    def test_from_texts(self, cluster: Any) -> None:
-        """Test end to end search using a list of texts."""
 
-        texts = [
-            "foo",
-            "bar",
-            "baz",
-        ]
+def ensure_vector_search_index(cluster: Cluster) -> None:
+    from couchbase.management.search import SearchIndex
 
-        vectorstore = CouchbaseSearchVectorStore.from_texts(
-            texts,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
+    scope_index_manager = cluster.bucket(BUCKET_NAME).scope(SCOPE_NAME).search_indexes()
+    if not search_index_exists(scope_index_manager, INDEX_NAME):
+        # The definition is only read when the index has to be created
+        index_definition = load_search_index_definition(
+            "search_index_definition_for_vector_store_testing.json", INDEX_NAME
+        )
+        scope_index_manager.upsert_index(SearchIndex.from_json(index_definition))
+        # Wait for the new index to accept requests
+        wait_until(
+            lambda: scope_index_manager.get_indexed_documents_count(INDEX_NAME),
+            lambda _: True,
+            timeout=WAIT_TIMEOUT,
         )
 
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
 
-        output = vectorstore.similarity_search("foo", k=1)
-        assert len(output) == 1
-        assert output[0].page_content == "foo"
+@pytest.mark.usefixtures("worker_collection", "empty_collection")
+class TestCouchbaseSearchVectorStore:
+    @staticmethod
+    def seed(
+        vectorstore: CouchbaseSearchVectorStore,
+        documents: List[Document],
+        written_ids: List[str],
+    ) -> None:
+        """Write the documents for a test that does not cover adding them in a
+        single KV batch, and wait for them to be indexed"""
+        ids = [f"doc_{i}" for i in range(len(documents))]
+        written_ids.extend(ids)
+        mutation_state = seed_documents(
+            vectorstore,
+            [document.page_content for document in documents],
+            [document.metadata for document in documents],
+            ids,
+        )
+        wait_for_mutations(vectorstore._cluster, mutation_state)
 
-    def test_from_texts_with_metadatas(self, cluster: Any) -> None:
-        """Test end to end search using a list of texts and metadatas."""
+    @pytest.mark.parametrize(
+        "from_documents, metadatas, query, expected_metadata",
+        [
+            pytest.param(
+                True,
+                [{"page": 1}, {"page": 2}, {"page": 3}],
+                "baz",
+                {"page": 3},
+                id="from_documents",
+            ),
+            pytest.param(False, None, "foo", {}, id="from_texts"),
+            pytest.param(
+                False,
+                [{"a": 1}, {"b": 2}, {"c": 3}],
+                "baz",
+                {"c": 3},
+                id="from_texts_with_metadatas",
+            ),
+        ],
+    )
+    def test_from_texts_and_documents(
+        self,
+        cluster: Cluster,
+        from_documents: bool,
+        metadatas: Optional[List[dict]],
+        query: str,
+        expected_metadata: dict,
+        written_ids: List[str],
+    ) -> None:
+        """Test end to end search using a list of documents, or of texts with
+        or without metadatas."""
 
         texts = [
             "foo",
@@ -170,27 +399,42 @@ class TestCouchbaseSearchVectorStore:
             "baz",
         ]
 
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseSearchVectorStore.from_texts(
-            texts,
-            ConsistentFakeEmbeddings(),
-            metadatas=metadatas,
-            cluster=cluster,
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("baz", k=1)
-        assert output[0].page_content == "baz"
-        assert output[0].metadata["c"] == 3
+        store_kwargs: dict[str, Any] = {
+            "cluster": cluster,
+            "index_name": INDEX_NAME,
+            "bucket_name": BUCKET_NAME,
+            "scope_name": SCOPE_NAME,
+            "collection_name": COLLECTION_NAME,
+        }
+        if from_documents:
+            documents = [
+                Document(page_content=text, metadata=metadata)
+                for text, metadata in zip(texts, metadatas or [{}] * len(texts))
+            ]
+            vectorstore = CouchbaseSearchVectorStore.from_documents(
+                documents, EMBEDDINGS, **store_kwargs
+            )
+        else:
+            vectorstore = CouchbaseSearchVectorStore.from_texts(
+                texts, EMBEDDINGS, metadatas=metadatas, **store_kwargs
+            )
 
-    def test_add_texts_with_ids_and_metadatas(self, cluster: Any) -> None:
+        # Wait for the documents to be indexed, searching for the text checked
+        # below. Their ids are generated, so they are read back from the results
+        # for the cleanup, unless some are missing and the collection has to be
+        # emptied.
+        output = wait_for_indexed(vectorstore, len(texts), query=query)
+        if len(output) == len(texts):
+            written_ids.extend([document.id for document in output if document.id])
+
+        assert len(output) == len(texts)
+        assert output[0].page_content == query
+        for key, value in expected_metadata.items():
+            assert output[0].metadata[key] == value
+
+    def test_add_texts_with_ids_and_metadatas(
+        self, vectorstore: CouchbaseSearchVectorStore, written_ids: List[str]
+    ) -> None:
         """Test end to end search by adding a list of texts, ids and metadatas."""
 
         texts = [
@@ -203,31 +447,26 @@ class TestCouchbaseSearchVectorStore:
 
         metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
 
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
         results = vectorstore.add_texts(
             texts,
             ids=ids,
             metadatas=metadatas,
         )
         assert results == ids
+        written_ids.extend(ids)
 
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=1)
+        # Wait for the documents to be indexed, the results for "foo" are checked
+        output = wait_for_indexed(vectorstore, len(texts))
         assert output[0].id == "a"
         assert output[0].page_content == "foo"
         assert output[0].metadata["a"] == 1
 
-    def test_delete_texts_with_ids(self, cluster: Any) -> None:
+    def test_delete_texts_with_ids(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        foo_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test deletion of documents by ids."""
         texts = [
             "foo",
@@ -239,196 +478,29 @@ class TestCouchbaseSearchVectorStore:
 
         metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
 
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        results = vectorstore.add_texts(
-            texts,
-            ids=ids,
-            metadatas=metadatas,
-        )
-        assert results == ids
+        # Only the deletion is under test, so the documents are written in a
+        # single KV batch and deleted without waiting for them to be indexed
+        written_ids.extend(ids)
+        seed_documents(vectorstore, texts, metadatas, ids)
         assert vectorstore.delete(ids)
 
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=1)
-        assert len(output) == 0
-
-    def test_similarity_search_with_scores(self, cluster: Any) -> None:
-        """Test similarity search with scores."""
-
-        texts = ["foo", "bar", "baz"]
-
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        vectorstore.add_texts(texts, metadatas=metadatas)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search_with_score("foo", k=2)
-
-        assert len(output) == 2
-        assert output[0][0].page_content == "foo"
-
-        # check if the scores are sorted
-        assert output[0][0].metadata["a"] == 1
-        assert output[0][1] > output[1][1]
-
-    def test_similarity_search_by_vector(self, cluster: Any) -> None:
-        """Test similarity search by vector."""
-
-        texts = ["foo", "bar", "baz"]
-
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        vectorstore.add_texts(texts, metadatas=metadatas)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        vector = ConsistentFakeEmbeddings().embed_query("foo")
-        vector_output = vectorstore.similarity_search_by_vector(vector, k=1)
-
-        assert vector_output[0].page_content == "foo"
-
-        similarity_output = vectorstore.similarity_search("foo", k=1)
-
-        assert similarity_output == vector_output
-
-    def test_output_fields(self, cluster: Any) -> None:
-        """Test that output fields are set correctly."""
-
-        texts = [
-            "foo",
-            "bar",
-            "baz",
-        ]
-
-        metadatas = [{"page": 1, "a": 1}, {"page": 2, "b": 2}, {"page": 3, "c": 3}]
-
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        ids = vectorstore.add_texts(texts, metadatas)
-        assert len(ids) == len(texts)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=1, fields=["metadata.page"])
-        assert output[0].page_content == "foo"
-        assert output[0].metadata["page"] == 1
-        assert "a" not in output[0].metadata
-
-    def test_hybrid_search(self, cluster: Any) -> None:
-        """Test hybrid search."""
-
-        texts = [
-            "foo",
-            "bar",
-            "baz",
-        ]
-
-        metadatas = [
-            {"section": "index"},
-            {"section": "glossary"},
-            {"section": "appendix"},
-        ]
-
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        vectorstore.add_texts(texts, metadatas=metadatas)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        result, score = vectorstore.similarity_search_with_score("foo", k=1)[0]
-
-        # Wait for the documents to be indexed for hybrid search
-        time.sleep(SLEEP_DURATION)
-
-        hybrid_result, hybrid_score = vectorstore.similarity_search_with_score(
-            "foo",
-            k=1,
-            search_options={"query": {"match": "index", "field": "metadata.section"}},
-        )[0]
-
-        assert result == hybrid_result
-        assert score <= hybrid_score
-
-    def test_id_in_results(self, cluster: Any) -> None:
-        """Test that the id is returned in the result documents."""
-
-        texts = [
-            "foo",
-            "bar",
-            "baz",
-        ]
-
-        metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
-
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
+        # Wait for the deletion to be indexed
+        output = wait_until(
+            lambda: vectorstore.similarity_search_by_vector(foo_vector, k=1),
+            lambda output: len(output) == 0,
+            timeout=WAIT_TIMEOUT,
         )
+        assert len(output) == 0
 
-        ids = vectorstore.add_texts(texts, metadatas=metadatas)
-        assert len(ids) == len(texts)
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        output = vectorstore.similarity_search("foo", k=1)
-        assert output[0].id == ids[0]
-
-    def test_search_index_without_fields(self, cluster: Any) -> None:
+    def test_invalid_index_raises(
+        self,
+        cluster: Cluster,
+        scope_index_manager: Any,
+        invalid_search_index: str,
+        written_ids: List[str],
+    ) -> None:
         """Test that the right error is raised if the search index
         does not contain the required fields."""
-        from couchbase.management.search import SearchIndex
 
         texts = [
             "foo",
@@ -438,134 +510,35 @@ class TestCouchbaseSearchVectorStore:
 
         metadatas = [{"a": 1}, {"b": 2}, {"c": 3}]
 
-        # Create a search index without the required fields
-        scope_index_manager = (
-            cluster.bucket(BUCKET_NAME).scope(SCOPE_NAME).search_indexes()
-        )
-        INVALID_INDEX_NAME = "langchain-vs-testing-invalid-index"
-        try:
-            scope_index_manager.drop_index(INVALID_INDEX_NAME)
-            time.sleep(SLEEP_DURATION)
-        except Exception:
-            pass
-
-        index_definition = {
-            "type": "fulltext-index",
-            "name": INVALID_INDEX_NAME,
-            "sourceType": "gocbcore",
-            "sourceName": BUCKET_NAME,
-            "planParams": {"maxPartitionsPerPIndex": 1024, "indexPartitions": 1},
-            "params": {
-                "doc_config": {
-                    "docid_prefix_delim": "",
-                    "docid_regexp": "",
-                    "mode": "scope.collection.type_field",
-                    "type_field": "type",
-                },
-                "mapping": {
-                    "analysis": {},
-                    "default_analyzer": "standard",
-                    "default_datetime_parser": "dateTimeOptional",
-                    "default_field": "_all",
-                    "default_mapping": {"dynamic": False, "enabled": False},
-                    "default_type": "_default",
-                    "docvalues_dynamic": False,
-                    "index_dynamic": True,
-                    "store_dynamic": False,
-                    "type_field": "_type",
-                    "types": {
-                        f"{SCOPE_NAME}.{COLLECTION_NAME}": {
-                            "dynamic": False,
-                            "enabled": True,
-                            "properties": {
-                                "embedding": {
-                                    "dynamic": False,
-                                    "enabled": True,
-                                    "fields": [
-                                        {
-                                            "dims": 10,
-                                            "index": True,
-                                            "name": "embedding",
-                                            "similarity": "l2_norm",
-                                            "type": "vector",
-                                            "vector_index_optimized_for": "recall",
-                                        }
-                                    ],
-                                },
-                            },
-                        }
-                    },
-                },
-                "store": {"indexType": "scorch", "segmentVersion": 16},
-            },
-            "sourceParams": {},
-        }
-
-        # Create the search index without text and metadata fields
-        scope_index_manager.upsert_index(SearchIndex.from_json(index_definition))
-
         # Create the vector store with the invalid search index
-        invalid_index_vs = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INVALID_INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
+        invalid_index_vs = make_vectorstore(cluster, invalid_search_index)
 
-        ids = invalid_index_vs.add_texts(texts, metadatas=metadatas)
-        assert len(ids) == len(texts)
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+        # Adding the documents is not under test, so they are written in a
+        # single KV batch
+        ids = ["a", "b", "c"]
+        written_ids.extend(ids)
+        seed_documents(invalid_index_vs, texts, metadatas, ids)
+        # Wait for the documents to be indexed. Searches on the invalid index fail,
+        # so the indexed documents are counted instead.
+        wait_until(
+            lambda: scope_index_manager.get_indexed_documents_count(
+                invalid_search_index
+            ),
+            lambda count: count >= len(texts),
+            timeout=WAIT_TIMEOUT,
+        )
         with pytest.raises(
             ValueError,
             match=("Search results do not contain the fields from the document."),
         ):
-            output = invalid_index_vs.similarity_search("foo", k=1)
-
-        # Drop the invalid search index
-        scope_index_manager.drop_index(INVALID_INDEX_NAME)
-        time.sleep(SLEEP_DURATION)
-
-        # Test the search index with the required fields reusing the same collection
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        output = vectorstore.similarity_search("foo", k=1)
-        assert output[0].id == ids[0]
-
-    def test_retriever(self, cluster: Any) -> None:
-        """Test the SearchVectorStore as a retriever."""
-        texts = ["foo", "bar", "baz"]
-        vectorstore = CouchbaseSearchVectorStore.from_texts(
-            texts=texts,
-            embedding=ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        # Create the retriever
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 1})
-        docs = retriever.invoke("foo")
-
-        assert len(docs) == 1
-
-        assert docs[0].page_content == "foo"
-
-    def test_filter_on_metadata(self, cluster: Any) -> None:
+            invalid_index_vs.similarity_search("foo", k=1)
+
+    def test_filter_on_metadata(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        foo_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test filter on metadata field."""
         documents = [
             Document(page_content="foo", metadata={"page": 1}),
@@ -573,18 +546,7 @@ class TestCouchbaseSearchVectorStore:
             Document(page_content="foo", metadata={"page": 3}),
         ]
 
-        vectorstore = CouchbaseSearchVectorStore.from_documents(
-            documents,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            index_name=INDEX_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+        self.seed(vectorstore, documents, written_ids)
 
         pre_filter = search.NumericRangeQuery(
             field="metadata.page",
@@ -594,12 +556,19 @@ class TestCouchbaseSearchVectorStore:
             inclusive_max=False,
         )
 
-        output = vectorstore.similarity_search("foo", k=3, filter=pre_filter)
+        output = vectorstore.similarity_search_by_vector(
+            foo_vector, k=3, filter=pre_filter
+        )
         assert len(output) == 1
         assert output[0].page_content == "foo"
         assert output[0].metadata["page"] == 1
 
-    def test_filter_on_text(self, cluster: Any) -> None:
+    def test_filter_on_text(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        abc_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test filter on text field."""
         documents = [
             Document(page_content="foo", metadata={"page": 1}),
@@ -607,28 +576,24 @@ class TestCouchbaseSearchVectorStore:
             Document(page_content="baz", metadata={"page": 3}),
         ]
 
-        vectorstore = CouchbaseSearchVectorStore.from_documents(
-            documents,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            index_name=INDEX_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+        self.seed(vectorstore, documents, written_ids)
 
         pre_filter = search.TermQuery("foo", field="text")
 
         # Only the first document should match the filter
-        output = vectorstore.similarity_search("abc", k=3, filter=pre_filter)
+        output = vectorstore.similarity_search_by_vector(
+            abc_vector, k=3, filter=pre_filter
+        )
         assert len(output) == 1
         assert output[0].page_content == "foo"
         assert output[0].metadata["page"] == 1
 
-    def test_combined_filter_with_or_operator(self, cluster: Any) -> None:
+    def test_combined_filter_with_or_operator(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        abc_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test combination of filters with OR operator."""
         documents = [
             Document(page_content="foo", metadata={"page": 1, "topic": "apple"}),
@@ -636,18 +601,7 @@ class TestCouchbaseSearchVectorStore:
             Document(page_content="baz", metadata={"page": 3, "topic": "cherry"}),
         ]
 
-        vectorstore = CouchbaseSearchVectorStore.from_documents(
-            documents,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            index_name=INDEX_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+        self.seed(vectorstore, documents, written_ids)
 
         # Only consider documents that have topic "apple" or "banana"
         pre_filter = search.DisjunctionQuery(
@@ -656,7 +610,9 @@ class TestCouchbaseSearchVectorStore:
             min=1,
         )
 
-        output = vectorstore.similarity_search("abc", k=3, filter=pre_filter)
+        output = vectorstore.similarity_search_by_vector(
+            abc_vector, k=3, filter=pre_filter
+        )
         assert len(output) == 2
         for result in output:
             assert (
@@ -664,7 +620,12 @@ class TestCouchbaseSearchVectorStore:
                 or result.metadata["topic"] == "banana"
             )
 
-    def test_combined_filter_with_and_operator(self, cluster: Any) -> None:
+    def test_combined_filter_with_and_operator(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        abc_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test combination of filters with AND operator."""
         documents = [
             Document(page_content="foo", metadata={"page": 1, "topic": "apple"}),
@@ -672,18 +633,7 @@ class TestCouchbaseSearchVectorStore:
             Document(page_content="foo", metadata={"page": 3, "topic": "cherry"}),
         ]
 
-        vectorstore = CouchbaseSearchVectorStore.from_documents(
-            documents,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            index_name=INDEX_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+        self.seed(vectorstore, documents, written_ids)
 
         # Only consider documents that have topic "apple" and page 1 or 2
         pre_filter = search.ConjunctionQuery(
@@ -697,13 +647,20 @@ class TestCouchbaseSearchVectorStore:
             ),
         )
 
-        output = vectorstore.similarity_search("abc", k=3, filter=pre_filter)
+        output = vectorstore.similarity_search_by_vector(
+            abc_vector, k=3, filter=pre_filter
+        )
         assert len(output) == 1
         assert output[0].page_content == "foo"
         assert output[0].metadata["page"] == 1
         assert output[0].metadata["topic"] == "apple"
 
-    def test_invalid_filter(self, cluster: Any) -> None:
+    def test_invalid_filter(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        abc_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test invalid filter."""
         documents = [
             Document(page_content="foo", metadata={"page": 1, "topic": "apple"}),
@@ -711,26 +668,22 @@ class TestCouchbaseSearchVectorStore:
             Document(page_content="baz", metadata={"page": 3, "topic": "cherry"}),
         ]
 
-        vectorstore = CouchbaseSearchVectorStore.from_documents(
-            documents,
-            ConsistentFakeEmbeddings(),
-            cluster=cluster,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-            index_name=INDEX_NAME,
-        )
-
-        # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
+        self.seed(vectorstore, documents, written_ids)
 
         # Invalid filter
         pre_filter = {"term": "apple", "field": "metadata.topic"}
 
         with pytest.raises(ValueError, match="Invalid filter"):
-            _ = vectorstore.similarity_search("abc", k=3, filter=pre_filter)
+            _ = vectorstore.similarity_search_by_vector(
+                abc_vector, k=3, filter=pre_filter
+            )
 
-    def test_filter_with_hybrid_search(self, cluster: Any) -> None:
+    async def test_filter_with_hybrid_search(
+        self,
+        vectorstore: CouchbaseSearchVectorStore,
+        foo_vector: List[float],
+        written_ids: List[str],
+    ) -> None:
         """Test filter with hybrid search."""
 
         texts = [
@@ -745,37 +698,31 @@ class TestCouchbaseSearchVectorStore:
             {"section": "appendix", "page": 3},
         ]
 
-        vectorstore = CouchbaseSearchVectorStore(
-            cluster=cluster,
-            embedding=ConsistentFakeEmbeddings(),
-            index_name=INDEX_NAME,
-            bucket_name=BUCKET_NAME,
-            scope_name=SCOPE_NAME,
-            collection_name=COLLECTION_NAME,
-        )
-
-        vectorstore.add_texts(texts, metadatas=metadatas)
+        written_ids.extend(vectorstore.add_texts(texts, metadatas=metadatas))
 
         # Wait for the documents to be indexed
-        time.sleep(SLEEP_DURATION)
-
-        result = vectorstore.similarity_search("foo", k=3)
-
-        hybrid_result = vectorstore.similarity_search_with_score(
-            "foo",
-            k=3,
-            search_options={
-                "query": {"match": "index", "field": "metadata.section"},
-            },
-        )
-
-        hybrid_result_with_pre_filter = vectorstore.similarity_search(
-            "foo",
-            k=3,
-            search_options={
-                "query": {"match": "index", "field": "metadata.section"},
-            },
-            filter=search.TermQuery("index", field="metadata.section"),
+        wait_for_indexed(vectorstore, len(texts))
+
+        # The searches are independent, so they run at the same time. The query
+        # is only embedded by the first one, the others search by its vector.
+        result, hybrid_result, hybrid_result_with_pre_filter = await asyncio.gather(
+            vectorstore.asimilarity_search("foo", k=3),
+            asyncio.to_thread(
+                vectorstore.similarity_search_with_score_by_vector,
+                foo_vector,
+                k=3,
+                search_options={
+                    "query": {"match": "index", "field": "metadata.section"},
+                },
+            ),
+            vectorstore.asimilarity_search_by_vector(
+                foo_vector,
+                k=3,
+                search_options={
+                    "query": {"match": "index", "field": "metadata.section"},
+                },
+                filter=search.TermQuery("index", field="metadata.section"),
+            ),
         )
 
         assert len(result) == 3
@@ -783,3 +730,112 @@ class TestCouchbaseSearchVectorStore:
         assert len(hybrid_result_with_pre_filter) == 1
         assert hybrid_result_with_pre_filter[0].metadata["section"] == "index"
         assert hybrid_result_with_pre_filter[0].metadata["page"] == 1
+
+
+@pytest.mark.usefixtures("worker_collection")
+class TestCouchbaseSearchVectorStoreSearch:
+    """Searches over a corpus seeded once for the class"""
+
+    def test_similarity_search_with_scores(
+        self, seeded_vectorstore: CouchbaseSearchVectorStore
+    ) -> None:
+        """Test similarity search with scores."""
+        output = seeded_vectorstore.similarity_search_with_score("foo", k=2)
+
+        assert len(output) == 2
+        assert output[0][0].page_content == "foo"
+
+        # check if the scores are sorted
+        assert output[0][0].metadata["a"] == 1
+        assert output[0][1] > output[1][1]
+
+    async def test_similarity_search_by_vector(
+        self, seeded_vectorstore: CouchbaseSearchVectorStore, foo_vector: List[float]
+    ) -> None:
+        """Test similarity search by vector."""
+        # Both searches only read the seed corpus, so they run at the same time
+        vector_output, similarity_output = await asyncio.gather(
+            asyncio.to_thread(
+                seeded_vectorstore.similarity_search_by_vector, foo_vector, k=1
+            ),
+            seeded_vectorstore.asimilarity_search("foo", k=1),
+        )
+
+        assert vector_output[0].page_content == "foo"
+        assert similarity_output == vector_output
+
+    def test_similarity_search_batch(
+        self, seeded_vectorstore: CouchbaseSearchVectorStore
+    ) -> None:
+        """Test batched similarity search by queries and by vectors."""
+        batch_output = seeded_vectorstore.similarity_search_batch(["baz", "foo"], k=1)
+        assert [docs[0].page_content for docs in batch_output] == ["baz", "foo"]
+
+        vectors = EMBEDDINGS.embed_documents(SEED_TEXTS)
+        vector_output = seeded_vectorstore.similarity_search_with_score_by_vector_batch(
+            vectors, k=1
+        )
+        assert [results[0][0].page_content for results in vector_output] == SEED_TEXTS
+
+    def test_output_fields(
+        self, seeded_vectorstore: CouchbaseSearchVectorStore, foo_vector: List[float]
+    ) -> None:
+        """Test that output fields are set correctly."""
+        output = seeded_vectorstore.similarity_search_by_vector(
+            foo_vector, k=1, fields=["metadata.page"]
+        )
+        assert output[0].page_content == "foo"
+        assert output[0].metadata["page"] == 1
+        assert "a" not in output[0].metadata
+
+    async def test_hybrid_search(
+        self, seeded_vectorstore: CouchbaseSearchVectorStore, foo_vector: List[float]
+    ) -> None:
+        """Test hybrid search."""
+        # The searches are independent, so they run at the same time. The hybrid
+        # one searches by the vector of the query instead of embedding it again.
+        output, hybrid_output = await asyncio.gather(
+            seeded_vectorstore.asimilarity_search_with_score("foo", k=1),
+            asyncio.to_thread(
+                seeded_vectorstore.similarity_search_with_score_by_vector,
+                foo_vector,
+                k=1,
+                search_options={
+                    "query": {"match": "index", "field": "metadata.section"}
+                },
+            ),
+        )
+        result, score = output[0]
+        hybrid_result, hybrid_score = hybrid_output[0]
+
+        assert result == hybrid_result
+        assert score <= hybrid_score
+
+    def test_valid_index_after_collection_reuse(
+        self,
+        seeded_vectorstore: CouchbaseSearchVectorStore,
+        invalid_search_index: str,
+        foo_vector: List[float],
+    ) -> None:
+        """Test that the search index with the required fields returns the
+        documents when an invalid index is defined on the same collection."""
+        output = seeded_vectorstore.similarity_search_by_vector(foo_vector, k=1)
+        assert output[0].id == SEED_IDS[0]
+        assert output[0].page_content == "foo"
+        assert output[0].metadata["a"] == 1
+
+    def test_id_in_results(
+        self, seeded_vectorstore: CouchbaseSearchVectorStore, foo_vector: List[float]
+    ) -> None:
+        """Test that the id is returned in the result documents."""
+        output = seeded_vectorstore.similarity_search_by_vector(foo_vector, k=1)
+        assert output[0].id == SEED_IDS[0]
+
+    def test_retriever(self, seeded_vectorstore: CouchbaseSearchVectorStore) -> None:
+        """Test the SearchVectorStore as a retriever."""
+        retriever = seeded_vectorstore.as_retriever(search_kwargs={"k": 1})
+        docs = retriever.invoke("foo")
+
+        assert len(docs) == 1
+
+        assert docs[0].page_content == "foo"
@@ -0,0 +1,174 @@
+"""Unit tests of the caches, against an in memory cluster"""
+
+import hashlib
+import json
+from typing import Any, List, Sequence
+
+import pytest
+from langchain_core.load.dump import dumps
+from langchain_core.outputs import Generation
+
+from langchain_couchbase.cache import (
+    CouchbaseCache,
+    CouchbaseSemanticCache,
+    _dumps_generations,
+    _json_dumps,
+    _json_loads,
+    _loads_generations,
+)
+from langchain_couchbase.vectorstores import CouchbaseSearchVectorStore
+from tests.utils import ConsistentFakeEmbeddings, FakeCluster
+
+GENERATIONS = [Generation(text="fizz"), Generation(text="buzz", generation_info={})]
+
+
+def make_cache(md5_keys: bool = False) -> CouchbaseCache:
+    return CouchbaseCache(
+        FakeCluster(),
+        bucket_name="bucket",
+        scope_name="scope",
+        collection_name="cache",
+        md5_keys=md5_keys,
+    )
+
+
+def test_generations_round_trip() -> None:
+    assert _loads_generations(_dumps_generations(GENERATIONS)) == GENERATIONS
+
+
+def test_loads_generations_of_serialized_dict_items() -> None:
+    blob = _dumps_generations(GENERATIONS)
+    assert all(isinstance(item, dict) for item in json.loads(blob))
+    assert _loads_generations(blob) == GENERATIONS
+
+
+def test_loads_generations_of_json_string_items() -> None:
+    # written by the versions that dumped every generation to a string
+    blob = json.dumps([dumps(generation) for generation in GENERATIONS])
+    assert _loads_generations(blob) == GENERATIONS
+
+
+def test_loads_generations_of_legacy_generation_dicts() -> None:
+    blob = json.dumps([{"text": "fizz"}, {"text": "buzz"}])
+    assert _loads_generations(blob) == [
+        Generation(text="fizz"),
+        Generation(text="buzz"),
+    ]
+
+
+def test_loads_generations_of_a_malformed_blob() -> None:
+    assert _loads_generations("not json") is None
+
+
+def test_json_dumps_falls_back_to_json() -> None:
+    # orjson rejects non string keys and integers larger than 64 bits
+    assert _json_dumps({1: 2**70}) == '{"1":1180591620717411303424}'
+    assert _json_loads("NaN") != _json_loads("NaN")
+
+
+def test_cache_keys_are_blake2b_hashes() -> None:
+    cache = make_cache()
+    cache.update("foo", "bar", GENERATIONS)
+    key = hashlib.blake2b(b"foobar", digest_size=16).hexdigest()
+    assert list(cache._collection.docs) == [key]
+    assert cache.lookup("foo", "bar") == GENERATIONS
+
+
+def test_cache_md5_keys() -> None:
+    cache = make_cache(md5_keys=True)
+    cache.update("foo", "bar", GENERATIONS)
+    assert list(cache._collection.docs) == [hashlib.md5(b"foobar").hexdigest()]
+    assert cache.lookup("foo", "bar") == GENERATIONS
+
+
+def test_update_many() -> None:
+    cache = make_cache()
+    cache.update_many([("foo", "bar", GENERATIONS), ("fizz", "buzz", GENERATIONS[:1])])
+    assert len(cache._collection.docs) == 2
+    assert cache.lookup("foo", "bar") == GENERATIONS
+    assert cache.lookup("fizz", "buzz") == GENERATIONS[:1]
+    assert cache.lookup("foo", "buzz") is None
+
+
+def test_update_many_of_no_items() -> None:
+    cache = make_cache()
+    cache.update_many([])
+    assert cache._collection.docs == {}
+
+
+def test_get_or_compute_writes_in_the_background() -> None:
+    cache = make_cache()
+    assert cache.get_or_compute("foo", "bar", lambda: GENERATIONS) == GENERATIONS
+    cache.flush()
+    assert cache.lookup("foo", "bar") == GENERATIONS
+    assert cache.get_or_compute("foo", "bar", lambda: []) == GENERATIONS
+
+
+def test_get_or_compute_after_close() -> None:
+    cache = make_cache()
+    cache.get_or_compute("foo", "bar", lambda: GENERATIONS)
+    cache.close()
+    assert cache.lookup("foo", "bar") == GENERATIONS
+    cache.get_or_compute("fizz", "buzz", lambda: GENERATIONS)
+    cache.flush()
+    assert cache.lookup("fizz", "buzz") == GENERATIONS
+
+
+def make_write_behind_cache(
+    monkeypatch: pytest.MonkeyPatch, written: List[Any]
+) -> CouchbaseSemanticCache:
+    def add_entries(self: CouchbaseSemanticCache, items: Sequence[Any]) -> None:
+        written.extend(items)
+
+    monkeypatch.setattr(
+        CouchbaseSearchVectorStore, "_check_index_exists", lambda self: True
+    )
+    monkeypatch.setattr(CouchbaseSemanticCache, "_add_entries", add_entries)
+    return CouchbaseSemanticCache(
+        FakeCluster(),
+        ConsistentFakeEmbeddings(),
+        bucket_name="bucket",
+        scope_name="scope",
+        collection_name="semantic_cache",
+        index_name="index",
+        write_behind=True,
+    )
+
+
+def test_semantic_cache_close_writes_the_queued_updates(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    written: List[Any] = []
+    cache = make_write_behind_cache(monkeypatch, written)
+    writer = cache._writer
+    assert writer is not None and writer.is_alive()
+    cache.update("foo", "bar", GENERATIONS)
+    cache.update("fizz", "buzz", GENERATIONS)
+    cache.close()
+    assert not writer.is_alive()
+    assert [(prompt, llm) for prompt, llm, _ in written] == [
+        ("foo", "bar"),
+        ("fizz", "buzz"),
+    ]
+
+    # written in the caller's thread once closed
+    cache.update("baz", "qux", GENERATIONS)
+    assert written[-1][:2] == ("baz", "qux")
+    cache.flush()
+    cache.close()
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        pytest.param({"prompt": "foo"}, id="missing_return_val"),
+        pytest.param({"return_val": 1}, id="not_a_string"),
+        pytest.param({"return_val": '[{"lc": 1, "type": "x"}]'}, id="bad_item"),
+    ],
+)
+def test_lookup_of_a_corrupt_document(doc: dict) -> None:
+    cache = make_cache()
+    cache.update("foo", "bar", GENERATIONS)
+    key = next(iter(cache._collection.docs))
+    cache._collection.docs[key] = doc
+    assert cache.lookup("foo", "bar") is None
@@ -0,0 +1,101 @@
+"""Unit tests of the chat message history, against an in memory cluster"""
+
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from langchain_couchbase.chat_message_histories import CouchbaseChatMessageHistory
+from tests.utils import FakeCluster
+
+
+def make_history(batch_writes: bool = False) -> CouchbaseChatMessageHistory:
+    return CouchbaseChatMessageHistory(
+        cluster=FakeCluster(),
+        bucket_name="bucket",
+        scope_name="scope",
+        collection_name="history",
+        session_id="session",
+        create_index=False,
+        batch_writes=batch_writes,
+    )
+
+
+def test_add_messages_timestamps_are_ordered_float_seconds() -> None:
+    history = make_history()
+    before = time.time()
+    history.add_messages(
+        [
+            HumanMessage(content=str(i)) if i % 2 else AIMessage(content=str(i))
+            for i in range(250)
+        ]
+    )
+    assert history._collection.insert_calls == 3
+    documents = history._collection.docs.values()
+    timestamps = [doc["ts"] for doc in sorted(documents, key=lambda doc: doc["ts"])]
+    assert len(set(timestamps)) == 250
+    assert all(isinstance(ts, float) for ts in timestamps)
+    assert before <= timestamps[0] < timestamps[-1] < time.time() + 1
+    assert [
+        doc["message"]["data"]["content"]
+        for doc in sorted(documents, key=lambda doc: doc["ts"])
+    ] == [str(i) for i in range(250)]
+
+
+def test_cluster_must_be_a_couchbase_cluster() -> None:
+    with pytest.raises(ValueError, match="instance of couchbase.Cluster"):
+        CouchbaseChatMessageHistory(
+            cluster=SimpleNamespace(bucket=lambda name: None),  # type: ignore[arg-type]
+            bucket_name="bucket",
+            scope_name="scope",
+            collection_name="history",
+            session_id="session",
+        )
+
+
+def test_add_messages_of_a_single_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    history = make_history()
+
+    def no_thread_pool(*args: object, **kwargs: object) -> None:
+        raise AssertionError("a single batch should not use a thread pool")
+
+    monkeypatch.setattr(
+        "langchain_couchbase.chat_message_histories.ThreadPoolExecutor",
+        no_thread_pool,
+    )
+    history.add_messages([HumanMessage(content="hi"), AIMessage(content="hello")])
+    assert history._collection.insert_calls == 1
+    assert len(history._collection.docs) == 2
+
+    history.add_messages([])
+    assert history._collection.insert_calls == 1
+
+
+def test_get_messages_waits_for_the_timer_write(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    history = make_history(batch_writes=True)
+    collection = history._collection
+    insert_multi = collection.insert_multi
+    writing, release = threading.Event(), threading.Event()
+
+    def blocked_insert_multi(docs: Dict[str, Any], **kwargs: Any) -> Any:
+        writing.set()
+        assert release.wait(timeout=5)
+        return insert_multi(docs, **kwargs)
+
+    def query(statement: str, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        docs = sorted(collection.docs.values(), key=lambda doc: doc["ts"])
+        return [{"message": doc["message"]} for doc in docs]
+
+    monkeypatch.setattr(collection, "insert_multi", blocked_insert_multi)
+    monkeypatch.setattr(history._scope, "query", query, raising=False)
+
+    history.add_message(HumanMessage(content="hi"))
+    # the timer has taken the buffered message and is still writing it
+    assert writing.wait(timeout=5)
+    threading.Timer(0.05, release.set).start()
+    assert history.get_messages() == [HumanMessage(content="hi")]
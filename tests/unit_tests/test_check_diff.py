@@ -0,0 +1,42 @@
+"""Unit tests of the CI script selecting the test jobs"""
+
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+SCRIPT = Path(__file__).parents[2] / ".github" / "scripts" / "check_diff.py"
+
+
+@pytest.fixture(scope="module")
+def check_diff() -> ModuleType:
+    # the script uses tomllib, new in Python 3.11
+    pytest.importorskip("tomllib")
+    spec = importlib.util.spec_from_file_location("check_diff", SCRIPT)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _write_lock(path: Path, *packages: str) -> Path:
+    path.write_text(
+        "".join(
+            f'[[package]]\nname = "{name}"\nversion = "{version}"\n\n'
+            for name, version in (package.split("==") for package in packages)
+        )
+    )
+    return path
+
+
+def test_pydantic_version_from_lock(check_diff: ModuleType, tmp_path: Path) -> None:
+    lock = _write_lock(tmp_path / "poetry.lock", "orjson==3.10.0", "pydantic==2.9.2")
+    assert check_diff._pydantic_version_from_lock(check_diff._file_cache_key(lock)) == 9
+
+
+def test_pydantic_version_from_lock_without_pydantic(
+    check_diff: ModuleType, tmp_path: Path
+) -> None:
+    lock = _write_lock(tmp_path / "poetry.lock", "orjson==3.10.0")
+    assert check_diff._pydantic_version_from_lock(check_diff._file_cache_key(lock)) == 0
@@ -1,13 +1,17 @@
 from langchain_couchbase import __all__
 
-EXPECTED_ALL = [
-    "CouchbaseCache",
-    "CouchbaseSemanticCache",
-    "CouchbaseChatMessageHistory",
-    "CouchbaseSearchVectorStore",
-    "CouchbaseQueryVectorStore",
-]
+EXPECTED_ALL = frozenset(
+    {
+        "CouchbaseCache",
+        "CouchbaseSemanticCache",
+        "CouchbaseChatMessageHistory",
+        "CouchbaseSearchVectorStore",
+        "CouchbaseQueryVectorStore",
+    }
+)
 
 
 def test_all_imports() -> None:
-    assert sorted(EXPECTED_ALL) == sorted(__all__)
+    assert frozenset(__all__) == EXPECTED_ALL
+    # A set ignores repeated names, which sorted lists would have caught
+    assert len(__all__) == len(EXPECTED_ALL)
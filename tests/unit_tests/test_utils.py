@@ -0,0 +1,158 @@
+"""Unit tests of the shared helpers"""
+
+import base64
+import math
+import struct
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+from couchbase.exceptions import (
+    BucketNotFoundException,
+    CollectionNotFoundException,
+    UnAmbiguousTimeoutException,
+)
+
+from langchain_couchbase.utils import (
+    OrjsonSerializer,
+    check_bucket_exists,
+    check_scope_and_collection_exists,
+    encode_vector_base64,
+    get_bucket,
+)
+from tests.utils import FakeBucket, FakeCluster
+
+
+class _Float32Array:
+    """NumPy-like array, converted through astype and tobytes"""
+
+    def __init__(self, values: List[float]) -> None:
+        self.values = values
+        self.dtypes: List[str] = []
+
+    def astype(self, dtype: str) -> Any:
+        self.dtypes.append(dtype)
+        assert dtype == "<f4"
+        return self
+
+    def tobytes(self) -> bytes:
+        return struct.pack(f"<{len(self.values)}f", *self.values)
+
+
+def _decode(encoded: str) -> List[float]:
+    data = base64.b64decode(encoded)
+    return list(struct.unpack(f"<{len(data) // 4}f", data))
+
+
+def test_encode_vector_base64_of_a_list() -> None:
+    vector = [0.5, -1.25, 3.0]
+    encoded = encode_vector_base64(vector)
+    assert encoded == base64.b64encode(struct.pack("<3f", *vector)).decode()
+    assert _decode(encoded) == vector
+
+
+def test_encode_vector_base64_of_a_numpy_like_array() -> None:
+    array = _Float32Array([0.5, -1.25, 3.0])
+    encoded = encode_vector_base64(array)  # type: ignore[arg-type]
+    assert array.dtypes == ["<f4"]
+    assert encoded == encode_vector_base64([0.5, -1.25, 3.0])
+
+
+def test_encode_vector_base64_of_an_empty_vector() -> None:
+    assert encode_vector_base64([]) == ""
+
+
+def _raise(exception: Exception) -> Any:
+    def raise_exception(*args: Any, **kwargs: Any) -> Any:
+        raise exception
+
+    return raise_exception
+
+
+def test_check_bucket_exists() -> None:
+    cluster = FakeCluster()
+    assert check_bucket_exists(cluster, "bucket")
+
+
+def test_check_bucket_exists_of_a_missing_bucket() -> None:
+    cluster = FakeCluster()
+    cluster.bucket("bucket").ping = _raise(BucketNotFoundException())
+    assert not check_bucket_exists(cluster, "bucket")
+
+
+def test_check_bucket_exists_drops_the_handle_of_a_missing_bucket() -> None:
+    cluster = FakeCluster()
+    cluster.bucket("bucket").ping = _raise(BucketNotFoundException())
+    assert not check_bucket_exists(cluster, "bucket")
+    # the bucket is created, a new handle is opened for it
+    cluster.buckets["bucket"] = FakeBucket()
+    assert get_bucket(cluster, "bucket") is cluster.buckets["bucket"]
+    assert check_bucket_exists(cluster, "bucket")
+
+
+def test_check_bucket_exists_raises_other_errors() -> None:
+    cluster = FakeCluster()
+    cluster.bucket("bucket").ping = _raise(UnAmbiguousTimeoutException())
+    with pytest.raises(UnAmbiguousTimeoutException):
+        check_bucket_exists(cluster, "bucket")
+
+
+def _list_scopes(cluster: FakeCluster, scopes: dict) -> None:
+    """Make the bucket list the given scopes, mapped to their collection names"""
+    listed = [
+        SimpleNamespace(
+            name=name, collections=[SimpleNamespace(name=c) for c in collections]
+        )
+        for name, collections in scopes.items()
+    ]
+    cluster.bucket("bucket").collections = lambda: SimpleNamespace(
+        get_all_scopes=lambda: listed
+    )
+
+
+def test_check_scope_and_collection_exists_is_cached() -> None:
+    cluster = FakeCluster()
+    assert check_scope_and_collection_exists(cluster, "bucket", "scope", "collection")
+
+    # The collection is not probed again
+    collection = cluster.bucket("bucket").scope("scope").collection("collection")
+    collection.exists = _raise(CollectionNotFoundException())
+    assert check_scope_and_collection_exists(cluster, "bucket", "scope", "collection")
+
+
+@pytest.mark.parametrize(
+    "scopes, message",
+    [
+        pytest.param({"other": []}, "Scope scope not found", id="missing_scope"),
+        pytest.param(
+            {"scope": ["other"]},
+            "Collection collection not found",
+            id="missing_collection",
+        ),
+    ],
+)
+def test_check_scope_and_collection_exists_reports_what_is_missing(
+    scopes: dict, message: str
+) -> None:
+    cluster = FakeCluster()
+    collection = cluster.bucket("bucket").scope("scope").collection("collection")
+    collection.exists = _raise(CollectionNotFoundException())
+    _list_scopes(cluster, scopes)
+    with pytest.raises(ValueError, match=message):
+        check_scope_and_collection_exists(cluster, "bucket", "scope", "collection")
+
+
+def test_check_scope_and_collection_exists_after_a_probe_timeout() -> None:
+    cluster = FakeCluster()
+    collection = cluster.bucket("bucket").scope("scope").collection("collection")
+    collection.exists = _raise(UnAmbiguousTimeoutException())
+    _list_scopes(cluster, {"scope": ["collection"]})
+    assert check_scope_and_collection_exists(cluster, "bucket", "scope", "collection")
+
+
+def test_json_transcoder_encodes_what_orjson_rejects() -> None:
+    serializer = OrjsonSerializer()
+    assert serializer.serialize({"a": [1.0]}) == b'{"a":[1.0]}'
+    # orjson rejects non string keys and integers larger than 64 bits
+    assert serializer.serialize({1: 2**70}) == b'{"1": 1180591620717411303424}'
+    assert math.isnan(serializer.deserialize(b"NaN"))
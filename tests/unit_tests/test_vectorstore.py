@@ -1 +1,280 @@
+"""Unit tests of the vector stores, against an in memory cluster"""
 
+import contextvars
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from langchain_couchbase import CouchbaseSearchVectorStore
+from langchain_couchbase.utils import encode_vector_base64
+from langchain_couchbase.vectorstores.search_vector_store import (
+    _DIM_NOT_FETCHED,
+    _find_vector_dims,
+)
+from tests.utils import ConsistentFakeEmbeddings, FakeCluster, FakeCollection
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+
+class _ContextRecordingEmbeddings(ConsistentFakeEmbeddings):
+    """Embeddings recording the request id visible to each embed_documents call"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.request_ids: List[Optional[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.request_ids.append(_request_id.get())
+        return super().embed_documents(texts)
+
+
+class _Vector:
+    """NumPy-like vector, which the JSON serializer can't encode as is"""
+
+    def __init__(self, values: List[float]) -> None:
+        self.values = values
+
+    def tolist(self) -> List[float]:
+        return list(self.values)
+
+
+def make_search_vectorstore(**kwargs: Any) -> CouchbaseSearchVectorStore:
+    kwargs.setdefault("embedding", ConsistentFakeEmbeddings())
+    return CouchbaseSearchVectorStore(
+        cluster=FakeCluster(),
+        bucket_name="bucket",
+        scope_name="scope",
+        collection_name="collection",
+        index_name="index",
+        validate=False,
+        **kwargs,
+    )
+
+
+def test_build_batch_docs_converts_numpy_like_vectors() -> None:
+    vectorstore = make_search_vectorstore()
+    docs = vectorstore._build_batch_docs(
+        ["a"],
+        ["foo"],
+        [{"page": 1}],
+        [_Vector([1.0, 2.0])],  # type: ignore[list-item]
+    )
+    assert docs == {
+        "a": {"text": "foo", "metadata": {"page": 1}, "embedding": [1.0, 2.0]}
+    }
+
+
+def test_add_texts_embeds_in_the_callers_context() -> None:
+    embedding = _ContextRecordingEmbeddings()
+    vectorstore = make_search_vectorstore(embedding=embedding)
+    token = _request_id.set("run-1")
+    try:
+        ids = vectorstore.add_texts(["foo", "bar", "baz"], batch_size=2)
+    finally:
+        _request_id.reset(token)
+
+    assert embedding.request_ids == ["run-1", "run-1"]
+    collection = vectorstore._collection
+    assert isinstance(collection, FakeCollection)
+    assert list(collection.docs) == ids
+    assert [doc["text"] for doc in collection.docs.values()] == ["foo", "bar", "baz"]
+
+
+def test_add_texts_keeps_the_order_of_concurrent_batches() -> None:
+    vectorstore = make_search_vectorstore()
+    texts = [f"text {i}" for i in range(10)]
+    ids = [f"id {i}" for i in range(10)]
+    assert (
+        vectorstore.add_texts(
+            texts, ids=ids, batch_size=3, embed_concurrency=3, upsert_concurrency=2
+        )
+        == ids
+    )
+
+
+def test_add_texts_of_a_single_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    vectorstore = make_search_vectorstore()
+
+    def no_thread_pool(*args: object, **kwargs: object) -> None:
+        raise AssertionError("a single batch should not use a thread pool")
+
+    monkeypatch.setattr(
+        "langchain_couchbase.vectorstores.base_vector_store.ThreadPoolExecutor",
+        no_thread_pool,
+    )
+    ids = vectorstore.add_texts(["foo", "bar"], ids=["a", "b"])
+    assert ids == ["a", "b"]
+    assert [doc["text"] for doc in vectorstore._collection.docs.values()] == [
+        "foo",
+        "bar",
+    ]
+    assert vectorstore.add_texts([]) == []
+
+
+def test_add_texts_raises_the_failure_of_a_batch() -> None:
+    vectorstore = make_search_vectorstore()
+    collection = vectorstore._collection
+    assert isinstance(collection, FakeCollection)
+
+    def upsert_multi(docs: Dict[str, Any], **kwargs: Any) -> Any:
+        return SimpleNamespace(all_ok=False, exceptions={})
+
+    collection.upsert_multi = upsert_multi  # type: ignore[method-assign]
+    with pytest.raises(ValueError, match="Failed to insert documents"):
+        vectorstore.add_texts(["foo", "bar", "baz"], batch_size=1)
+
+
+def test_batches_streams_texts_with_their_ids_and_metadatas() -> None:
+    batches = list(
+        CouchbaseSearchVectorStore._batches(
+            iter(["a", "b", "c"]), [{"i": 1}, {"i": 2}, {"i": 3}], ["1", "2", "3"], 2
+        )
+    )
+    assert batches == [
+        (["1", "2"], ["a", "b"], [{"i": 1}, {"i": 2}]),
+        (["3"], ["c"], [{"i": 3}]),
+    ]
+
+
+def test_batches_generates_missing_ids_and_metadatas() -> None:
+    batches = list(CouchbaseSearchVectorStore._batches(["a", "b", "c"], None, None, 2))
+    assert [texts for _, texts, _ in batches] == [["a", "b"], ["c"]]
+    ids = [id for batch_ids, _, _ in batches for id in batch_ids]
+    assert len(set(ids)) == 3
+    assert all(len(id) == 32 for id in ids)
+    assert [metadatas for _, _, metadatas in batches] == [[{}, {}], [{}]]
+    # Changing the metadata of one document must not change the others
+    first_metadatas = batches[0][2]
+    first_metadatas[0]["page"] = 1
+    assert first_metadatas[1] == {}
+    assert next(CouchbaseSearchVectorStore._batches(["d"], None, None, 2))[2] == [{}]
+
+
+def test_batches_of_no_texts() -> None:
+    assert list(CouchbaseSearchVectorStore._batches([], None, None, 2)) == []
+
+
+def test_build_batch_docs_encodes_base64_embeddings() -> None:
+    vectorstore = make_search_vectorstore(base64_embeddings=True)
+    docs = vectorstore._build_batch_docs(["a"], ["foo"], [{}], [[1.0, 2.0]])
+    assert docs["a"]["embedding"] == encode_vector_base64([1.0, 2.0])
+
+
+VECTOR_INDEX_MAPPING = {
+    "default_mapping": {"enabled": False},
+    "types": {
+        "scope.collection": {
+            "properties": {
+                "embedding": {"fields": [{"type": "vector", "dims": 10}]},
+                "metadata": {
+                    "properties": {
+                        "image": {"fields": [{"type": "vector_base64", "dims": 3}]},
+                        "text": {"fields": [{"type": "text"}]},
+                    }
+                },
+            }
+        }
+    },
+}
+
+
+def test_find_vector_dims() -> None:
+    assert _find_vector_dims(VECTOR_INDEX_MAPPING, "embedding") == 10
+    assert _find_vector_dims(VECTOR_INDEX_MAPPING, "metadata.image") == 3
+    assert _find_vector_dims(VECTOR_INDEX_MAPPING, "metadata.text") is None
+    assert _find_vector_dims(VECTOR_INDEX_MAPPING, "missing") is None
+    assert _find_vector_dims({}, "embedding") is None
+
+
+def test_find_vector_dims_in_the_default_mapping() -> None:
+    mapping = {
+        "default_mapping": {
+            "properties": {"embedding": {"fields": [{"type": "vector", "dims": 4}]}}
+        }
+    }
+    assert _find_vector_dims(mapping, "embedding") == 4
+
+
+def test_embedding_dim_is_read_once_from_the_index() -> None:
+    vectorstore = make_search_vectorstore()
+    vectorstore._embedding_dim = _DIM_NOT_FETCHED
+    calls: List[str] = []
+
+    def get_index(index_name: str) -> Any:
+        calls.append(index_name)
+        return SimpleNamespace(params={"mapping": VECTOR_INDEX_MAPPING})
+
+    def search_indexes() -> Any:
+        return SimpleNamespace(get_index=get_index)
+
+    vectorstore._scope.search_indexes = search_indexes  # type: ignore[attr-defined]
+    assert vectorstore._get_embedding_dim() == 10
+    assert vectorstore._get_embedding_dim() == 10
+    assert calls == ["index"]
+
+
+def test_embedding_dim_is_not_fetched_without_validation() -> None:
+    vectorstore = make_search_vectorstore()
+
+    def search_indexes() -> Any:
+        raise AssertionError("the index should not be fetched")
+
+    vectorstore._scope.search_indexes = search_indexes  # type: ignore[attr-defined]
+    assert vectorstore._get_embedding_dim() is None
+
+
+def test_delete() -> None:
+    vectorstore = make_search_vectorstore()
+    ids = vectorstore.add_texts(["foo", "bar", "baz"])
+    assert vectorstore.delete(ids[:2], batch_size=1) is True
+    assert list(vectorstore._collection.docs) == ids[2:]
+
+
+def test_delete_of_a_missing_document() -> None:
+    vectorstore = make_search_vectorstore()
+    ids = vectorstore.add_texts(["foo", "bar"])
+    # every batch is attempted, even after one with a missing document
+    assert vectorstore.delete(["missing", *ids], batch_size=1) is False
+    assert vectorstore._collection.docs == {}
+
+
+def test_row_to_doc_formats_the_metadata() -> None:
+    vectorstore = make_search_vectorstore()
+    row = SimpleNamespace(
+        id="a", score=0.5, fields={"text": "foo", "metadata.page": 1, "other": 2}
+    )
+    doc, score = vectorstore._row_to_doc(row)  # type: ignore[arg-type]
+    assert (doc.id, doc.page_content, doc.metadata, score) == (
+        "a",
+        "foo",
+        {"page": 1, "other": 2},
+        0.5,
+    )
+
+
+def test_row_to_doc_uses_the_format_metadata_override() -> None:
+    class UpperCaseMetadata(CouchbaseSearchVectorStore):
+        def _format_metadata(self, row_fields: Dict[str, Any]) -> Dict[str, Any]:
+            return {key.upper(): value for key, value in row_fields.items()}
+
+    vectorstore = UpperCaseMetadata(
+        cluster=FakeCluster(),
+        embedding=ConsistentFakeEmbeddings(),
+        bucket_name="bucket",
+        scope_name="scope",
+        collection_name="collection",
+        index_name="index",
+        validate=False,
+    )
+    row = SimpleNamespace(id="a", score=0.5, fields={"text": "foo", "page": 1})
+    doc, _ = vectorstore._row_to_doc(row)  # type: ignore[arg-type]
+    assert doc.metadata == {"PAGE": 1}
+
+
+def test_searches_fail_on_the_fake_cluster() -> None:
+    vectorstore = make_search_vectorstore()
+    with pytest.raises(ValueError, match="search not expected in this test"):
+        vectorstore.similarity_search_by_vector([1.0] * 10)
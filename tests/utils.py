@@ -1,15 +1,107 @@
 """Utilities for testing purposes."""
 
+import functools
 import hashlib
-from datetime import datetime
-from typing import Any, Dict, List, Mapping, Optional, cast
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, TypeVar, cast
 
+from couchbase.auth import PasswordAuthenticator
 from couchbase.cluster import Cluster
-from couchbase.options import GetOptions
+from couchbase.diagnostics import PingState, ServiceType
+from couchbase.exceptions import DocumentNotFoundException
+from couchbase.options import ClusterOptions, GetOptions, WaitUntilReadyOptions
 from langchain_core.callbacks import CallbackManagerForLLMRun
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models.llms import LLM
 
+T = TypeVar("T")
+
+# Connected clusters, keyed by connection string and username, shared by all
+# the test modules
+_CLUSTER_CACHE: Dict[Tuple[str, str], Cluster] = {}
+# Errors of the connections that failed, so that the following tests fail right
+# away instead of waiting for the cluster again
+_CLUSTER_ERRORS: Dict[Tuple[str, str], Exception] = {}
+
+
+def connect_cluster(
+    connection_string: str,
+    username: str,
+    password: str,
+    ready_timeout: float = 5.0,
+) -> Cluster:
+    """Get a couchbase cluster object, connecting only once per test session.
+    The first connection waits until the services used by the tests are ready.
+    If it fails, the same error is raised again without reconnecting."""
+    key = (connection_string, username)
+    if key in _CLUSTER_CACHE:
+        return _CLUSTER_CACHE[key]
+    if key in _CLUSTER_ERRORS:
+        raise _CLUSTER_ERRORS[key]
+
+    try:
+        auth = PasswordAuthenticator(username, password)
+        options = ClusterOptions(auth)
+        options.apply_profile("wan_development")
+        cluster = Cluster(connection_string, options)
+
+        # Wait until the services used by the tests are ready, instead of every
+        # service of the cluster
+        cluster.wait_until_ready(
+            timedelta(seconds=ready_timeout),
+            WaitUntilReadyOptions(
+                service_types=[
+                    ServiceType.KeyValue,
+                    ServiceType.Query,
+                    ServiceType.Search,
+                ]
+            ),
+        )
+    except Exception as e:
+        _CLUSTER_ERRORS[key] = e
+        raise
+
+    _CLUSTER_CACHE[key] = cluster
+    return cluster
+
+
+def wait_until(
+    fn: Callable[[], T],
+    until: Callable[[T], bool] = bool,
+    timeout: float = 6.0,
+    interval: float = 0.05,
+) -> T:
+    """Call fn until its result satisfies until, or the timeout passes.
+    Exceptions from fn, e.g. on an index that is still being built, are retried.
+    Returns the last result, so assertions on it fail with the actual value."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            result = fn()
+            if until(result):
+                return result
+        except Exception:
+            pass
+        time.sleep(interval)
+    return fn()
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a N1QL identifier with backticks"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+@functools.cache
+def quote_keyspace(bucket_name: str, scope_name: str, collection_name: str) -> str:
+    """Quote the bucket, scope and collection as a N1QL keyspace. The keyspace
+    is the same for the whole run, so it is only built once"""
+    return ".".join(
+        quote_identifier(name) for name in (bucket_name, scope_name, collection_name)
+    )
+
 
 class FakeEmbeddings(Embeddings):
     """Fake embeddings functionality for testing."""
@@ -39,18 +131,24 @@ class ConsistentFakeEmbeddings(FakeEmbeddings):
 
     def __init__(self, dimensionality: int = 10) -> None:
         self.known_texts: List[str] = []
+        # Position of each text in known_texts, to find repeated texts in
+        # constant time
+        self._positions: Dict[str, int] = {}
+        # add_texts may embed batches from several threads
+        self._lock = threading.Lock()
         self.dimensionality = dimensionality
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Return consistent embeddings for each text seen so far."""
         out_vectors = []
-        for text in texts:
-            if text not in self.known_texts:
-                self.known_texts.append(text)
-            vector = [float(1.0)] * (self.dimensionality - 1) + [
-                float(self.known_texts.index(text))
-            ]
-            out_vectors.append(vector)
+        with self._lock:
+            for text in texts:
+                position = self._positions.get(text)
+                if position is None:
+                    position = self._positions[text] = len(self.known_texts)
+                    self.known_texts.append(text)
+                vector = [float(1.0)] * (self.dimensionality - 1) + [float(position)]
+                out_vectors.append(vector)
         return out_vectors
 
     def embed_query(self, text: str) -> List[float]:
@@ -105,7 +203,7 @@ class FakeLLM(LLM):
 
 def cache_key_hash_function(_input: str) -> str:
     """Use a deterministic hashing approach."""
-    return hashlib.md5(_input.encode()).hexdigest()
+    return hashlib.blake2b(_input.encode(), digest_size=16).hexdigest()
 
 
 def fetch_document_expiry_time(
@@ -134,3 +232,78 @@ def get_document_keys(
 
     document_keys = [row["id"] for row in result]
     return document_keys
+
+
+class FakeCollection:
+    """In memory stand-in for a Couchbase collection, for the unit tests.
+    Only the KV operations used by the package are implemented."""
+
+    def __init__(self) -> None:
+        self.docs: Dict[str, Any] = {}
+        self.insert_calls = 0
+
+    def upsert_multi(self, docs: Dict[str, Any], **kwargs: Any) -> Any:
+        self.docs.update(docs)
+        return SimpleNamespace(all_ok=True, exceptions={})
+
+    def insert_multi(self, docs: Dict[str, Any], **kwargs: Any) -> Any:
+        self.insert_calls += 1
+        return self.upsert_multi(docs)
+
+    def remove_multi(self, keys: List[str], **kwargs: Any) -> Any:
+        missing = {key: DocumentNotFoundException() for key in keys}
+        for key in keys:
+            if self.docs.pop(key, None) is not None:
+                del missing[key]
+        return SimpleNamespace(all_ok=not missing, exceptions=missing)
+
+    def get(self, key: str, *args: Any, **kwargs: Any) -> Any:
+        if key not in self.docs:
+            raise DocumentNotFoundException()
+        return SimpleNamespace(content_as={dict: self.docs[key]})
+
+    def exists(self, key: str, *args: Any, **kwargs: Any) -> Any:
+        return SimpleNamespace(exists=key in self.docs)
+
+
+class FakeScope:
+    """Scope of a FakeCluster, whose collections always exist"""
+
+    def __init__(self) -> None:
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def collection(self, name: str) -> FakeCollection:
+        return self.collections.setdefault(name, FakeCollection())
+
+    def search(self, *args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("search not expected in this test")
+
+
+class FakeBucket:
+    """Bucket of a FakeCluster, which answers KV pings"""
+
+    def __init__(self) -> None:
+        self.scopes: Dict[str, FakeScope] = {}
+
+    def scope(self, name: str) -> FakeScope:
+        return self.scopes.setdefault(name, FakeScope())
+
+    def ping(self, *args: Any, **kwargs: Any) -> Any:
+        return SimpleNamespace(
+            endpoints={ServiceType.KeyValue: [SimpleNamespace(state=PingState.OK)]}
+        )
+
+
+class FakeCluster(Cluster):
+    """Cluster holding its documents in memory, for the unit tests.
+    It subclasses Cluster without connecting, so it passes the isinstance checks
+    of the package."""
+
+    def __init__(self) -> None:
+        self.buckets: Dict[str, FakeBucket] = {}
+
+    def bucket(self, bucket_name: str) -> Any:
+        return self.buckets.setdefault(bucket_name, FakeBucket())
+
+    def search(self, *args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("search not expected in this test")